@@ -0,0 +1,291 @@
+"""Headless RapidRDP: sweep the inventory's hosts from a terminal, cron job or monitoring script.
+
+    python rapidrdp.py sweep                       # every host, one NDJSON line per result
+    python rapidrdp.py sweep --domain CORP --summary
+    python rapidrdp.py sweep --mode rdp            # online only if RDP answers; adds the negotiated security
+    python rapidrdp.py list --search sql
+    python rapidrdp.py import servers.csv --dry-run
+    python rapidrdp.py agent --config rdp_hosts.json   # shared probe feed for every GUI on this machine
+
+Exit codes: 0 = every probed host online, 1 = at least one offline (or "unknown":
+its name lookup did not finish within --dns-timeout),
+2 = bad arguments or unreadable inventory, 3 = no hosts matched the filters.
+For import: 0 = every record imported or skipped as a duplicate, 1 = some records rejected.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+from rdp_agent import DEFAULT_AGENT_PORT, ProbeAgent
+from rdp_dns import DnsCache
+from rdp_icmp import IcmpProbeEngine, icmp_sweep_available
+from rdp_import import plan_import_file
+from rdp_index import host_group, matching_hosts
+from rdp_probe import DNS_TIMEOUT, UNKNOWN, TcpProbeEngine, ping_host
+from rdp_scheduler import ProbeScheduler
+from rdp_storage import SQLITE_EXTENSIONS, InventoryLock, open_store, read_inventory
+from rdp_x224 import RdpProbeEngine, describe_check
+
+DEFAULT_CONFIG = "rdp_hosts_sample.json"
+
+EXIT_OK = 0
+EXIT_OFFLINE = 1
+EXIT_USAGE = 2
+EXIT_NO_HOSTS = 3
+
+
+def check_inventory(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"inventory not found: {path}")
+
+
+def select_hosts(path, domain=None, group=None, search=None):
+    """Reads the inventory and returns (hosts dict, matching host names in grid order).
+
+    Never writes: a JSON inventory is read like the agent reads it, leaving the
+    snapshot and journal to the app that has it open. SQLite filters in the database.
+    """
+    check_inventory(path)
+    if not path.lower().endswith(SQLITE_EXTENSIONS):
+        hosts = read_inventory(path)["hosts"]
+        return hosts, matching_hosts(hosts, domain, group, search)
+    store = open_store(path)
+    try:
+        hosts = store.load()["hosts"]
+        selected = list(store.query_hosts(domain, group, search))
+    finally:
+        store.close()
+    return hosts, selected
+
+
+def sweep_tcp(hosts, on_result, concurrency, timeout, resolver=None, dns_timeout=DNS_TIMEOUT):
+    engine = TcpProbeEngine(timeout=timeout, max_concurrency=concurrency, resolver=resolver, dns_timeout=dns_timeout)
+    asyncio.run(engine.probe_many(hosts, lambda r: on_result(r.host, r.status, r.latency_ms)))
+
+
+def sweep_rdp(hosts, on_result, concurrency, timeout, resolver=None, dns_timeout=DNS_TIMEOUT):
+    engine = RdpProbeEngine(timeout=timeout, max_concurrency=concurrency, resolver=resolver, dns_timeout=dns_timeout)
+
+    def report(r):
+        check = engine.checks[r.host]
+        on_result(r.host, r.status, r.latency_ms,
+                  {"security": check.security, "negotiation_failure": check.failure, "detail": describe_check(check)})
+    asyncio.run(engine.probe_many(hosts, report))
+
+
+def sweep_icmp_socket(hosts, on_result, concurrency, timeout, resolver=None, dns_timeout=DNS_TIMEOUT):
+    reason = icmp_sweep_available()
+    if reason:
+        raise OSError(f"icmp-sweep unavailable: {reason}")
+    engine = IcmpProbeEngine(timeout=timeout, max_concurrency=concurrency, resolver=resolver, dns_timeout=dns_timeout)
+
+    async def run():
+        try:
+            await engine.probe_many(hosts, lambda r: on_result(r.host, r.status, r.latency_ms))
+        finally:
+            engine.close()
+    asyncio.run(run())
+
+
+def sweep_icmp(hosts, on_result, concurrency, timeout, resolver=None, dns_timeout=None):
+    lock = threading.Lock()
+    finished = threading.Event()
+    remaining = [len(hosts)]
+    timeout_ms = int(timeout * 1000)
+
+    def worker(host):
+        started = time.perf_counter()
+        status = ping_host(host, timeout_ms, resolver)
+        latency_ms = (time.perf_counter() - started) * 1000.0 if status == "online" else None
+        with lock:
+            try:
+                on_result(host, status, latency_ms)
+            finally:
+                remaining[0] -= 1
+                if not remaining[0]:
+                    finished.set()
+
+    scheduler = ProbeScheduler(worker, max_workers=concurrency)
+    scheduler.start()
+    for host in hosts:
+        scheduler.submit(host)
+    finished.wait()
+    scheduler.shutdown()
+
+
+def cmd_sweep(args, out=sys.stdout):
+    hosts, selected = select_hosts(args.config, args.domain, args.group, args.search)
+    if not selected:
+        return EXIT_NO_HOSTS
+
+    counts = {"online": 0, "offline": 0, UNKNOWN: 0}
+    started = time.perf_counter()
+
+    def on_result(host, status, latency_ms, extra=None):
+        counts[status] += 1
+        if args.summary:
+            return
+        info = hosts.get(host, {})
+        record = {
+            "host": host,
+            "status": status,
+            "latency_ms": None if latency_ms is None else round(latency_ms, 1),
+            "domain": info.get("domain"),
+            "group": host_group(info),
+        }
+        if extra:
+            record.update(extra)  # rdp mode: negotiated security protocol
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    # One lookup per distinct name, however many ports it is listed with
+    resolver = DnsCache(max_concurrency=args.dns_concurrency)
+    sweep = {"tcp": sweep_tcp, "icmp": sweep_icmp, "icmp-sweep": sweep_icmp_socket, "rdp": sweep_rdp}[args.mode]
+    try:
+        sweep(selected, on_result, args.concurrency, args.timeout, resolver, args.dns_timeout)
+    finally:
+        resolver.close()
+
+    if args.summary:
+        summary = {
+            "total": len(selected),
+            "online": counts["online"],
+            "offline": counts["offline"],
+            "unknown": counts[UNKNOWN],
+            "elapsed_s": round(time.perf_counter() - started, 3),
+            "dns": resolver.stats(),
+        }
+        out.write(json.dumps(summary) + "\n")
+    return EXIT_OFFLINE if counts["offline"] or counts[UNKNOWN] else EXIT_OK
+
+
+def cmd_list(args, out=sys.stdout):
+    hosts, selected = select_hosts(args.config, args.domain, args.group, args.search)
+    for host in selected:
+        info = hosts.get(host, {})
+        out.write(json.dumps({"host": host, "domain": info.get("domain"), "group": host_group(info),
+                              "username": info.get("username", ""), "desc": info.get("desc", "")}) + "\n")
+    return EXIT_OK if selected else EXIT_NO_HOSTS
+
+
+def import_into(path, file, overwrite=False):
+    """Plans the import of file and writes it to the inventory at path; returns the plan"""
+    lock = None
+    if not path.lower().endswith(SQLITE_EXTENSIONS):
+        # An open app window would later snapshot its own copy of the inventory over this import
+        lock = InventoryLock(path)
+        if not lock.exclusive():
+            raise OSError(f"{path} is open in RapidRDP; close it first, or use the app's Import button")
+    try:
+        store = open_store(path)
+        try:
+            data = store.load()
+            plan = plan_import_file(file, data["hosts"], data["domains"], overwrite=overwrite)
+            if plan.hosts:
+                store.set_hosts(plan.hosts)
+        finally:
+            store.close()
+    finally:
+        if lock is not None:
+            lock.release()
+    return plan
+
+
+def cmd_import(args, out=sys.stdout):
+    check_inventory(args.config)
+    if args.dry_run:
+        data = read_inventory(args.config)
+        plan = plan_import_file(args.file, data["hosts"], data["domains"], overwrite=args.update)
+    else:
+        plan = import_into(args.config, args.file, overwrite=args.update)
+    for where, reason in plan.errors:
+        print(f"rapidrdp: {args.file}:{where}: {reason}", file=sys.stderr)
+    out.write(json.dumps({"added": plan.added, "updated": len(plan.updated), "duplicates": len(plan.duplicates),
+                          "errors": len(plan.errors), "dry_run": args.dry_run}) + "\n")
+    return EXIT_OFFLINE if plan.errors else EXIT_OK
+
+
+def cmd_agent(args, out=sys.stdout):
+    if not os.path.exists(args.config):
+        raise FileNotFoundError(f"inventory not found: {args.config}")
+    agent = ProbeAgent(args.config, host=args.bind, port=args.port, mode=args.mode, timeout=args.timeout,
+                       concurrency=args.concurrency, interval=args.interval)
+    agent.start()
+    out.write(json.dumps({"listening": f"{args.bind}:{agent.port}", "inventory": agent.config,
+                          "hosts": len(agent.hosts)}) + "\n")
+    out.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        agent.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rapidrdp", description="RapidRDP headless tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--config", default=DEFAULT_CONFIG, help="inventory file (.json, or .db/.sqlite)")
+        p.add_argument("--domain", help="only hosts in this domain")
+        p.add_argument("--group", help="only hosts in this group")
+        p.add_argument("--search", help="substring of host, username or description")
+
+    sweep = sub.add_parser("sweep", help="probe hosts and stream results as NDJSON")
+    add_filters(sweep)
+    sweep.add_argument("--mode", choices=("tcp", "icmp", "icmp-sweep", "rdp"), default="tcp",
+                       help="tcp = connect to the RDP port (default), icmp = native ping, "
+                            "icmp-sweep = echoes through one ICMP socket (Linux), "
+                            "rdp = X.224 handshake, online only if RDP answers (adds the security protocol)")
+    sweep.add_argument("--concurrency", type=int, default=1000, help="max probes in flight")
+    sweep.add_argument("--timeout", type=float, default=1.0, help="seconds before a host counts as offline")
+    sweep.add_argument("--dns-concurrency", type=int, default=32, help="max name lookups in flight")
+    sweep.add_argument("--dns-timeout", type=float, default=DNS_TIMEOUT,
+                       help="seconds a probe waits for its name lookup before reporting the host as unknown")
+    sweep.add_argument("--summary", action="store_true", help="print only one JSON object with the totals")
+    sweep.set_defaults(func=cmd_sweep)
+
+    lst = sub.add_parser("list", help="print the matching hosts as NDJSON without probing")
+    add_filters(lst)
+    lst.set_defaults(func=cmd_list)
+
+    imp = sub.add_parser("import", help="bulk-add hosts from a CSV, JSON or NDJSON export")
+    imp.add_argument("file")
+    imp.add_argument("--config", default=DEFAULT_CONFIG, help="inventory file (.json, or .db/.sqlite)")
+    imp.add_argument("--update", action="store_true", help="overwrite hosts that already exist instead of skipping them")
+    imp.add_argument("--dry-run", action="store_true", help="validate and report without changing the inventory")
+    imp.set_defaults(func=cmd_import)
+
+    agent = sub.add_parser("agent", help="probe the inventory once for every GUI on this machine (see PROBE_AGENT)")
+    agent.add_argument("--config", default=DEFAULT_CONFIG, help="inventory file (.json, or .db/.sqlite)")
+    agent.add_argument("--bind", default="127.0.0.1", help="address to listen on (keep it local)")
+    agent.add_argument("--port", type=int, default=DEFAULT_AGENT_PORT)
+    agent.add_argument("--mode", choices=("tcp", "icmp-sweep", "rdp"), default="tcp", help="how hosts are probed")
+    agent.add_argument("--concurrency", type=int, default=2000, help="max probes in flight")
+    agent.add_argument("--timeout", type=float, default=1.0, help="seconds before a host counts as offline")
+    agent.add_argument("--interval", type=float, default=30, help="base seconds between probes of a host")
+    agent.set_defaults(func=cmd_agent)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)  # argparse exits with 2 on bad usage
+    if getattr(args, "concurrency", 1) < 1 or getattr(args, "dns_concurrency", 1) < 1 or getattr(args, "timeout", 1) <= 0 \
+            or getattr(args, "dns_timeout", 1) <= 0:
+        parser.error("--concurrency, --dns-concurrency, --timeout and --dns-timeout must be positive")
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"rapidrdp: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""Shared probe agent: one process probes an inventory and streams status to every GUI.
+
+Run it once per jump host (`python rapidrdp.py agent --config rdp_hosts.json`) and
+set PROBE_AGENT in rdp_manager.py; each GUI then subscribes instead of probing.
+
+Protocol: one JSON object per line over a local TCP socket.
+  agent -> client  {"type": "snapshot", "version": 1, "inventory": path,
+                    "results": [[host, status, latency_ms], ...]}     # once, on connect
+                   {"type": "delta", "results": [[host, status, latency_ms], ...]}
+                   # hosts probed since the previous delta, latest result each
+  client -> agent  {"type": "probe", "host": host}  # probe now (manual ping, or a host just added)
+                   {"type": "reload"}               # the inventory was just changed
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+from rdp_dns import DnsCache
+from rdp_icmp import IcmpProbeEngine
+from rdp_probe import UNKNOWN, TcpProbeEngine
+from rdp_scheduler import PRIORITY_MANUAL, ProbePolicy, ProbeScheduler, TokenBucket, subnet_key
+from rdp_storage import inventory_version, read_inventory
+from rdp_x224 import RdpProbeEngine
+
+PROTOCOL_VERSION = 1
+DEFAULT_AGENT_PORT = 47391
+MAX_CLIENT_BUFFER = 8 << 20  # A subscriber this far behind is disconnected rather than buffered for
+PENDING_PROBE_TTL = 60.0     # How long a probe request for a host not (yet) in the inventory waits for a reload
+
+
+def same_inventory(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+class ProbeAgent:
+    """Probes every host of `config` with the app's adaptive policy and publishes the results.
+
+    Everything runs on the probe engine's event loop thread: the scheduler's
+    dispatcher feeds it probes, a tick task submits hosts as they become due, the
+    server accepts subscribers and a publisher task sends them the results
+    gathered every `publish_interval` seconds. The inventory is re-read (on an
+    executor thread) when its files change, checked every `reload_interval`
+    seconds, or when a client asks.
+    """
+
+    def __init__(self, config, host="127.0.0.1", port=DEFAULT_AGENT_PORT, mode="tcp", timeout=1.0,
+                 concurrency=2000, rate=500, subnet_cap=32, interval=30, max_interval=300, offline_max_interval=900,
+                 wave_deadline=25, publish_interval=0.25, reload_interval=5.0):
+        self.config = os.path.abspath(config)
+        self.address = (host, port)
+        self.wave_deadline = wave_deadline
+        self.publish_interval = publish_interval
+        self.reload_interval = reload_interval
+
+        self.resolver = DnsCache()
+        engine_cls = {"icmp-sweep": IcmpProbeEngine, "rdp": RdpProbeEngine}.get(mode, TcpProbeEngine)
+        self.engine = engine_cls(timeout=timeout, max_concurrency=concurrency, resolver=self.resolver)
+        self.policy = ProbePolicy(base_interval=interval, max_interval=max_interval, offline_max_interval=offline_max_interval)
+        self.scheduler = None
+        self._limits = {"rate_limiter": TokenBucket(rate), "max_per_subnet": subnet_cap,
+                        "subnet_of": lambda h: subnet_key(h, self.resolver)}
+
+        self.hosts = []
+        self._host_set = set()
+        self._version = None
+        self._latest = {}   # host -> [status, latency_ms] of its last probe
+        self._unsent = {}   # host -> [status, latency_ms] probed since the last delta (loop thread only)
+        self._pending = {}  # host -> monotonic time a client asked to probe it before the inventory had it
+        self._clients = set()
+        self._server = None
+        self._tasks = []
+        self.port = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Starts probing and serving in the background; returns once the socket is listening"""
+        loop = self.engine.start()
+        self.scheduler = ProbeScheduler(self._probe, max_workers=self.engine.max_concurrency, loop=loop, **self._limits)
+        self.scheduler.start()
+        asyncio.run_coroutine_threadsafe(self._serve(), loop).result()
+        return self
+
+    def stop(self):
+        self.scheduler.shutdown()
+        loop = self.engine.loop
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(2.0)
+        self.engine.stop()
+        self.resolver.close()
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        finally:
+            self.stop()
+
+    async def _serve(self):
+        await self._reload()
+        self._server = await asyncio.start_server(self._handle_client, *self.address)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._tasks = [asyncio.ensure_future(c) for c in (self._tick(), self._publish(), self._watch_inventory())]
+
+    async def _shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        await self._server.wait_closed()
+
+    # ---- inventory ----
+
+    async def _reload(self):
+        version = inventory_version(self.config)
+        if version == self._version:
+            return
+        try:
+            # Parsing a big inventory takes a while; probes and subscribers keep running meanwhile
+            inventory = await asyncio.get_running_loop().run_in_executor(None, read_inventory, self.config)
+            hosts = list(inventory["hosts"])
+        except (OSError, ValueError) as e:
+            print(f"Agent: could not read {self.config}: {e}")
+            return
+        if version == self._version:
+            return  # Another reload applied it while this one was reading
+        self._version = version
+        gone = self._host_set.difference(hosts)
+        for host in gone:
+            self.policy.forget(host)
+            self._latest.pop(host, None)
+            self._unsent.pop(host, None)
+        self.hosts = hosts
+        self._host_set = set(hosts)
+        print(f"Agent: probing {len(hosts)} hosts from {self.config}")
+
+        stale = time.monotonic() - PENDING_PROBE_TTL
+        for host, asked in list(self._pending.items()):
+            if host in self._host_set:
+                self._probe_now(host)
+            if host in self._host_set or asked < stale:
+                del self._pending[host]
+
+    async def _watch_inventory(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self._reload()
+
+    # ---- probing ----
+
+    async def _tick(self):
+        while True:
+            deadline = time.monotonic() + self.wave_deadline
+            for host in self.policy.due(self.hosts):
+                self.scheduler.submit(host, deadline)
+            await asyncio.sleep(1.0)
+
+    def _probe_now(self, host):
+        self.policy.reset(host)
+        self.scheduler.submit(host, priority=PRIORITY_MANUAL)
+
+    async def _probe(self, host):
+        result = await self.engine.probe(host)
+        if result.status == UNKNOWN:
+            self.policy.reset(host)  # Name lookup still running; probe again on the next tick
+            return
+        self.policy.record(host, result.status)
+        latency = None if result.latency_ms is None else round(result.latency_ms, 2)
+        self._latest[host] = self._unsent[host] = [result.status, latency]
+
+    # ---- subscribers ----
+
+    def _send(self, writer, message):
+        if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            print("Agent: dropping a subscriber that stopped reading")
+            writer.close()
+            self._clients.discard(writer)
+            return
+        writer.write(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    async def _publish(self):
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            if not self._unsent or not self._clients:
+                self._unsent.clear()
+                continue
+            results = [[h, s, l] for h, (s, l) in self._unsent.items()]
+            self._unsent = {}
+            for writer in list(self._clients):
+                self._send(writer, {"type": "delta", "results": results})
+
+    async def _handle_client(self, reader, writer):
+        self._send(writer, {"type": "snapshot", "version": PROTOCOL_VERSION, "inventory": self.config,
+                            "results": [[h, s, l] for h, (s, l) in self._latest.items()]})
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                kind, host = message.get("type"), message.get("host")
+                if kind == "probe" and isinstance(host, str):
+                    if host in self._host_set:
+                        self._probe_now(host)
+                    else:
+                        self._pending[host] = time.monotonic()  # Just added; probed once a reload brings it in
+                elif kind == "reload":
+                    # The app writes behind by a fraction of a second; look again shortly
+                    asyncio.get_running_loop().call_later(1.0, lambda: asyncio.ensure_future(self._reload()))
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+def _results(message):
+    """(host, status, latency_ms) tuples of a snapshot or delta, skipping malformed entries"""
+    results = message.get("results") or []
+    if not isinstance(results, list):
+        return []
+    return [tuple(r) for r in results if isinstance(r, list) and len(r) == 3]
+
+
+class AgentClient:
+    """Subscription to a ProbeAgent, read on a background thread.
+
+    `on_results(results)` receives lists of (host, status, latency_ms), first the
+    snapshot then every delta; `on_disconnect()` is called once if the agent goes
+    away. Both run on the reader thread.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_AGENT_PORT, on_results=None, on_disconnect=None, timeout=2.0):
+        self.address = (host, port)
+        self.on_results = on_results
+        self.on_disconnect = on_disconnect
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def connect(self, inventory):
+        """Connects and applies the snapshot. Raises OSError if the agent is unavailable or probes another inventory"""
+        sock = socket.create_connection(self.address, self.timeout)
+        try:
+            sock.settimeout(self.timeout)
+            f = sock.makefile("rb")
+            snapshot = json.loads(f.readline() or b"null")
+            if not isinstance(snapshot, dict) or snapshot.get("type") != "snapshot":
+                raise OSError("agent sent no snapshot")
+            if snapshot.get("version") != PROTOCOL_VERSION:
+                raise OSError(f"agent speaks protocol {snapshot.get('version')}, expected {PROTOCOL_VERSION}")
+            if not same_inventory(snapshot.get("inventory", ""), inventory):
+                raise OSError(f"agent probes {snapshot.get('inventory')}, not {os.path.abspath(inventory)}")
+        except (OSError, ValueError) as e:
+            sock.close()
+            raise OSError(str(e)) from None
+        sock.settimeout(None)
+        self._sock, self._file = sock, f
+        if self.on_results:
+            self.on_results(_results(snapshot))
+        threading.Thread(target=self._read_loop, name="agent-client", daemon=True).start()
+        return self
+
+    def _read_loop(self):
+        try:
+            for line in self._file:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                if message.get("type") == "delta" and self.on_results:
+                    self.on_results(_results(message))
+        except (OSError, ValueError):
+            pass
+        except Exception as e:
+            print(f"Probe agent feed failed: {e}")
+        # However the feed ended, let the app fall back to probing by itself
+        if not self._closed:
+            self.close()
+            if self.on_disconnect:
+                self.on_disconnect()
+
+    def _send(self, message):
+        try:
+            with self._lock:
+                self._sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        except OSError:
+            pass  # The reader notices the disconnect
+
+    def request_probe(self, host):
+        self._send({"type": "probe", "host": host})
+
+    def request_reload(self):
+        self._send({"type": "reload"})
+
+    def close(self):
+        self._closed = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
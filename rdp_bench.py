@@ -0,0 +1,479 @@
+"""Benchmarks for inventory storage, filtering, grid rendering and probe waves.
+
+Synthetic v3 inventories of each requested size are generated from a fixed seed,
+so two runs on the same machine measure the same work. Every run is appended as
+one JSON line to the output file, which makes it easy to compare runs over time:
+
+    python rdp_bench.py                          # 1k, 10k and 100k hosts
+    python rdp_bench.py --sizes 1000 5000 --only storage filter
+    python rdp_bench.py --sqlite --output bench_results.jsonl
+
+The grid benchmark needs a display; on Linux without one it starts Xvfb if it is
+installed, otherwise the benchmark is reported as skipped.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from rdp_hosts import HostTable
+from rdp_index import GroupIndex, SearchIndex
+from rdp_probe import TcpProbeEngine
+from rdp_scheduler import ProbeScheduler
+from rdp_storage import InventoryStore, StartupCache, empty_inventory, migrate_inventory
+from rdp_x224 import RdpProbeEngine, stub_handler
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+BENCHMARKS = ("storage", "filter", "memory", "grid", "probe")
+
+SITES = ("nyc", "lon", "fra", "sgp", "syd", "tor")
+ROLES = (
+    ("Domain Controllers", "Domain Controller"),
+    ("File Servers", "File Server"),
+    ("Database Servers", "SQL Server Database"),
+    ("Web Servers", "IIS Web Front End"),
+    ("Linux", "Ubuntu Linux Jump Box"),
+    ("Workstations", "Engineering Desktop PC"),
+    ("Laptops", "Sales Laptop"),
+)
+
+
+def generate_inventory(n, seed=42, domains=20):
+    """A v3 inventory with n hosts spread over `domains` domains, groups and name styles"""
+    rnd = random.Random(seed)
+    data = empty_inventory()
+    names = [f"corp{i:02d}.example.com" for i in range(domains)]
+    for name in names:
+        data["domains"][name] = {"username": name.split(".")[0] + "\\admin", "password": "U2FtcGxlUGFzc3dvcmQxMjMh"}
+
+    for i in range(n):
+        group, desc = rnd.choice(ROLES)
+        style = rnd.random()
+        if style < 0.6:
+            host = f"{rnd.choice(SITES)}-{group.split()[0].lower()[:3]}{i:06d}"
+        elif style < 0.9:
+            host = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        else:
+            host = f"{rnd.choice(SITES)}-app{i:06d}:{rnd.choice((3390, 3391, 13389))}"
+        info = {"group": group, "desc": f"{desc} {i % 97}"}
+        if rnd.random() < 0.8:
+            info["domain"] = rnd.choice(names)
+            info["has_password"] = True
+        else:
+            info["username"] = ".\\Administrator"
+        data["hosts"][host] = info
+    return data
+
+
+def timed(fn, repeat=5):
+    """Runs fn `repeat` times; returns (result of the last run, stats in milliseconds)"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return result, {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3)}
+
+
+# ---- storage ----
+
+def bench_storage(data, workdir, repeat, sqlite=False):
+    n = len(data["hosts"])
+    path = os.path.join(workdir, f"bench_{n}.json")
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+
+    results = {"file_bytes": os.path.getsize(path)}
+    _, results["load"] = timed(lambda: InventoryStore(path).load(), repeat)
+
+    def save():
+        store = InventoryStore(path)
+        store.load()
+        store.replace(data)
+        store.close()
+    _, results["save"] = timed(save, repeat)
+
+    def edit_one():
+        # One host edit is a journal append, then the snapshot on close
+        store = InventoryStore(path, flush_delay=0)
+        store.load()
+        store.set_host("bench-edit", {"group": "Ungrouped", "desc": "edited"})
+        store.flush()
+        store.close()
+    _, results["edit_and_close"] = timed(edit_one, repeat)
+
+    cache = StartupCache(path)
+    loaded = InventoryStore(path).load()
+    _, results["cache_save"] = timed(lambda: cache.save({"data": loaded, "search_index": SearchIndex(loaded["hosts"])}), repeat)
+    _, results["cache_load"] = timed(cache.load, repeat)
+    cache.discard()
+
+    if sqlite:
+        db_path = os.path.join(workdir, f"bench_{n}.db")
+
+        def to_sqlite():
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            migrate_inventory(path, db_path)
+        _, results["sqlite_migrate"] = timed(to_sqlite, 1)
+        from rdp_sqlite import SqliteStore
+        store = SqliteStore(db_path)
+        _, results["sqlite_load"] = timed(store.load, repeat)
+        store.close()
+    return results
+
+
+# ---- filtering ----
+
+SEARCH_TYPING = ("s", "sq", "sql", "sql ", "sql s")  # One query per keystroke, as typed into the search box
+
+
+def bench_filter(data, repeat, sqlite_path=None):
+    hosts = data["hosts"]
+    results = {}
+    search_index, results["search_index_build"] = timed(lambda: SearchIndex(hosts), repeat)
+    group_index, results["group_index_build"] = timed(lambda: GroupIndex(hosts), repeat)
+
+    some_host = next(iter(hosts))
+    probe_dom = next(d for d in (info.get("domain") for info in hosts.values()) if d)
+    probe_grp = ROLES[2][0]
+
+    _, results["sorted_hosts"] = timed(search_index.sorted_hosts, repeat)
+    _, results["search_exact_host"] = timed(lambda: search_index.search(some_host[:8]), repeat)
+    _, results["search_miss"] = timed(lambda: search_index.search("zzzz-no-such-host"), repeat)
+
+    keystrokes = []
+
+    def typing():
+        search_index._last = None
+        for q in SEARCH_TYPING:
+            started = time.perf_counter()
+            search_index.search(q)
+            keystrokes.append((time.perf_counter() - started) * 1000.0)
+    _, results["search_typing"] = timed(typing, repeat)
+    # The target is one frame (16 ms) from keystroke to results, for every keystroke
+    results["search_keystroke_max_ms"] = round(max(keystrokes), 3)
+
+    def domain_and_group():
+        members = group_index.hosts_in(probe_dom, probe_grp)
+        return [h for h in search_index.sorted_hosts() if h in members]
+    _, results["filter_domain_group"] = timed(domain_and_group, repeat)
+
+    # What refresh_sidebar / refresh_group_filter read on every change
+    _, results["sidebar_counts"] = timed(lambda: (group_index.domain_counts(), group_index.groups()), repeat)
+
+    def churn():
+        # Edit 100 hosts: what save_new_host + _index_host cost per change
+        for h in list(hosts)[:100]:
+            search_index.add(h, hosts[h])
+            group_index.add(h, hosts[h])
+    _, results["reindex_100_edits"] = timed(churn, repeat)
+
+    if sqlite_path:
+        from rdp_sqlite import SqliteStore
+        store = SqliteStore(sqlite_path)
+        _, results["sqlite_query_page"] = timed(lambda: store.query_hosts(probe_dom, probe_grp)[:60], repeat)
+        _, results["sqlite_query_count"] = timed(lambda: len(store.query_hosts(probe_dom)), repeat)
+        _, results["sqlite_search"] = timed(lambda: store.query_hosts(search="sql s")[:60], repeat)
+        _, results["sqlite_sidebar_counts"] = timed(lambda: (store.domain_counts(), store.groups()), repeat)
+        store.close()
+    return results
+
+
+# ---- memory ----
+
+def traced_bytes(build):
+    """(result, bytes still allocated by build() when it returns)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(data):
+    """Resident size of the host map: plain dicts as json.loads builds them vs a HostTable"""
+    text = json.dumps(data["hosts"])
+    dicts, dict_bytes = traced_bytes(lambda: json.loads(text))
+    # Parsed afresh so the table pays for its own host name strings
+    table, table_bytes = traced_bytes(lambda: HostTable(json.loads(text)))
+    _, build = timed(lambda: HostTable(dicts), 1)
+    return {
+        "dict_mb": round(dict_bytes / 1e6, 1),
+        "host_table_mb": round(table_bytes / 1e6, 1),
+        "ratio": round(dict_bytes / table_bytes, 2) if table_bytes else None,
+        "host_table_build": build,
+        "round_trip_ok": table.to_dict() == dicts,
+    }
+
+
+# ---- grid rendering ----
+
+class _Xvfb:
+    """Starts a private Xvfb server when there is no display (Linux only)"""
+
+    def __init__(self):
+        self.proc = None
+
+    def __enter__(self):
+        if os.environ.get("DISPLAY") or not sys.platform.startswith("linux") or not shutil.which("Xvfb"):
+            return self
+        display = ":%d" % (90 + os.getpid() % 100)
+        self.proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1920x1080x24"],
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.environ["DISPLAY"] = display
+        time.sleep(0.5)
+        return self
+
+    def __exit__(self, *exc):
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait()
+            os.environ.pop("DISPLAY", None)
+
+
+class _CardOwner:
+    """The parts of App a HostCard uses; clicks are ignored in the benchmark"""
+
+    def __init__(self, ctk, status_color, card_views):
+        self.status_color = status_color
+        self.font_icon = ctk.CTkFont(size=22)
+        self.font_bold = ctk.CTkFont(size=14, weight="bold")
+        self.font_normal = ctk.CTkFont(size=12)
+        self.font_small = ctk.CTkFont(size=11, weight="bold")
+        self.font_menu = ctk.CTkFont(size=18, weight="bold")
+        self.card_views = card_views
+
+    def connect_to_host(self, host):
+        pass
+
+    def host_dot_color(self, host, status):
+        return self.status_color(status)
+
+    def host_trend(self, host):
+        return "", False
+
+    def show_context_menu(self, event, host):
+        pass
+
+
+def bench_grid(data, repeat):
+    try:
+        import customtkinter as ctk
+        root = ctk.CTk()
+    except Exception as e:
+        return {"skipped": f"no display or customtkinter: {e}"}
+
+    try:
+        import rdp_manager
+        hosts = data["hosts"]
+        ordered = SearchIndex(hosts).sorted_hosts()
+        owner = _CardOwner(ctk, rdp_manager.status_color, rdp_manager.CardViews())
+        root.geometry("1280x800")
+
+        def bind_card(card, host):
+            card.bind_host(host, hosts[host], None)
+
+        grid = rdp_manager.VirtualCardGrid(root, lambda parent: rdp_manager.HostCard(parent, owner), bind_card)
+        grid.pack(fill="both", expand=True)
+        root.update()
+
+        results = {}
+
+        def first_paint():
+            grid.set_hosts(ordered, 3)
+            root.update_idletasks()
+        _, results["set_hosts"] = timed(first_paint, repeat)
+        results["pooled_cards"] = len(grid.pool)
+
+        step = grid.row_height * 3
+        positions = [i * step for i in range(50)]
+
+        def scroll():
+            for y in positions:
+                grid.scroll_to(y)
+                root.update_idletasks()
+        _, stats = timed(scroll, repeat)
+        results["scroll_50_steps"] = stats
+        results["scroll_step_ms"] = round(stats["median_ms"] / len(positions), 3)
+        return results
+    finally:
+        root.destroy()
+
+
+# ---- probe waves ----
+
+class _Listeners:
+    """Local TCP servers the probe wave connects to: accept and close, or `handler` (an RDP stub)"""
+
+    def __init__(self, handler=None):
+        self.handler = handler
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        self.closed_port = None
+        self._server = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="bench-listeners", daemon=True)
+
+    def __enter__(self):
+        async def accept(reader, writer):
+            writer.close()
+
+        async def start():
+            # Bound to every interface so one port answers on all of 127.0.0.0/8, which
+            # gives each synthetic host its own loopback address and subnet
+            addr = "127.0.0.1" if sys.platform == "darwin" else "0.0.0.0"
+            self._server = await asyncio.start_server(self.handler or accept, addr, 0, backlog=4096)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(start(), self.loop).result()
+
+        # A port with nothing listening, for hosts that should come back offline
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        self.closed_port = s.getsockname()[1]
+        s.close()
+        return self
+
+    def __exit__(self, *exc):
+        async def stop():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(1.0)
+
+
+def wave_hosts(n, listeners, offline_every=10):
+    hosts = []
+    for i in range(n):
+        addr = "127.0.0.1" if sys.platform == "darwin" else f"127.{(i >> 16) & 255}.{(i >> 8) & 255}.{(i & 255) or 1}"
+        port = listeners.closed_port if i % offline_every == 0 else listeners.port
+        hosts.append(f"{addr}:{port}")
+    return list(dict.fromkeys(hosts))
+
+
+def bench_probe(n, concurrency, subnet_cap, timeout, mode="tcp"):
+    # rdp: every listener answers the X.224 handshake like a CredSSP server
+    with _Listeners(stub_handler() if mode == "rdp" else None) as listeners:
+        hosts = wave_hosts(n, listeners)
+        engine_cls = RdpProbeEngine if mode == "rdp" else TcpProbeEngine
+        engine = engine_cls(timeout=timeout, max_concurrency=concurrency)
+        engine.start()
+        done = threading.Event()
+        counts = {"online": 0, "offline": 0}
+        lock = threading.Lock()
+
+        async def worker(host):
+            result = await engine.probe(host)
+            with lock:
+                counts[result.status] += 1
+                if counts["online"] + counts["offline"] == len(hosts):
+                    done.set()
+
+        scheduler = ProbeScheduler(worker, max_workers=concurrency, loop=engine.loop, max_per_subnet=subnet_cap)
+        scheduler.start()
+        started = time.perf_counter()
+        scheduler.submit_wave(hosts)
+        finished = done.wait(max(30.0, len(hosts) / 500))
+        elapsed = time.perf_counter() - started
+        scheduler.shutdown()
+        engine.stop()
+
+    return {
+        "mode": mode,
+        "hosts": len(hosts),
+        "completed": finished,
+        "online": counts["online"],
+        "offline": counts["offline"],
+        "wave_ms": round(elapsed * 1000.0, 1),
+        "probes_per_s": round(len(hosts) / elapsed, 1),
+    }
+
+
+# ---- driver ----
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(sizes, only=BENCHMARKS, repeat=5, sqlite=False, concurrency=2000, subnet_cap=None, timeout=1.0, seed=42, log=print,
+        probe_mode="tcp"):
+    report = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="rdp_bench_") as workdir, _Xvfb():
+        for n in sizes:
+            data = generate_inventory(n, seed)
+            entry = report["results"][str(n)] = {}
+            if "storage" in only:
+                log(f"[{n}] storage")
+                entry["storage"] = bench_storage(data, workdir, repeat, sqlite)
+            if "filter" in only:
+                log(f"[{n}] filter")
+                db_path = os.path.join(workdir, f"bench_{n}.db") if sqlite and "storage" in only else None
+                entry["filter"] = bench_filter(data, repeat, db_path)
+            if "memory" in only:
+                log(f"[{n}] memory")
+                entry["memory"] = bench_memory(data)
+            if "grid" in only:
+                log(f"[{n}] grid")
+                entry["grid"] = bench_grid(data, repeat)
+            if "probe" in only:
+                log(f"[{n}] probe wave")
+                entry["probe"] = bench_probe(n, concurrency, subnet_cap, timeout, probe_mode)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RapidRDP benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="inventory sizes to generate")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (the median is reported)")
+    parser.add_argument("--sqlite", action="store_true", help="also benchmark the SQLite backend")
+    parser.add_argument("--concurrency", type=int, default=2000, help="max TCP probes in flight for the probe wave")
+    parser.add_argument("--subnet-cap", type=int, default=None, help="max probes in flight per /24 during the wave")
+    parser.add_argument("--timeout", type=float, default=1.0, help="TCP probe timeout in seconds")
+    parser.add_argument("--probe-mode", choices=("tcp", "rdp"), default="tcp",
+                        help="probe wave: plain TCP connects, or X.224 handshakes against an RDP stub")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.jsonl", help="file each run is appended to as one JSON line")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.only, max(1, args.repeat), args.sqlite, args.concurrency,
+                 args.subnet_cap, args.timeout, args.seed, log=lambda msg: print(msg, file=sys.stderr),
+                 probe_mode=args.probe_mode)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(report, separators=(",", ":")) + "\n")
+    print(json.dumps(report["results"], indent=2))
+    print(f"Appended results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""Credential provisioning: keeps TERMSRV/<host> vault entries in step with the inventory.
+
+CredentialSync compares the credentials the inventory wants against a ledger of
+what it last applied and only writes or deletes the entries that differ, on a
+small pool of worker threads. The vault itself sits behind a two-method store
+(`write`, `delete`): CmdkeyStore talks to Windows Credential Manager and
+MemoryCredentialStore is an in-process fake for testing.
+"""
+import base64
+import hashlib
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+
+from rdp_storage import write_atomic
+
+KEEP = object()  # Desired value for hosts whose credential is managed by hand (not by a domain)
+
+
+def credential_target(host):
+    return f"TERMSRV/{host}"
+
+
+def decode_password(encoded):
+    try:
+        return base64.b64decode(encoded.encode("utf-8")).decode("utf-8")
+    except Exception:
+        return ""
+
+
+def desired_credentials(data):
+    """host -> (user, password) for domain-backed hosts, KEEP for hosts with their own password.
+
+    Hosts with a domain get that domain's username and password. Hosts saved with a
+    custom username and password only ever have them in the vault, so they are
+    marked KEEP: left alone by sync() but deleted once the host is gone.
+    """
+    domains = data.get("domains", {})
+    creds = {}
+    for host, info in data.get("hosts", {}).items():
+        dom = info.get("domain")
+        if dom:
+            saved = domains.get(dom) or {}
+            user, pwd = saved.get("username"), decode_password(saved.get("password", ""))
+            if user and pwd:
+                creds[host] = (user, pwd)
+        elif info.get("has_password"):
+            creds[host] = KEEP
+    return creds
+
+
+class CredentialError(Exception):
+    pass
+
+
+class CmdkeyStore:
+    """Windows Credential Manager through cmdkey.exe (one short hidden process per call)"""
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("win")
+
+    def _run(self, args):
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        result = subprocess.run(["cmdkey"] + args, capture_output=True, text=True, startupinfo=startupinfo)
+        if result.returncode != 0:
+            raise CredentialError((result.stderr or result.stdout).strip())
+
+    def write(self, target, user, password):
+        self._run([f"/generic:{target}", f"/user:{user}", f"/pass:{password}"])
+
+    def delete(self, target):
+        try:
+            self._run([f"/delete:{target}"])
+        except CredentialError:
+            pass  # Already gone
+
+
+class MemoryCredentialStore:
+    """In-process stand-in for the vault; `delay` simulates slow calls, `fail` is a set of targets that error"""
+
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.entries = {}  # target -> (user, password)
+        self.calls = []    # ("write" | "delete", target), in completion order
+        self._lock = threading.Lock()
+
+    def _call(self, kind, target):
+        if self.delay:
+            time.sleep(self.delay)
+        if target in self.fail:
+            raise CredentialError(f"{kind} failed for {target}")
+        with self._lock:
+            self.calls.append((kind, target))
+
+    def write(self, target, user, password):
+        self._call("write", target)
+        with self._lock:
+            self.entries[target] = (user, password)
+
+    def delete(self, target):
+        self._call("delete", target)
+        with self._lock:
+            self.entries.pop(target, None)
+
+
+class CredentialSync:
+    """Applies credential writes and deletes on `workers` background threads.
+
+    A ledger (host -> fingerprint of the applied user and password) records what is
+    in the vault, so sync() only touches hosts that are new, changed or removed. The
+    ledger is kept in `state_path` (salted hashes, never passwords) so a restart does
+    not re-apply everything. Jobs are coalesced per host: if a host changes again
+    before its job has run, only the newest value is applied.
+
+    `on_progress(done, total, failed)` and `on_error(host, exc)` are called from the
+    worker threads. With `store=None` (no vault on this platform) nothing is ever
+    queued, so nothing can fail either.
+    """
+
+    def __init__(self, store, workers=8, state_path=None, on_progress=None, on_error=None):
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.state_path = state_path
+        self.on_progress = on_progress
+        self.on_error = on_error
+
+        self._cond = threading.Condition()
+        self._jobs = {}       # host -> (user, password) to write, or None to delete; arrival ordered
+        self._running = set()
+        self._threads = []
+        self._closed = False
+        self._to_plan = None  # Latest desired mapping (or function building it) waiting for the planner
+        self._planning = False
+        self._planner = None
+        self._salt, self.applied = self._load_state()
+
+        # Progress of the current batch; reset whenever the queue drains
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+
+    # ---- ledger ----
+
+    def _load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r") as f:
+                    state = json.load(f)
+                return bytes.fromhex(state["salt"]), dict(state["applied"])
+            except Exception as e:
+                print(f"Error reading credential state: {e}")
+        return secrets.token_bytes(16), {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._cond:
+            state = {"salt": self._salt.hex(), "applied": dict(self.applied)}
+        try:
+            write_atomic(self.state_path, json.dumps(state))
+        except OSError as e:
+            print(f"Error saving credential state: {e}")
+
+    def fingerprint(self, user, password):
+        h = hashlib.blake2b(key=self._salt, digest_size=16)
+        h.update(f"{user}\0{password}".encode("utf-8"))
+        return h.hexdigest()
+
+    # ---- planning ----
+
+    def plan(self, desired):
+        """(writes, deletes) needed to move the vault from the ledger to `desired`"""
+        with self._cond:
+            applied = dict(self.applied)
+            # A queued job is as good as applied for planning purposes
+            for host, job in self._jobs.items():
+                if job is None:
+                    applied.pop(host, None)
+                else:
+                    applied[host] = self.fingerprint(*job)
+        writes = {}
+        for host, cred in desired.items():
+            if cred is KEEP:
+                continue
+            if applied.get(host) != self.fingerprint(*cred):
+                writes[host] = cred
+        deletes = [h for h in applied if h not in desired]
+        return writes, deletes
+
+    def sync(self, desired):
+        """Queues whatever is needed to match `desired` (see desired_credentials), in the background.
+
+        Planning hashes every host, so it runs on a planner thread; `desired` may be a
+        function returning the mapping so building it runs there too. A sync() that
+        has not been planned yet is replaced by a newer one.
+        """
+        if self.store is None:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CredentialSync is closed")
+            self._to_plan = desired
+            if self._planner is None:
+                self._planner = threading.Thread(target=self._plan_loop, name="cred-sync-plan", daemon=True)
+                self._planner.start()
+            self._cond.notify_all()
+
+    def _plan_loop(self):
+        while True:
+            with self._cond:
+                while self._to_plan is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                desired, self._to_plan = self._to_plan, None
+                self._planning = True
+            try:
+                if callable(desired):
+                    desired = desired()
+                writes, deletes = self.plan(desired)
+                for host, cred in writes.items():
+                    self._submit(host, cred)
+                for host in deletes:
+                    self._submit(host, None)
+            except Exception as e:
+                print(f"Error planning credential sync: {e}")
+            finally:
+                with self._cond:
+                    self._planning = False
+                    self._cond.notify_all()
+
+    def set_host(self, host, user, password):
+        """Applies one host's credential now, e.g. a newly added host"""
+        self._submit(host, (user, password))
+
+    def remove_host(self, host):
+        self._submit(host, None)
+
+    # ---- workers ----
+
+    def _submit(self, host, job):
+        if self.store is None:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CredentialSync is closed")
+            if host not in self._jobs:
+                self.total += 1
+            self._jobs.pop(host, None)
+            self._jobs[host] = job
+            self._start()
+            self._cond.notify()
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._run, name=f"cred-sync-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _next_job(self):
+        # Oldest host that is not already being written by another worker
+        for host in self._jobs:
+            if host not in self._running:
+                return host, self._jobs.pop(host)
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                host, job = self._next_job()
+                while host is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    host, job = self._next_job()
+                self._running.add(host)
+
+            target = credential_target(host)
+            error = None
+            try:
+                if job is None:
+                    self.store.delete(target)
+                else:
+                    self.store.write(target, *job)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._running.discard(host)
+                if error is None:
+                    if job is None:
+                        self.applied.pop(host, None)
+                    else:
+                        self.applied[host] = self.fingerprint(*job)
+                else:
+                    self.failed += 1
+                self.done += 1
+                progress = (self.done, self.total, self.failed)
+                idle = not self._jobs and not self._running
+                if idle:
+                    self.total = self.done = self.failed = 0
+                self._cond.notify_all()
+
+            if error is not None and self.on_error:
+                self.on_error(host, error)
+            if self.on_progress:
+                self.on_progress(*progress)
+            if idle:
+                self._save_state()
+
+    # ---- waiting / shutdown ----
+
+    def _idle(self):
+        return not (self._jobs or self._running or self._to_plan is not None or self._planning)
+
+    def busy(self):
+        with self._cond:
+            return not self._idle()
+
+    def wait(self, timeout=None):
+        """Blocks until every sync() is planned and every queued job has run. Returns False on timeout"""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._idle():
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        """Finishes queued jobs (up to `timeout` seconds), saves the ledger and stops the workers"""
+        self.wait(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads + ([self._planner] if self._planner else []):
+            t.join(0.5)
+        self._save_state()
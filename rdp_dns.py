@@ -0,0 +1,201 @@
+"""Shared DNS cache: host names are resolved once per TTL instead of once per probe.
+
+Lookups run on a bounded thread pool (getaddrinfo blocks), concurrent lookups of
+the same name share one resolution, failures are cached with a shorter TTL, and
+entries close to expiry are refreshed in the background while the cached address
+keeps being served.
+
+getaddrinfo does not report record TTLs, so `ttl` is a fixed, configured lifetime.
+"""
+import asyncio
+import concurrent.futures
+import ipaddress
+import socket
+import threading
+import time
+
+from rdp_metrics import DISABLED
+
+
+def is_ip_literal(name):
+    try:
+        ipaddress.ip_address(name)
+        return True
+    except ValueError:
+        return False
+
+
+def system_resolve(name):
+    """First address getaddrinfo returns for name; raises socket.gaierror when it does not resolve"""
+    infos = socket.getaddrinfo(name, None, type=socket.SOCK_STREAM)
+    return infos[0][4][0]
+
+
+class DnsCache:
+    """Thread-safe name -> address cache shared by the probe engines and the launcher.
+
+    resolve() blocks (for worker threads), resolve_async() can be awaited on any
+    event loop, and peek() only reads the cache. A name that does not resolve is
+    returned as None. IP literals are passed through without touching the cache.
+    `resolver(name)` does the actual lookup (system_resolve by default).
+    """
+
+    def __init__(self, ttl=300.0, negative_ttl=30.0, refresh_ahead=0.2, max_concurrency=32,
+                 max_entries=100000, resolver=system_resolve, registry=DISABLED):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead  # Fraction of the TTL left when a background refresh starts
+        self.max_entries = max_entries
+        self.resolver = resolver
+
+        self._lock = threading.Lock()
+        self._entries = {}   # name -> (address or None, expires_at, refresh_at)
+        self._inflight = {}  # name -> concurrent.futures.Future of the running lookup
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="dns")
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+        self._m_lookups = registry.counter("dns_lookups_total", "Name lookups by cache outcome", labels=("result",))
+        self._m_seconds = registry.histogram("dns_resolve_seconds", "Time for one uncached name resolution")
+        registry.gauge("dns_cache_entries", "Names held in the DNS cache", fn=lambda: len(self._entries))
+
+    # ---- lookups ----
+
+    def _lookup(self, name, now):
+        """(address, future): a cached answer, or the future of the lookup to wait for"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[1] > now:
+                address, _, refresh_at = entry
+                if address is None:
+                    self.negative_hits += 1
+                    result = "negative_hit"
+                else:
+                    self.hits += 1
+                    result = "hit"
+                    if now >= refresh_at and name not in self._inflight:
+                        self.refreshes += 1
+                        self._start(name)
+            else:
+                self.misses += 1
+                result = "miss"
+                future = self._inflight.get(name) or self._start(name)
+        self._m_lookups.labels(result).inc()
+        if result == "miss":
+            return None, future
+        return address, None
+
+    def _start(self, name):
+        # Caller holds the lock
+        future = self._executor.submit(self._resolve, name)
+        self._inflight[name] = future
+        return future
+
+    def _resolve(self, name):
+        started = time.perf_counter()
+        address = None
+        try:
+            address = self.resolver(name)
+        except (OSError, UnicodeError):
+            pass  # NXDOMAIN and resolver errors alike; retried after negative_ttl
+        except Exception as e:
+            print(f"DNS lookup for {name} failed: {e}")
+        finally:
+            # Whatever happened, the name must leave _inflight or nobody would look it up again
+            self._m_seconds.observe(time.perf_counter() - started)
+            now = time.monotonic()
+            ttl = self.ttl if address is not None else self.negative_ttl
+            with self._lock:
+                if address is None:
+                    self.failures += 1
+                if len(self._entries) >= self.max_entries and name not in self._entries:
+                    self._purge(now)
+                self._entries[name] = (address, now + ttl, now + ttl * (1 - self.refresh_ahead))
+                self._inflight.pop(name, None)
+        return address
+
+    def _purge(self, now):
+        """Drops expired entries, or the oldest half when nothing has expired (caller holds the lock)"""
+        live = {k: v for k, v in self._entries.items() if v[1] > now}
+        if len(live) >= self.max_entries:
+            keep = sorted(live.items(), key=lambda kv: kv[1][1])[len(live) // 2:]
+            live = dict(keep)
+        self._entries = live
+
+    def resolve(self, name, timeout=None, pending=None):
+        """Address for name, None if it does not resolve. `pending` (None by default) if
+        the lookup has not finished within `timeout` seconds; it keeps running"""
+        if is_ip_literal(name):
+            return name
+        address, future = self._lookup(name, time.monotonic())
+        if future is None:
+            return address
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            return pending
+
+    async def resolve_async(self, name, timeout=None, pending=None):
+        """resolve() for coroutines; the loop keeps running while the lookup is in progress"""
+        if is_ip_literal(name):
+            return name
+        address, future = self._lookup(name, time.monotonic())
+        if future is None:
+            return address
+        try:
+            # shield: a timed-out waiter must not cancel the lookup other callers share
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            return pending
+
+    def peek(self, name):
+        """Cached address for name without resolving or counting a lookup; None when unknown"""
+        if is_ip_literal(name):
+            return name
+        entry = self._entries.get(name)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def prefetch(self, names):
+        """Starts lookups for names that are neither cached nor in flight (e.g. a new inventory)"""
+        now = time.monotonic()
+        started = 0
+        with self._lock:
+            for name in names:
+                if is_ip_literal(name) or name in self._inflight:
+                    continue
+                entry = self._entries.get(name)
+                if entry is None or entry[1] <= now:
+                    self._start(name)
+                    started += 1
+        return started
+
+    def invalidate(self, name=None):
+        """Forgets one name, or every name"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "in_flight": len(self._inflight),
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
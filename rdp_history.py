@@ -0,0 +1,176 @@
+"""Per-host probe history: round-trip times in fixed-size rings over one flat array.
+
+Each host owns a slot of `capacity` unsigned 16-bit samples in tenths of a
+millisecond, so 50k hosts x 240 samples take about 24 MB and no per-sample
+Python objects exist. Two reserved values mark a lost probe and a success
+without a measured RTT (ICMP mode).
+"""
+import array
+import math
+import threading
+import time
+
+LOST = 0xFFFF       # Probe failed (offline / timeout)
+NO_RTT = 0xFFFE     # Probe succeeded but no round-trip time was measured
+MAX_RTT = 0xFFFD    # Longer RTTs are clipped to this (about 6.5 s)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+SPARK_LOST = "·"
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest rank
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class LatencyHistory:
+    """Thread-safe RTT rings for every host, with summaries, sparklines and a degraded verdict.
+
+    record() is called from probe threads. Hosts whose history changed are
+    remembered until drain_changed() hands them to the UI, which then repaints only
+    those cards. A host is degraded when, over its last `window` samples, loss is at
+    least `degraded_loss` percent or the p95 RTT is at least `degraded_p95_ms`.
+    """
+
+    def __init__(self, capacity=240, window=20, degraded_loss=20.0, degraded_p95_ms=250.0):
+        self.capacity = capacity
+        self.window = min(window, capacity)
+        self.degraded_loss = degraded_loss
+        self.degraded_p95_ms = degraded_p95_ms
+
+        self._lock = threading.Lock()
+        self._slots = {}                     # host -> slot index
+        self._free = []                      # Slots released by forget()
+        self._samples = array.array("H")     # capacity samples per slot
+        self._head = array.array("H")        # Next write position per slot
+        self._count = array.array("H")       # Samples held per slot (<= capacity)
+        self._changed_at = array.array("d")  # time.time() of the last online/offline flip per slot
+        self._status = bytearray()           # Last status per slot: 0 none, 1 online, 2 offline
+        self._changed = set()                # Hosts recorded since the last drain_changed()
+
+    def _slot(self, host):
+        # Caller holds the lock
+        slot = self._slots.get(host)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+            self._samples[slot * self.capacity:(slot + 1) * self.capacity] = array.array("H", bytes(2 * self.capacity))
+            self._head[slot] = self._count[slot] = 0
+            self._changed_at[slot] = 0.0
+            self._status[slot] = 0
+        else:
+            slot = len(self._head)
+            self._samples.frombytes(bytes(2 * self.capacity))
+            self._head.append(0)
+            self._count.append(0)
+            self._changed_at.append(0.0)
+            self._status.append(0)
+        self._slots[host] = slot
+        return slot
+
+    def record(self, host, status, latency_ms=None, now=None):
+        if status == "online":
+            value = NO_RTT if latency_ms is None else min(MAX_RTT, int(latency_ms * 10 + 0.5))
+            code = 1
+        else:
+            value, code = LOST, 2
+        with self._lock:
+            slot = self._slot(host)
+            head = self._head[slot]
+            self._samples[slot * self.capacity + head] = value
+            self._head[slot] = (head + 1) % self.capacity
+            if self._count[slot] < self.capacity:
+                self._count[slot] += 1
+            if self._status[slot] != code:
+                self._status[slot] = code
+                self._changed_at[slot] = time.time() if now is None else now
+            self._changed.add(host)
+
+    def _raw(self, host, last=None):
+        """Stored values oldest first, at most `last` of them (caller holds the lock)"""
+        slot = self._slots.get(host)
+        if slot is None:
+            return []
+        count, head = self._count[slot], self._head[slot]
+        n = count if last is None else min(last, count)
+        base = slot * self.capacity
+        start = (head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self._samples[base + start:base + start + n].tolist()
+        return (self._samples[base + start:base + self.capacity] + self._samples[base:base + (start + n) % self.capacity]).tolist()
+
+    def samples(self, host, last=None):
+        """RTTs in ms oldest first; None marks a lost probe, 0.0 a success without RTT"""
+        with self._lock:
+            raw = self._raw(host, last)
+        return [None if v == LOST else 0.0 if v == NO_RTT else v / 10.0 for v in raw]
+
+    def summary(self, host, last=None):
+        """{'count', 'loss_pct', 'p50_ms', 'p95_ms', 'last_ms', 'last_change'} or None for unknown hosts"""
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                return None
+            raw = self._raw(host, last)
+            changed_at = self._changed_at[slot]
+        if not raw:
+            return None
+        lost = sum(1 for v in raw if v == LOST)
+        rtts = sorted(v / 10.0 for v in raw if v < NO_RTT)
+        last_v = raw[-1]
+        return {
+            "count": len(raw),
+            "loss_pct": round(100.0 * lost / len(raw), 1),
+            "p50_ms": _percentile(rtts, 0.5),
+            "p95_ms": _percentile(rtts, 0.95),
+            "last_ms": last_v / 10.0 if last_v < NO_RTT else None,
+            "last_change": changed_at or None,
+        }
+
+    def degraded(self, host):
+        """True for a host that answers but loses probes or is slow over the recent window"""
+        s = self.summary(host, self.window)
+        if s is None or s["count"] < 3:
+            return False
+        if s["loss_pct"] >= self.degraded_loss:
+            return True
+        return s["p95_ms"] is not None and s["p95_ms"] >= self.degraded_p95_ms
+
+    def sparkline(self, host, width=12):
+        """The last `width` samples as block characters scaled to their own maximum"""
+        with self._lock:
+            raw = self._raw(host, width)
+        top = max((v for v in raw if v < NO_RTT), default=0)
+        chars = []
+        for v in raw:
+            if v == LOST:
+                chars.append(SPARK_LOST)
+            elif v == NO_RTT or not top:
+                chars.append(SPARK_CHARS[0])
+            else:
+                chars.append(SPARK_CHARS[min(len(SPARK_CHARS) - 1, v * len(SPARK_CHARS) // (top + 1))])
+        return "".join(chars)
+
+    def drain_changed(self):
+        """Hosts recorded since the previous call"""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def forget(self, host):
+        with self._lock:
+            slot = self._slots.pop(host, None)
+            if slot is not None:
+                self._free.append(slot)
+            self._changed.discard(host)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def memory_bytes(self):
+        """Approximate size of the sample storage (the arrays, not the host name map)"""
+        with self._lock:
+            return sum(a.buffer_info()[1] * a.itemsize for a in (self._samples, self._head, self._count, self._changed_at)) + len(self._status)
@@ -0,0 +1,300 @@
+"""Compact in-memory host table: one row of columns per host instead of one dict each.
+
+HostTable is a drop-in mapping of host -> info: reading a host returns a
+HostRecord, a read-only view that behaves like the v3 info dict ({"domain",
+"group", "desc", "username", "has_password"} plus any other keys), and assigning
+a dict stores it column-wise. Domains and groups are interned into small integer
+IDs, repeated descriptions and usernames are shared, a description equal to the
+group (the default) is not stored at all, and each host's probe status is one
+byte. dict(record) and to_dict() give back the exact v3 layout.
+"""
+import array
+from collections.abc import Mapping, MutableMapping
+
+# Presence bits per row, so records round-trip exactly the keys they were given
+_DOMAIN = 0x01
+_GROUP = 0x02
+_DESC = 0x04
+_USERNAME = 0x08
+_HAS_PASSWORD = 0x10
+_PASSWORD_SET = 0x20  # Value of has_password
+
+FIELDS = ("domain", "group", "desc", "username", "has_password")
+
+class _SameAsGroup:
+    """desc placeholder: the description is the group name. Pickles by reference, so the
+    identity check still holds in a table loaded from the startup cache"""
+
+    def __reduce__(self):
+        return "_SAME_AS_GROUP"
+
+
+_SAME_AS_GROUP = _SameAsGroup()
+
+STATUS_CODES = {"pending": 1, "online": 2, "offline": 3}
+STATUS_NAMES = (None, "pending", "online", "offline")
+
+
+class Interner:
+    """Maps values to small integer IDs; ID 0 is None"""
+
+    def __init__(self):
+        self.values = [None]
+        self.ids = {None: 0}
+
+    def id(self, value):
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def __len__(self):
+        return len(self.values) - 1
+
+    def copy(self):
+        new = Interner()
+        new.values = list(self.values)
+        new.ids = dict(self.ids)
+        return new
+
+
+class HostRecord(Mapping):
+    """Read-only view of one row of a HostTable; use dict(record) for a detached copy.
+
+    Once its host is deleted the view is empty, even if a new host reuses the row.
+    """
+
+    __slots__ = ("_table", "_row", "_host")
+
+    def __init__(self, table, row, host):
+        self._table = table
+        self._row = row
+        self._host = host
+
+    def _flags(self):
+        """The row's presence bits, None once the host has been deleted"""
+        t = self._table
+        return t._flags[self._row] if t._rows.get(self._host) == self._row else None
+
+    def __getitem__(self, key):
+        t, r = self._table, self._row
+        flags = self._flags()
+        if flags is None:
+            raise KeyError(key)
+        if key == "domain" and flags & _DOMAIN:
+            return t.domains.values[t._domain[r]]
+        if key == "group" and flags & _GROUP:
+            return t.groups.values[t._group[r]]
+        if key == "desc" and flags & _DESC:
+            desc = t._desc[r]
+            return t.groups.values[t._group[r]] if desc is _SAME_AS_GROUP else desc
+        if key == "username" and flags & _USERNAME:
+            return t._username[r]
+        if key == "has_password" and flags & _HAS_PASSWORD:
+            return bool(flags & _PASSWORD_SET)
+        extra = t._extra.get(r)
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        flags = self._flags()
+        if flags is None:
+            return
+        for bit, key in ((_DOMAIN, "domain"), (_GROUP, "group"), (_DESC, "desc"), (_USERNAME, "username"), (_HAS_PASSWORD, "has_password")):
+            if flags & bit:
+                yield key
+        yield from self._table._extra.get(self._row, ())
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class StatusColumn(MutableMapping):
+    """host -> "pending" / "online" / "offline", one byte per HostTable row. Only hosts in the table can have one"""
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, host):
+        code = self._table._status[self._table._rows[host]]
+        if not code:
+            raise KeyError(host)
+        return STATUS_NAMES[code]
+
+    def __setitem__(self, host, status):
+        self._table._status[self._table._rows[host]] = STATUS_CODES[status]
+
+    def __delitem__(self, host):
+        row = self._table._rows.get(host)
+        if row is None or not self._table._status[row]:
+            raise KeyError(host)
+        self._table._status[row] = 0
+
+    def __iter__(self):
+        status = self._table._status
+        return iter([h for h, r in list(self._table._rows.items()) if status[r]])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class HostTable(MutableMapping):
+    """host -> info mapping stored as columns (see the module docstring)"""
+
+    def __init__(self, hosts=None):
+        self.domains = Interner()
+        self.groups = Interner()
+        self._strings = {}            # Shared copies of repeated descriptions and usernames
+        self._rows = {}               # host -> row
+        self._free = []               # Rows released by deletes
+        self._domain = array.array("I")
+        self._group = array.array("I")
+        self._desc = []               # str, None, or _SAME_AS_GROUP
+        self._username = []
+        self._flags = bytearray()
+        self._status = bytearray()    # STATUS_CODES value, 0 = unknown
+        self._extra = {}              # row -> {key: value} for keys outside FIELDS
+        self.statuses = StatusColumn(self)
+        if hosts:
+            self.update(hosts)
+
+    def _share(self, value):
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+    def _new_row(self):
+        if self._free:
+            return self._free.pop()
+        self._domain.append(0)
+        self._group.append(0)
+        self._desc.append(None)
+        self._username.append(None)
+        self._flags.append(0)
+        self._status.append(0)
+        return len(self._flags) - 1
+
+    def __getitem__(self, host):
+        return HostRecord(self, self._rows[host], host)
+
+    def __setitem__(self, host, info):
+        row = self._rows.get(host)
+        if row is None:
+            row = self._rows[host] = self._new_row()
+        flags = 0
+        known = 0
+        domain_id = group_id = 0
+        desc = username = None
+        if "domain" in info:
+            flags |= _DOMAIN
+            domain_id = self.domains.id(info["domain"])
+            known += 1
+        if "group" in info:
+            flags |= _GROUP
+            group_id = self.groups.id(info["group"])
+            known += 1
+        if "desc" in info:
+            flags |= _DESC
+            desc = info["desc"]
+            if flags & _GROUP and desc == self.groups.values[group_id] and isinstance(desc, str):
+                desc = _SAME_AS_GROUP
+            elif isinstance(desc, str):
+                desc = self._share(desc)
+            known += 1
+        if "username" in info:
+            flags |= _USERNAME
+            username = self._share(info["username"])
+            known += 1
+        has_password = info.get("has_password")
+        if isinstance(has_password, bool):
+            flags |= _HAS_PASSWORD | (_PASSWORD_SET if has_password else 0)
+            known += 1
+        self._domain[row] = domain_id
+        self._group[row] = group_id
+        self._desc[row] = desc
+        self._username[row] = username
+        self._flags[row] = flags
+        if len(info) > known:
+            # Keys this table has no column for (or a has_password that is not a bool)
+            self._extra[row] = {k: v for k, v in info.items() if k not in FIELDS or (k == "has_password" and not flags & _HAS_PASSWORD)}
+        else:
+            self._extra.pop(row, None)
+
+    def __delitem__(self, host):
+        row = self._rows.pop(host)
+        self._desc[row] = self._username[row] = None
+        self._flags[row] = self._status[row] = 0
+        self._extra.pop(row, None)
+        self._free.append(row)
+
+    def __contains__(self, host):
+        return host in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __getstate__(self):
+        # Statuses are this session's probe results, not inventory; a table restored
+        # from the startup cache starts unknown and gets the last-known ones separately
+        state = self.__dict__.copy()
+        state["_status"] = bytearray(len(self._status))
+        return state
+
+    def keys(self):
+        """A snapshot list of the hosts. list() of a dict is one C call, so another thread
+        adding or deleting hosts cannot break the copy (a KeysView iterates in Python)"""
+        return list(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def copy(self):
+        """An independent table with the same rows; copies whole columns, so no per-host work"""
+        new = HostTable()
+        new.domains = self.domains.copy()
+        new.groups = self.groups.copy()
+        new._strings = dict(self._strings)
+        new._rows = dict(self._rows)
+        new._free = list(self._free)
+        new._domain = self._domain[:]
+        new._group = self._group[:]
+        new._desc = list(self._desc)
+        new._username = list(self._username)
+        new._flags = bytearray(self._flags)
+        new._status = bytearray(self._status)
+        new._extra = {row: dict(extra) for row, extra in self._extra.items()}
+        return new
+
+    def to_dict(self):
+        """Plain v3 {host: info} dicts"""
+        return {host: dict(HostRecord(self, row, host)) for host, row in self._rows.items()}
+
+    def __repr__(self):
+        return f"<HostTable {len(self)} hosts, {len(self.domains)} domains, {len(self.groups)} groups>"
+
+
+def json_default(obj):
+    """json.dumps(..., default=json_default) writes HostTables and HostRecords as plain v3 JSON"""
+    if isinstance(obj, HostTable):
+        return obj.to_dict()
+    if isinstance(obj, HostRecord):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def compact_inventory(data):
+    """Swaps an inventory's hosts dict for a HostTable, in place; returns data"""
+    if not isinstance(data.get("hosts"), HostTable):
+        data["hosts"] = HostTable(data.get("hosts", {}))
+    return data
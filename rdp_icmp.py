@@ -0,0 +1,248 @@
+"""ICMP echo sweeps through one socket instead of one ping process per host.
+
+On Linux an unprivileged ICMP datagram socket is used when
+net.ipv4.ping_group_range allows it (the kernel then owns the identifier and
+fills in checksums); otherwise a raw socket, which needs root or CAP_NET_RAW.
+Replies are matched to requests by sequence number (and identifier on raw
+sockets), so thousands of echoes can be outstanding at once.
+"""
+import asyncio
+import itertools
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+from rdp_probe import DNS_TIMEOUT, LOOKUP_PENDING, UNKNOWN, ProbeResult, split_host_port
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+_HEADER = struct.Struct("!BBHHH")  # type, code, checksum, identifier, sequence
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def echo_request(ident, seq, payload=b"rapidrdp", v6=False):
+    kind = ICMPV6_ECHO_REQUEST if v6 else ICMP_ECHO_REQUEST
+    header = _HEADER.pack(kind, 0, 0, ident, seq)
+    if v6:
+        return header + payload  # The kernel fills in ICMPv6 checksums
+    return _HEADER.pack(kind, 0, checksum(header + payload), ident, seq) + payload
+
+
+def open_icmp_socket(family=socket.AF_INET):
+    """(socket, raw): an unprivileged datagram socket if allowed, else a raw one. Raises OSError"""
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    try:
+        return socket.socket(family, socket.SOCK_DGRAM, proto), False
+    except OSError:
+        return socket.socket(family, socket.SOCK_RAW, proto), True
+
+
+def icmp_sweep_available():
+    """None if this process can send ICMP echoes through a socket, else the reason it cannot"""
+    if not sys.platform.startswith("linux"):
+        return "ICMP sweeps need Linux"
+    try:
+        sock, _ = open_icmp_socket()
+    except OSError as e:
+        return str(e)
+    sock.close()
+    return None
+
+
+class _Channel:
+    """One ICMP socket of one address family and the echoes waiting on it"""
+
+    def __init__(self, family, loop, on_packet):
+        self.v6 = family == socket.AF_INET6
+        self.sock, self.raw = open_icmp_socket(family)
+        self.sock.setblocking(False)
+        # Room for a burst of replies (the kernel caps this at net.core.rmem_max)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+        # Raw sockets see every ICMP packet on the host, so our identifier must be
+        # distinct; datagram sockets get one from the kernel (their local port).
+        self.ident = os.getpid() & 0xFFFF if self.raw else 0
+        self.loop = loop
+        loop.add_reader(self.sock.fileno(), on_packet, self)
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+
+class IcmpProbeEngine:
+    """Echo probes for any number of hosts over one socket per address family.
+
+    Same interface as rdp_probe.TcpProbeEngine: probe() / probe_many() are
+    coroutines on the engine's event loop (start() runs one on a background
+    thread), and `host:port` entries are pinged at their host. latency_ms is the
+    echo round-trip time. With a `resolver` (see rdp_dns.DnsCache) names are
+    looked up through the shared cache, within `dns_timeout` (else status UNKNOWN).
+
+    Echoes are paced at `rate` per second: sent all at once, a few thousand
+    replies overflow the socket's receive buffer before the loop can read them.
+    """
+
+    def __init__(self, timeout=1.0, max_concurrency=5000, resolver=None, rate=5000, dns_timeout=DNS_TIMEOUT):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.resolver = resolver
+        self.dns_timeout = dns_timeout
+        self.rate = rate
+        self._next_send = 0.0
+        self.loop = None
+        self._thread = None
+        self._sem = None
+        self._channels = {}  # family -> _Channel
+        self._pending = {}   # (family, seq) -> (future, address, sent_at)
+        self._seq = itertools.count()
+
+        # Counters, handy when checking for lost or stray replies
+        self.sent = 0
+        self.received = 0
+        self.stray = 0
+
+    def start(self):
+        if self.loop is not None:
+            return self.loop
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="icmp-probe-loop", daemon=True)
+        self._thread.start()
+        return self.loop
+
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(1.0)
+        self.loop = None
+        self._thread = None
+
+    def close(self):
+        """Closes the sockets (call on the engine's loop)"""
+        for channel in self._channels.values():
+            channel.close()
+        self._channels.clear()
+
+    def _channel(self, family):
+        channel = self._channels.get(family)
+        if channel is None:
+            channel = self._channels[family] = _Channel(family, asyncio.get_running_loop(), self._on_packet)
+        return channel
+
+    def _next_seq(self, family):
+        # 16-bit sequence numbers; skip any still waiting for a reply
+        for _ in range(0x10000):
+            seq = next(self._seq) & 0xFFFF
+            if (family, seq) not in self._pending:
+                return seq
+        raise OSError("too many echoes outstanding")
+
+    def _on_packet(self, channel):
+        while True:
+            try:
+                packet, addr = channel.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received_at = time.perf_counter()
+            if channel.raw and not channel.v6:
+                packet = packet[(packet[0] & 0x0F) * 4:]  # Raw IPv4 sockets include the IP header
+            if len(packet) < _HEADER.size:
+                continue
+            kind, _, _, ident, seq = _HEADER.unpack_from(packet)
+            if kind != (ICMPV6_ECHO_REPLY if channel.v6 else ICMP_ECHO_REPLY):
+                continue
+            if channel.raw and ident != channel.ident:
+                continue  # Someone else's ping
+            family = socket.AF_INET6 if channel.v6 else socket.AF_INET
+            entry = self._pending.get((family, seq))
+            if entry is None or entry[1] != addr[0]:
+                self.stray += 1
+                continue
+            del self._pending[(family, seq)]
+            self.received += 1
+            future, _, sent_at = entry
+            if not future.done():
+                future.set_result((received_at - sent_at) * 1000.0)
+
+    async def _pace(self):
+        if not self.rate:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_send)
+        self._next_send = slot + 1.0 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _address(self, name):
+        if self.resolver is not None:
+            return await self.resolver.resolve_async(name, self.dns_timeout, pending=LOOKUP_PENDING)
+        try:
+            infos = await asyncio.wait_for(asyncio.get_running_loop().getaddrinfo(name, None, type=socket.SOCK_RAW), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        return infos[0][4][0]
+
+    async def probe(self, host):
+        """Returns a ProbeResult; the host is 'online' when its echo reply arrives within `timeout`"""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        name, _ = split_host_port(host)
+        address = await self._address(name)
+        if address is LOOKUP_PENDING:
+            return ProbeResult(host, UNKNOWN, None)
+        if address is None:
+            return ProbeResult(host, "offline", None)
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+
+        async with self._sem:
+            await self._pace()
+            channel = self._channel(family)
+            seq = self._next_seq(family)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[(family, seq)] = (future, address, time.perf_counter())
+            packet = echo_request(channel.ident, seq, v6=channel.v6)
+            try:
+                while True:
+                    try:
+                        channel.sock.sendto(packet, (address, 0))
+                        break
+                    except BlockingIOError:
+                        await asyncio.sleep(0.001)  # Send buffer full; replies are being drained meanwhile
+                self.sent += 1
+                rtt = await asyncio.wait_for(future, self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                return ProbeResult(host, "offline", None)
+            finally:
+                self._pending.pop((family, seq), None)
+        return ProbeResult(host, "online", rtt)
+
+    async def probe_many(self, hosts, on_result=None):
+        """Sends echoes to all hosts in one pass, calling on_result as each reply or timeout lands"""
+        results = []
+        for fut in asyncio.as_completed([self.probe(h) for h in hosts]):
+            result = await fut
+            results.append(result)
+            if on_result:
+                on_result(result)
+        return results
+
+    def probe_blocking(self, host):
+        """Thread-safe helper for callers outside the loop (requires start())"""
+        return asyncio.run_coroutine_threadsafe(self.probe(host), self.loop).result()
@@ -0,0 +1,268 @@
+"""Bulk import of hosts from CSV or JSON exports.
+
+Records are streamed from the file, validated, normalized to the inventory's
+`host` / `host:port` form and deduplicated, producing an ImportPlan that the
+caller applies as one batch (one store write, one index update, one refresh).
+
+Accepted inputs:
+  * CSV with a header row; columns host (or hostname/address/ip/computer), port,
+    domain, group, desc (or description), username (or user)
+  * JSON array of such objects, NDJSON (.ndjson/.jsonl), or a v3 inventory /
+    {host: info} mapping
+"""
+import csv
+import ipaddress
+import json
+import re
+
+from rdp_probe import DEFAULT_RDP_PORT, split_host_port
+
+HOST_FIELDS = ("host", "hostname", "address", "ip", "computer", "computername", "dnshostname", "name")
+FIELD_ALIASES = {
+    "port": ("port", "rdp_port"),
+    "domain": ("domain",),
+    "group": ("group", "groups", "folder"),
+    "desc": ("desc", "description", "comment"),
+    "username": ("username", "user", "login"),
+}
+
+_LABEL = re.compile(r"^(?!-)[A-Za-z0-9_-]{1,63}(?<!-)$")
+
+
+class InvalidRecord(ValueError):
+    """A record that cannot be imported; carries the reason shown to the user"""
+
+
+def _is_hostname(name):
+    if len(name) > 253:
+        return False
+    return all(_LABEL.match(label) for label in name.rstrip(".").split("."))
+
+
+def normalize_host(raw, port=None):
+    """Canonical inventory key for a host and optional port: 'name', 'name:port' or '[v6]:port'.
+
+    Accepts 'name', 'name:port', bare IPv6 and '[v6]:port'. The default RDP port is
+    dropped. Raises InvalidRecord for anything that is not a valid hostname or IP.
+    """
+    text = (raw or "").strip()
+    if not text:
+        raise InvalidRecord("missing host")
+    if "://" in text:
+        raise InvalidRecord(f"not a host name: {text}")
+
+    name, embedded = text, None
+    if text.startswith("["):
+        name, _, rest = text[1:].partition("]")
+        if rest:
+            if not rest.startswith(":"):
+                raise InvalidRecord(f"bad address: {text}")
+            embedded = rest[1:]
+    elif text.count(":") == 1:
+        name, embedded = text.split(":")
+
+    if port not in (None, ""):
+        if embedded is not None and str(embedded) != str(port).strip():
+            raise InvalidRecord(f"conflicting ports for {text}")
+        embedded = str(port).strip()
+    if embedded is not None:
+        if not embedded.isdigit() or not 0 < int(embedded) < 65536:
+            raise InvalidRecord(f"bad port: {embedded}")
+        embedded = int(embedded)
+
+    try:
+        ip = ipaddress.ip_address(name)
+        name = str(ip)  # Canonical form, e.g. compressed IPv6
+        v6 = ip.version == 6
+    except ValueError:
+        if not _is_hostname(name):
+            raise InvalidRecord(f"bad host name: {name}")
+        name = name.rstrip(".").lower()
+        v6 = False
+
+    if embedded is None or embedded == DEFAULT_RDP_PORT:
+        return name
+    return f"[{name}]:{embedded}" if v6 else f"{name}:{embedded}"
+
+
+def host_key(host):
+    """Dedup key for an inventory entry: (lower-case name, port), the default port made explicit.
+
+    'Server1', 'server1:3389' and 'server1.' all give the same key, for keys already
+    in the inventory as well as normalized imports.
+    """
+    name, port = split_host_port(host.strip())
+    name = name.rstrip(".").lower()
+    try:
+        name = str(ipaddress.ip_address(name))
+    except ValueError:
+        pass
+    return name, port
+
+
+def _pick(record, names):
+    for n in names:
+        value = record.get(n)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _normalize_keys(record):
+    return {str(k).strip().lower().replace(" ", "_"): v for k, v in record.items() if k is not None}
+
+
+# ---- readers (each yields (line_or_index, dict)) ----
+
+def iter_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_ndjson(f):
+    for lineno, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield lineno, json.loads(line)
+            except ValueError as e:
+                yield lineno, InvalidRecord(f"bad JSON: {e}")
+
+
+def iter_json(f, chunk_size=65536):
+    """Streams the objects of a top-level JSON array; a top-level object is read whole"""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size).lstrip()
+    if not buf.startswith("["):
+        data = json.loads(buf + f.read())
+        hosts = data.get("hosts", data) if isinstance(data, dict) else data
+        if isinstance(hosts, dict):
+            # v3 inventory or {host: info}
+            for i, (host, info) in enumerate(hosts.items(), 1):
+                if info is None or isinstance(info, dict):
+                    yield i, dict(info or {}, host=host)
+                else:
+                    yield i, InvalidRecord(f"{host}: not an object")
+        return
+
+    buf, index, eof = buf[1:], 0, False
+    while True:
+        buf = buf.lstrip().lstrip(",").lstrip()
+        if buf.startswith("]"):
+            return
+        try:
+            obj, end = decoder.raw_decode(buf)
+        except ValueError:
+            if eof:
+                raise InvalidRecord("truncated JSON array")
+            more = f.read(chunk_size)
+            eof = not more
+            buf += more
+            continue
+        index += 1
+        yield index, obj
+        buf = buf[end:]
+        if len(buf) < chunk_size and not eof:
+            more = f.read(chunk_size)
+            eof = not more
+            buf += more
+
+
+def iter_records(path, f=None):
+    """Picks the reader from the file extension"""
+    lower = path.lower()
+    if f is None:
+        f = open(path, "r", newline="", encoding="utf-8-sig")
+    with f:
+        if lower.endswith(".csv"):
+            yield from iter_csv(f)
+        elif lower.endswith((".ndjson", ".jsonl")):
+            yield from iter_ndjson(f)
+        else:
+            yield from iter_json(f)
+
+
+class ImportPlan:
+    """What a bulk import would do, built before anything is changed"""
+
+    def __init__(self):
+        self.hosts = {}       # host -> info to add or overwrite
+        self.updated = []     # Hosts in `hosts` that already existed (overwrite mode)
+        self.duplicates = []  # (where, host) skipped: repeated in the file or already in the inventory
+        self.errors = []      # (where, reason)
+
+    @property
+    def added(self):
+        return len(self.hosts) - len(self.updated)
+
+    def summary(self):
+        return (f"{self.added} added, {len(self.updated)} updated, "
+                f"{len(self.duplicates)} duplicates skipped, {len(self.errors)} errors")
+
+
+def plan_import(records, existing, domains=None, overwrite=False, default_group="Ungrouped"):
+    """Validates and deduplicates streamed records against the `existing` hosts dict.
+
+    Hosts are matched by host_key, so case and an explicit default port do not
+    matter. Unknown domains are rejected rather than
+    created, since the app has no credentials for them.
+    """
+    plan = ImportPlan()
+    domains = domains or {}
+    existing_by_key = {host_key(h): h for h in existing}
+    seen = set()
+    try:
+        for where, record in records:
+            _plan_record(plan, where, record, existing_by_key, seen, domains, overwrite, default_group)
+    except (OSError, ValueError, csv.Error) as e:
+        # Unreadable or truncated input: keep what was read so far and report where it stopped
+        plan.errors.append(("end", str(e)))
+    return plan
+
+
+def _plan_record(plan, where, record, existing_by_key, seen, domains, overwrite, default_group):
+    if isinstance(record, Exception):
+        plan.errors.append((where, str(record)))
+        return
+    if not isinstance(record, dict):
+        plan.errors.append((where, "not an object"))
+        return
+    rec = _normalize_keys(record)
+    try:
+        host = normalize_host(_pick(rec, HOST_FIELDS), _pick(rec, FIELD_ALIASES["port"]))
+    except InvalidRecord as e:
+        plan.errors.append((where, str(e)))
+        return
+
+    key = host_key(host)
+    if key in seen:
+        plan.duplicates.append((where, host))
+        return
+    seen.add(key)
+    current = existing_by_key.get(key)
+    if current is not None and not overwrite:
+        plan.duplicates.append((where, host))
+        return
+
+    domain = _pick(rec, FIELD_ALIASES["domain"])
+    if domain and domain not in domains:
+        plan.errors.append((where, f"unknown domain {domain!r} for {host}"))
+        return
+    group = _pick(rec, FIELD_ALIASES["group"]) or default_group
+    info = {"domain": domain, "group": group, "desc": _pick(rec, FIELD_ALIASES["desc"]) or group}
+    if domain:
+        info["has_password"] = bool(domains[domain].get("password"))
+    else:
+        username = _pick(rec, FIELD_ALIASES["username"])
+        if username:
+            info["username"] = username
+        info["has_password"] = False
+
+    if current is not None:
+        host = current  # Keep the inventory's spelling of the key
+        plan.updated.append(host)
+    plan.hosts[host] = info
+
+
+def plan_import_file(path, existing, domains=None, overwrite=False):
+    return plan_import(iter_records(path), existing, domains, overwrite)
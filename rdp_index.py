@@ -0,0 +1,297 @@
+"""In-memory indexes over the host inventory, kept up to date as hosts change."""
+import array
+import bisect
+import itertools
+import operator
+
+
+def search_key(host, info):
+    """Lowercased text a search query is matched against"""
+    # NUL never appears in a query, so matches cannot span two fields
+    return "\0".join((host, info.get("username") or "", info.get("desc") or "")).lower()
+
+
+class SearchIndex:
+    """Substring search over each host's name, username and description.
+
+    Search keys are lowercased once per host. Built with the index and kept up to
+    date on add/remove:
+    - the grid order (hosts sorted by key) as parallel lists, so nothing is sorted per query;
+    - trigram postings, so a selective query only checks the hosts sharing its rarest trigram;
+    - one byte mask per ASCII character over the grid order, so a broad query (or one
+      or two characters) only checks the hosts containing all of its characters.
+    When a query extends the previous one and that result was small, only the
+    previous results are filtered.
+    """
+
+    def __init__(self, hosts=None):
+        self._keys = []      # id -> search key, None once removed
+        self._hosts = []     # id -> host
+        self._ids = {}       # host -> id
+        self._postings = {}  # trigram -> array of ids whose key contains it (may list removed ids)
+        self._dead = 0
+        self._sorted_keys = []   # Live search keys in grid order...
+        self._sorted_ids = []    # ...the matching ids...
+        self._sorted_hosts = []  # ...and hosts
+        self._masks = {}     # ASCII char -> bytearray over grid positions, 1 where the key contains it
+        self._last = None    # (query, keys, hosts) of the previous search, in grid order
+        if hosts:
+            self.build(hosts)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, host):
+        return host in self._ids
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_last"] = None
+        return state
+
+    def build(self, hosts):
+        self._keys = [search_key(h, info) for h, info in hosts.items()]
+        self._hosts = list(hosts)
+        self._ids = {h: i for i, h in enumerate(self._hosts)}
+        self._dead = 0
+        self._build_postings()
+        self._resort()
+
+    def _build_postings(self):
+        postings = {}
+        for i, key in enumerate(self._keys):
+            if key is None:
+                continue
+            for gram in {key[j:j + 3] for j in range(len(key) - 2)}:
+                ids = postings.get(gram)
+                if ids is None:
+                    ids = postings[gram] = array.array("I")
+                ids.append(i)
+        self._postings = postings
+
+    def _post(self, i, key):
+        postings = self._postings
+        for gram in {key[j:j + 3] for j in range(len(key) - 2)}:
+            ids = postings.get(gram)
+            if ids is None:
+                ids = postings[gram] = array.array("I")
+            ids.append(i)
+
+    def add(self, host, info):
+        """Adds or re-indexes a host"""
+        if host in self._ids:
+            self.remove(host)
+        key = search_key(host, info)
+        i = len(self._keys)
+        self._keys.append(key)
+        self._hosts.append(host)
+        self._ids[host] = i
+        self._post(i, key)
+        pos = bisect.bisect_right(self._sorted_keys, key)
+        self._sorted_keys.insert(pos, key)
+        self._sorted_ids.insert(pos, i)
+        self._sorted_hosts.insert(pos, host)
+        for c, mask in self._masks.items():
+            mask.insert(pos, c in key)
+        for c in set(key).difference(self._masks):
+            if c < "\x80":
+                self._masks[c] = self._char_mask(c)
+        self._last = None
+
+    def add_many(self, hosts):
+        """Adds or re-indexes a batch of hosts with one re-sort instead of one insert each"""
+        if len(hosts) < 64:
+            for host, info in hosts.items():
+                self.add(host, info)
+            return
+        for host in hosts:
+            self.remove(host)
+        for host, info in hosts.items():
+            i = self._ids[host] = len(self._keys)
+            key = search_key(host, info)
+            self._keys.append(key)
+            self._hosts.append(host)
+            self._post(i, key)
+        self._resort()
+
+    def remove(self, host):
+        i = self._ids.pop(host, None)
+        if i is None:
+            return
+        pos = bisect.bisect_left(self._sorted_keys, self._keys[i])
+        while self._sorted_ids[pos] != i:
+            pos += 1
+        del self._sorted_keys[pos]
+        del self._sorted_ids[pos]
+        del self._sorted_hosts[pos]
+        for mask in self._masks.values():
+            del mask[pos]
+        self._keys[i] = None
+        self._dead += 1
+        self._last = None
+        if self._dead > 1024 and self._dead > len(self._ids):
+            # Mostly tombstones: renumber everything
+            self._compact()
+
+    def _compact(self):
+        live = [(h, self._keys[i]) for h, i in self._ids.items()]
+        self._hosts = [h for h, _ in live]
+        self._keys = [k for _, k in live]
+        self._ids = {h: i for i, h in enumerate(self._hosts)}
+        self._dead = 0
+        self._build_postings()
+        self._resort()
+
+    def _resort(self):
+        self._sorted_ids = sorted(self._ids.values(), key=self._keys.__getitem__)
+        self._sorted_keys = [self._keys[i] for i in self._sorted_ids]
+        self._sorted_hosts = [self._hosts[i] for i in self._sorted_ids]
+        chars = set("".join(self._sorted_keys))
+        self._masks = {c: self._char_mask(c) for c in chars if c < "\x80"}
+        self._last = None
+
+    def _char_mask(self, c):
+        return bytearray(map(operator.contains, self._sorted_keys, itertools.repeat(c)))
+
+    def sorted_hosts(self):
+        """All hosts in grid order (case-insensitive by name)"""
+        return list(self._sorted_hosts)
+
+    @staticmethod
+    def _scan(q, keys, hosts):
+        """(keys, hosts) containing q, filtered without a Python-level loop"""
+        hits = list(map(operator.contains, keys, itertools.repeat(q)))
+        return list(itertools.compress(keys, hits)), list(itertools.compress(hosts, hits))
+
+    def _rarest(self, q):
+        """Ids of the rarest trigram's posting for q (a superset of the matches)"""
+        postings = self._postings
+        empty = ()
+        return min((postings.get(q[i:i + 3], empty) for i in range(len(q) - 2)), key=len)
+
+    def _by_chars(self, q):
+        """(keys, hosts) matching q, checking only the hosts that contain all of its characters"""
+        chars = set(q)
+        if not chars.issubset(self._masks):
+            if all(c < "\x80" for c in chars):
+                return [], []  # Some ASCII character of q is in no key at all
+            return self._scan(q, self._sorted_keys, self._sorted_hosts)
+        masks = [self._masks[c] for c in chars]
+        mask = masks[0]
+        if len(masks) > 1:
+            # The masks hold 0/1 bytes, so AND-ing them as big integers ANDs them bytewise
+            both = int.from_bytes(mask, "little")
+            for other in masks[1:]:
+                both &= int.from_bytes(other, "little")
+            mask = both.to_bytes(len(mask), "little")
+        keys = list(itertools.compress(self._sorted_keys, mask))
+        hosts = list(itertools.compress(self._sorted_hosts, mask))
+        if len(q) > 1:
+            keys, hosts = self._scan(q, keys, hosts)
+        return keys, hosts
+
+    def search(self, query):
+        """Returns the hosts matching query, in grid order"""
+        q = query.lower()
+        if not q:
+            return self.sorted_hosts()
+
+        last = self._last
+        if last is not None and last[0] in q and len(last[1]) * 4 <= len(self._ids):
+            # Anything matching the longer query also matched the previous one
+            keys, hosts = self._scan(q, last[1], last[2])
+        else:
+            candidates = self._rarest(q) if len(q) >= 3 else None
+            if candidates is not None and len(candidates) * 8 <= len(self._ids):
+                all_keys = self._keys
+                ids = sorted((i for i in set(candidates) if all_keys[i] is not None and q in all_keys[i]),
+                             key=all_keys.__getitem__)
+                keys = [all_keys[i] for i in ids]
+                hosts = [self._hosts[i] for i in ids]
+            else:
+                # Broad query: filtering the grid order beats sorting a big candidate set
+                keys, hosts = self._by_chars(q)
+
+        self._last = (q, keys, hosts)
+        return list(hosts)
+
+
+def host_group(info):
+    return info.get("group") or "Ungrouped"
+
+
+class GroupIndex:
+    """Live domain -> hosts and (domain, group) -> hosts mapping with counts.
+
+    Every add/remove is O(1), so the sidebar and group dropdown can read counts
+    without rescanning the inventory. Hosts without a domain are tracked under None.
+    """
+
+    def __init__(self, hosts=None):
+        self.domain_hosts = {}  # domain -> {host, ...}
+        self.pair_hosts = {}    # (domain, group) -> {host, ...}
+        self.group_counts = {}  # group -> number of hosts across all domains
+        self._where = {}        # host -> (domain, group)
+        if hosts:
+            for host, info in hosts.items():
+                self.add(host, info)
+
+    def add(self, host, info):
+        """Adds or moves a host; returns the set of domains whose counts changed"""
+        changed = self.remove(host)
+        dom, grp = info.get("domain"), host_group(info)
+        self._where[host] = (dom, grp)
+        self.domain_hosts.setdefault(dom, set()).add(host)
+        self.pair_hosts.setdefault((dom, grp), set()).add(host)
+        self.group_counts[grp] = self.group_counts.get(grp, 0) + 1
+        changed.add(dom)
+        return changed
+
+    def remove(self, host):
+        where = self._where.pop(host, None)
+        if where is None:
+            return set()
+        dom, grp = where
+        for table, key in ((self.domain_hosts, dom), (self.pair_hosts, where)):
+            members = table[key]
+            members.discard(host)
+            if not members:
+                del table[key]
+        self.group_counts[grp] -= 1
+        if not self.group_counts[grp]:
+            del self.group_counts[grp]
+        return {dom}
+
+    def domain_count(self, dom):
+        return len(self.domain_hosts.get(dom, ()))
+
+    def domain_counts(self):
+        """Sorted (domain, count) pairs for hosts that have a domain"""
+        return sorted((d, len(h)) for d, h in self.domain_hosts.items() if d)
+
+    def groups(self, dom=None):
+        """Sorted group names present in dom (or in every domain when dom is None)"""
+        if dom is None:
+            return sorted(self.group_counts)
+        return sorted(g for d, g in self.pair_hosts if d == dom)
+
+    def hosts_in(self, dom=None, group=None):
+        """Set of hosts matching the filters, or None when there is no filter"""
+        if dom and group:
+            return self.pair_hosts.get((dom, group), set())
+        if dom:
+            return self.domain_hosts.get(dom, set())
+        if group:
+            return {h for (d, g), hosts in self.pair_hosts.items() if g == group for h in hosts}
+        return None
+
+
+def matching_hosts(hosts, domain=None, group=None, search=None):
+    """One-shot filter of an inventory's hosts dict, in grid order (no index needed)"""
+    q = (search or "").lower()
+    found = [h for h, info in hosts.items()
+             if (not domain or info.get("domain") == domain)
+             and (not group or host_group(info) == group)
+             and (not q or q in search_key(h, info))]
+    found.sort(key=lambda h: search_key(h, hosts[h]))
+    return found
@@ -0,0 +1,174 @@
+"""Session launching: cached .rdp profiles and a background, staggered client spawner."""
+import concurrent.futures
+import hashlib
+import os
+import re
+import subprocess
+import threading
+import time
+
+from rdp_probe import split_host_port
+from rdp_storage import write_atomic
+
+PROFILE_VERSION = 2  # Bump when rdp_profile() output changes, so cached files are rewritten
+
+PER_HOST_KEYS = ("full address", "alternate full address", "username", "domain")  # Never taken from Default.rdp
+
+
+def default_rdp_path():
+    """mstsc's own defaults (Documents\\Default.rdp, a hidden file); None when there are none"""
+    path = os.path.join(os.path.expanduser("~"), "Documents", "Default.rdp")
+    return path if os.path.isfile(path) else None
+
+
+def read_rdp_settings(path):
+    """{key: "type:value"} from a .rdp file, UTF-16 as mstsc saves it or UTF-8"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    text = raw.decode("utf-16") if raw[:2] in (b"\xff\xfe", b"\xfe\xff") else raw.decode("utf-8-sig", "replace")
+    settings = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if sep and value[1:2] == ":":
+            settings[key.strip().lower()] = value.strip()
+    return settings
+
+
+def rdp_profile(host, username=None, settings=None, defaults=None):
+    """Text of a .rdp file for host. Never contains a password; those come from the vault.
+
+    Only the address and username are set here; everything else (screen mode,
+    multi-monitor, security, redirection) comes from `defaults`, the user's
+    Default.rdp, as it would for `mstsc /v:host`. `settings` overrides both.
+    """
+    name, port = split_host_port(host)
+    address = f"[{name}]" if ":" in name else name
+    lines = {key: value for key, value in (defaults or {}).items() if key not in PER_HOST_KEYS}
+    lines["full address"] = f"s:{address}:{port}"
+    if username:
+        lines["username"] = f"s:{username}"
+    if settings:
+        lines.update(settings)
+    return "".join(f"{key}:{value}\r\n" for key, value in lines.items())
+
+
+def mstsc_command(profile_path, host):
+    """Default client: mstsc with the cached profile, or just /v: when there is none (Quick Connect)"""
+    if profile_path is None:
+        return ["mstsc", f"/v:{host}"]
+    return ["mstsc", profile_path]
+
+
+class RecordingSpawner:
+    """Stand-in for subprocess.Popen that records argv lists instead of starting a client"""
+
+    def __init__(self, echo=False):
+        self.echo = echo
+        self.launched = []
+        self._lock = threading.Lock()
+
+    def __call__(self, argv):
+        with self._lock:
+            self.launched.append((time.monotonic(), list(argv)))
+        if self.echo:
+            print("launch:", " ".join(argv))
+
+
+class ProfileCache:
+    """One .rdp file per host in `directory`, rewritten only when what goes into it changes.
+
+    With `use_defaults` each profile starts from the user's Default.rdp (re-read per
+    launch, so changes made in mstsc apply to the next session).
+    """
+
+    def __init__(self, directory, settings=None, use_defaults=True):
+        self.directory = directory
+        self.settings = settings
+        self.use_defaults = use_defaults
+        self._lock = threading.Lock()
+        self._known = {}  # host -> (fingerprint, path) of the file on disk
+
+    def _path(self, host):
+        # Readable, filesystem-safe name plus a short hash so 'a:1' and 'a_1' never collide
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", host)[:80]
+        digest = hashlib.blake2b(host.encode("utf-8"), digest_size=4).hexdigest()
+        return os.path.join(self.directory, f"{safe}-{digest}.rdp")
+
+    def get(self, host, username=None):
+        """Path of an up-to-date profile for host, writing it first if needed"""
+        defaults = None
+        path = default_rdp_path() if self.use_defaults else None
+        if path is not None:
+            try:
+                defaults = read_rdp_settings(path)
+            except (OSError, UnicodeError) as e:
+                print(f"Could not read {path}: {e}")
+        text = rdp_profile(host, username, self.settings, defaults)
+        fingerprint = hashlib.blake2b(f"{PROFILE_VERSION}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+        with self._lock:
+            known = self._known.get(host)
+        if known is not None and known[0] == fingerprint and os.path.exists(known[1]):
+            return known[1]
+
+        path = self._path(host)
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(path, text)
+        with self._lock:
+            self._known[host] = (fingerprint, path)
+        return path
+
+    def discard(self, host):
+        """Forgets a host's profile and removes its file (host deleted)"""
+        with self._lock:
+            self._known.pop(host, None)
+        try:
+            os.remove(self._path(host))
+        except OSError:
+            pass
+
+
+class SessionLauncher:
+    """Builds profiles and starts RDP clients on a background thread pool.
+
+    `command(profile_path, host)` returns the argv to run and `spawn(argv)` runs it
+    (subprocess.Popen by default), so tests can swap in mstsc stand-ins. Launches
+    from launch_many() are spaced `stagger` seconds apart so a dozen clients don't
+    all start, and prompt, at once.
+
+    The client always gets the host name and resolves it itself: NLA and the
+    TERMSRV/<host> credential are tied to the name.
+    """
+
+    def __init__(self, profiles, command=mstsc_command, spawn=subprocess.Popen, workers=4, stagger=0.5, on_error=None):
+        self.profiles = profiles
+        self.command = command
+        self.spawn = spawn
+        self.stagger = stagger
+        self.on_error = on_error
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="launcher")
+
+    def _launch(self, host, username, use_profile, not_before):
+        delay = not_before - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            path = self.profiles.get(host, username) if use_profile else None
+            self.spawn(self.command(path, host))
+        except Exception as e:
+            if self.on_error:
+                self.on_error(host, e)
+            raise
+
+    def launch(self, host, username=None, use_profile=True):
+        """Starts one session in the background; returns a Future"""
+        return self._executor.submit(self._launch, host, username, use_profile, 0)
+
+    def launch_many(self, targets, stagger=None):
+        """Starts sessions for [(host, username), ...], `stagger` seconds apart"""
+        stagger = self.stagger if stagger is None else stagger
+        start = time.monotonic()
+        return [self._executor.submit(self._launch, host, username, True, start + i * stagger)
+                for i, (host, username) in enumerate(targets)]
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,15 +1,30 @@
 import tkinter as tk
-from tkinter import messagebox
-import json
-import os
+from tkinter import filedialog, messagebox
+import queue
 import subprocess
-import base64
 import math
 import threading
 import time
-import queue
 import webbrowser
 
+STARTUP_STARTED = time.perf_counter()  # Before the GUI imports, so they show up in the startup breakdown
+
+from rdp_agent import AgentClient
+from rdp_credentials import CmdkeyStore, CredentialSync, MemoryCredentialStore, decode_password, desired_credentials
+from rdp_dns import DnsCache
+from rdp_history import LatencyHistory
+from rdp_hosts import compact_inventory
+from rdp_icmp import IcmpProbeEngine, icmp_sweep_available
+from rdp_import import host_key, plan_import_file
+from rdp_index import GroupIndex, SearchIndex
+from rdp_launcher import ProfileCache, RecordingSpawner, SessionLauncher
+from rdp_metrics import JsonDumper, MetricsServer, PhaseTimer, Registry, StallWatchdog
+from rdp_probe import UNKNOWN, TcpProbeEngine, ping_host, split_host_port
+from rdp_status import StatusPipeline
+from rdp_storage import LastStatusStore, StartupCache, copy_inventory, empty_inventory, open_store
+from rdp_scheduler import PRIORITY_MANUAL, ProbePolicy, ProbeScheduler, TokenBucket, subnet_key
+from rdp_x224 import RdpProbeEngine, describe_check
+
 try: 
     import customtkinter as ctk
 except ImportError:
@@ -34,8 +49,84 @@ DANGER_RED = ("#EF4444", "#E05353")    # Softer, modern red
 STATUS_ONLINE = ("#10B981", "#3CC887")
 STATUS_OFFLINE = ("#EF4444", "#E05353")
 STATUS_PENDING = ("#9CA3AF", "#7D8799")
-
-CONFIG_FILE = "rdp_hosts_sample.json"
+STATUS_DEGRADED = ("#F59E0B", "#E0A53C")  # Online but losing probes or slow
+
+CONFIG_FILE = "rdp_hosts_sample.json"  # A .db/.sqlite path switches to the SQLite backend
+
+# Background probing: a fixed pool of workers instead of one thread per host
+PROBE_MODE = "tcp"          # "tcp" = connect to the RDP port in-process, "icmp" = native ping subprocess,
+                            # "icmp-sweep" = echoes through one ICMP socket (Linux; falls back to "icmp"),
+                            # "rdp" = X.224 handshake: online only if RDP answers, reports the security protocol
+PROBE_WORKERS = 64          # Max ping subprocesses running at the same time (icmp mode)
+PROBE_TCP_CONCURRENCY = 2000  # Max probes in flight on the probe event loop (tcp, icmp-sweep and rdp modes)
+PROBE_TIMEOUT = 1.0         # Seconds before a TCP probe counts as offline
+PROBE_INTERVAL = 30         # Base seconds between probes of a host
+PROBE_MAX_INTERVAL = 300    # Stable online hosts stretch up to this interval
+PROBE_OFFLINE_MAX_INTERVAL = 900  # Offline hosts back off exponentially up to this interval
+PROBE_WAVE_DEADLINE = 25    # Probes not started within this many seconds are dropped until next due
+PROBE_TICK = 1              # Seconds between checks for hosts that are due
+PROBE_RATE = 500            # Max probe starts per second (token bucket)
+PROBE_SUBNET_CAP = 32       # Max probes in flight per /24 (per resolved /24 for host names)
+PROBE_AGENT = None          # ("127.0.0.1", 47391): subscribe to a shared probe agent (rapidrdp.py agent) instead of probing
+
+# Name resolution: one shared cache for probes and launches instead of a lookup per probe
+DNS_TTL = 300               # Seconds a resolved address is reused
+DNS_NEGATIVE_TTL = 30       # Seconds a name that did not resolve stays failed before it is retried
+DNS_REFRESH_AHEAD = 0.2     # Refresh in the background once less than this fraction of the TTL is left
+DNS_CONCURRENCY = 32        # Max lookups running at the same time
+
+# Probe results reach the UI as coalesced per-host deltas, applied in bounded batches
+STATUS_BATCH = 500          # Max status changes applied per UI tick
+STATUS_POLL_MS = 200        # Idle polling interval for status changes
+
+# Latency history: a fixed ring of RTT samples per host, shown as a sparkline on each card
+HISTORY_SAMPLES = 240       # Samples kept per host (2 bytes each)
+TREND_WINDOW = 20           # Recent samples judged for the degraded state
+DEGRADED_LOSS_PCT = 20      # Degraded when at least this share of recent probes failed...
+DEGRADED_P95_MS = 250       # ...or the recent p95 RTT is at least this slow
+TREND_REFRESH_MS = 2000     # How often cards with new samples repaint their sparkline
+SPARKLINE_WIDTH = 12        # Samples drawn per card
+
+# Last-known status: probe results are saved next to the config and shown on the next launch
+LAST_STATUS_SAVE_INTERVAL = 60  # Seconds between background saves of the latest results
+
+# Host grid: only build cards for the visible rows and recycle them while scrolling
+VIRTUAL_GRID = True
+CARD_HEIGHT = 90
+CARD_PAD = 10
+GRID_OVERSCAN_ROWS = 1      # Extra rows built above and below the viewport
+SEARCH_DEBOUNCE_MS = 120    # Wait for a pause in typing before filtering
+GRID_BUILD_CHUNK = 40       # Cards built per UI tick when VIRTUAL_GRID is off
+
+# Credentials: TERMSRV/<host> vault entries are written off the UI thread, only when they change
+CREDENTIAL_STORE = "cmdkey"  # "memory" = in-process fake that never touches the vault (testing)
+CREDENTIAL_WORKERS = 8      # Max cmdkey calls running at the same time
+
+# Session launching: cached .rdp profiles, clients started off the UI thread
+LAUNCH_CLIENT = "mstsc"     # "stub" = print the client command instead of starting it (testing)
+LAUNCH_WORKERS = 4          # Clients being prepared/started at the same time
+LAUNCH_STAGGER = 0.5        # Seconds between clients when connecting to several selected hosts
+RDP_PROFILE_DIR = "rdp_profiles"  # Generated .rdp files, one per host (no passwords)
+
+# Staged startup: the window is usable before the inventory has finished loading
+STARTUP_BUDGET_MS = 300     # Warn when the window takes longer than this to accept input
+LOAD_POLL_MS = 20           # How often the UI checks whether the background load has finished
+
+# Instrumentation: counters, gauges and latency histograms (no-ops while disabled)
+METRICS_ENABLED = False
+METRICS_PORT = 9464         # Local HTTP endpoint serving /metrics (Prometheus) and /metrics.json; None = off
+METRICS_DUMP_FILE = "rdp_metrics.json"  # Periodic JSON snapshot; None = off
+METRICS_DUMP_INTERVAL = 30  # Seconds between JSON snapshots
+WATCHDOG_STALL_SECONDS = 0.25  # Sample the main thread's stack when the Tk loop is blocked this long
+WATCHDOG_TICK_MS = 100      # How often the Tk loop reports that it is alive
+
+def format_age(seconds):
+    return f"{seconds:.0f} s" if seconds < 120 else f"{seconds / 60:.0f} min" if seconds < 7200 else f"{seconds / 3600:.0f} h"
+
+def status_color(status):
+    if status == "online": return STATUS_ONLINE
+    if status == "offline": return STATUS_OFFLINE
+    return STATUS_PENDING
 
 class AddHostDialog(ctk.CTkToplevel):
     def __init__(self, parent, domains_list, on_save):
@@ -132,6 +223,319 @@ class SettingsDialog(ctk.CTkToplevel):
         self.parent_app.appearance_mode = new_mode
         ctk.set_appearance_mode(new_mode)
 
+def card_icon(desc):
+    """Card icon picked from keywords in the description (or group)"""
+    d_lower = desc.lower()
+    if "sql" in d_lower or "db" in d_lower or "database" in d_lower:
+        return "🛢️"
+    if "linux" in d_lower:
+        return "🐧"
+    if "laptop" in d_lower or "pc" in d_lower or "desk" in d_lower:
+        return "💻"
+    return "🖥️"
+
+class CardViews:
+    """host -> (icon, display_host, display_desc), worked out once per host.
+
+    Cards are rebound on every scroll step and refresh; the keyword scan and text
+    trimming only run again after invalidate(host) (the host was edited) or
+    clear() (a new inventory).
+    """
+    def __init__(self):
+        self._views = {}
+
+    def get(self, host, info):
+        view = self._views.get(host)
+        if view is None:
+            desc = info.get("desc", info.get("group", ""))
+            # Trim excessively long text so it does not overflow
+            display_host = host if len(host) <= 20 else host[:17] + "..."
+            display_desc = desc if len(desc) <= 28 else desc[:25] + "..."
+            view = self._views[host] = (card_icon(desc), display_host, display_desc)
+        return view
+
+    def invalidate(self, host):
+        self._views.pop(host, None)
+
+    def clear(self):
+        self._views.clear()
+
+CARD_TAG = "RapidRDPCard"           # Bind tag shared by the widgets of every card
+CARD_MENU_TAG = "RapidRDPCardMenu"  # Bind tag of every card's ⋮ button
+
+def _ancestor(widget, cls):
+    """widget itself or its nearest master that is a cls, else None"""
+    while widget is not None and not isinstance(widget, cls):
+        widget = getattr(widget, "master", None)
+    return widget
+
+def _add_bind_tag(widget, tag):
+    """Adds tag to the Tk canvases and labels CTk draws widget with (the ones that receive events)"""
+    if isinstance(widget, (tk.Canvas, tk.Label)):
+        tags = widget.bindtags()
+        widget.bindtags(tags[:1] + (tag,) + tags[1:])
+    for child in widget.winfo_children():
+        _add_bind_tag(child, tag)
+
+class HostCard(ctk.CTkFrame):
+    """A host card whose widgets can be rebound to another host, so cards can be recycled.
+
+    Mouse handling is delegated: each card's widgets carry a shared bind tag, bound
+    once per Tk interpreter, and the handlers find the card from the event's widget.
+    """
+    def __init__(self, parent, app):
+        super().__init__(parent, fg_color=CARD_BG, corner_radius=8, cursor="hand2", height=CARD_HEIGHT)
+        self.app = app
+        self.host = None
+        self._shown = None  # (icon, display_host, display_desc) currently drawn
+        self._selected = False
+
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.icon_lbl = ctk.CTkLabel(self, text="", font=app.font_icon)
+        self.icon_lbl.grid(row=0, column=0, rowspan=2, padx=(20, 12), pady=0, sticky="w")
+
+        self.name_lbl = ctk.CTkLabel(self, text="", font=app.font_bold, text_color=TEXT_PRIMARY, anchor="w")
+        self.name_lbl.grid(row=0, column=1, sticky="sw", padx=(5, 5), pady=(20, 0))
+
+        # Build desc and status indicator wrapper
+        self.desc_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.desc_frame.grid(row=1, column=1, sticky="nw", padx=(5, 5), pady=(2, 20))
+
+        # Create small rounded colored dot
+        self.status_dot = ctk.CTkLabel(self.desc_frame, text="●", text_color=STATUS_PENDING, font=app.font_normal)
+        self.status_dot.pack(side="left", padx=(0, 6))
+
+        self.desc_lbl = ctk.CTkLabel(self.desc_frame, text="", font=app.font_normal, text_color=TEXT_MUTED, anchor="w")
+        self.desc_lbl.pack(side="left")
+
+        self.opts_btn = ctk.CTkButton(self, text="⋮", width=24, height=24, fg_color="transparent", hover_color=BG_MAIN, text_color=TEXT_MUTED, font=app.font_menu, corner_radius=12)
+        self.opts_btn.grid(row=0, column=2, sticky="ne", padx=10, pady=10)
+
+        # Recent RTTs, repainted on its own when new samples arrive
+        self.trend_lbl = ctk.CTkLabel(self, text="", font=app.font_small, text_color=TEXT_MUTED, anchor="e")
+        self.trend_lbl.grid(row=1, column=2, sticky="se", padx=10, pady=(0, 12))
+        self._trend = None
+
+        # Handlers read card.host at event time, so they stay valid after rebinding
+        if not self.bind_class(CARD_TAG):
+            self._bind_delegates()
+        for el in (self, self.icon_lbl, self.name_lbl, self.desc_frame, self.trend_lbl):
+            _add_bind_tag(el, CARD_TAG)
+        _add_bind_tag(self.opts_btn, CARD_MENU_TAG)
+
+    def _bind_delegates(self):
+        """Binds the card handlers once for every card in this Tk interpreter"""
+        def delegate(handler):
+            def on_event(event):
+                card = _ancestor(event.widget, HostCard)
+                if card is not None:
+                    handler(card, event)
+            return on_event
+
+        self.bind_class(CARD_TAG, "<Enter>", delegate(HostCard._on_enter))
+        self.bind_class(CARD_TAG, "<Leave>", delegate(HostCard._on_leave))
+        self.bind_class(CARD_TAG, "<Button-1>", delegate(HostCard._on_click))
+        self.bind_class(CARD_TAG, "<Button-3>", delegate(HostCard._on_menu))
+        self.bind_class(CARD_MENU_TAG, "<Button-1>", delegate(HostCard._on_menu))
+        self.bind_class(CARD_MENU_TAG, "<Button-3>", delegate(HostCard._on_menu))
+
+    def bind_host(self, host, info, status):
+        self.host = host
+        shown = self.app.card_views.get(host, info)
+        if shown != self._shown:
+            self._shown = shown
+            icon, display_host, display_desc = shown
+            self.icon_lbl.configure(text=icon)
+            self.name_lbl.configure(text=display_host)
+            self.desc_lbl.configure(text=display_desc)
+        self.status_dot.configure(text_color=self.app.host_dot_color(host, status))
+        self.set_trend(*self.app.host_trend(host))
+
+    def set_trend(self, sparkline, degraded):
+        trend = (sparkline, degraded)
+        if trend != self._trend:
+            self._trend = trend
+            self.trend_lbl.configure(text=sparkline, text_color=STATUS_DEGRADED if degraded else TEXT_MUTED)
+
+    def set_selected(self, selected):
+        if selected != self._selected:
+            self._selected = selected
+            self.configure(border_width=2 if selected else 0, border_color=ACCENT_BLUE)
+
+    def _on_enter(self, event):
+        self.configure(fg_color=CARD_HOVER)
+
+    def _on_leave(self, event):
+        self.configure(fg_color=CARD_BG)
+
+    def _on_click(self, event):
+        if not self.host:
+            return
+        if event.state & 0x0004:  # Ctrl+click adds to / removes from the multi-host selection
+            self.app.toggle_selection(self.host)
+        else:
+            self.app.connect_to_host(self.host)
+
+    def _on_menu(self, event):
+        if self.host:
+            self.app.show_context_menu(event, self.host)
+
+class VirtualCardGrid(ctk.CTkFrame):
+    """Scrollable card grid that only builds enough cards to fill the viewport.
+
+    Cards come from a pool and are rebound to other hosts as the user scrolls, so the
+    number of Tk widgets stays the same no matter how many hosts are listed.
+    `bind_card(card, host)` rebinds a pooled card; `on_bound(dict)` receives the
+    host -> card mapping after every render.
+    """
+    def __init__(self, master, create_card, bind_card, on_bound=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.create_card = create_card
+        self.bind_card = bind_card
+        self.on_bound = on_bound
+
+        self.hosts = []
+        self.columns = 1
+        self.offset = 0  # Scroll position in (unscaled) pixels
+        self.pool = []
+        self.bound = {}
+        self._placed = {}  # card -> (x, y, width) last passed to place()
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.empty_lbl = ctk.CTkLabel(self.viewport, text="No hosts found.", text_color=TEXT_MUTED)
+
+        self.viewport.bind("<Configure>", lambda e: self.render())
+        self._bind_wheel(self.viewport)
+
+    @property
+    def row_height(self):
+        return CARD_HEIGHT + 2 * CARD_PAD
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+
+    def _bind_card_wheel(self):
+        """Scrolls whichever grid the card under the pointer belongs to; bound once per Tk interpreter"""
+        def on_wheel(event):
+            grid = _ancestor(event.widget, VirtualCardGrid)
+            if grid is not None:
+                grid._on_wheel(event)
+
+        for tag in (CARD_TAG, CARD_MENU_TAG):
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                self.bind_class(tag, sequence, on_wheel)
+
+    def _viewport_size(self):
+        scale = self._get_widget_scaling()
+        return self.viewport.winfo_width() / scale, self.viewport.winfo_height() / scale
+
+    def _content_height(self):
+        return math.ceil(len(self.hosts) / self.columns) * self.row_height
+
+    def set_hosts(self, hosts, columns):
+        self.hosts = hosts
+        self.columns = max(1, columns)
+        # Host entries may have changed under the same name, so rebind every card in view
+        for card in self.pool:
+            card.host = None
+        self.render()
+
+    def scroll_to(self, offset):
+        _, height = self._viewport_size()
+        self.offset = max(0, min(offset, self._content_height() - height))
+        self.render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * self._content_height())
+        elif action == "scroll":
+            _, height = self._viewport_size()
+            step = height if unit == "pages" else self.row_height / 2
+            self.scroll_to(self.offset + int(value) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - self.row_height / 2)
+        else:
+            self.scroll_to(self.offset + self.row_height / 2)
+
+    def row_range(self, overscan=0):
+        """First and last+1 row index that intersect the viewport"""
+        _, height = self._viewport_size()
+        rows = math.ceil(len(self.hosts) / self.columns)
+        first = max(0, int(self.offset // self.row_height) - overscan)
+        last = min(rows, int((self.offset + height) // self.row_height) + 1 + overscan)
+        return first, last
+
+    def visible_hosts(self):
+        first, last = self.row_range()
+        return self.hosts[first * self.columns:last * self.columns]
+
+    def render(self):
+        width, height = self._viewport_size()
+        if width <= 10:
+            return  # Ignore unrendered initial states
+
+        self.offset = max(0, min(self.offset, self._content_height() - height))
+        if not self.hosts:
+            self.empty_lbl.place(relx=0.5, y=20, anchor="n")
+        else:
+            self.empty_lbl.place_forget()
+
+        first, last = self.row_range(GRID_OVERSCAN_ROWS)
+        start = first * self.columns
+        visible = self.hosts[start:last * self.columns]
+
+        while len(self.pool) < len(visible):
+            self.pool.append(self.create_card(self.viewport))
+        if self.pool and not self.bind_class(CARD_TAG, "<MouseWheel>"):
+            self._bind_card_wheel()
+
+        cell_w = width / self.columns
+        card_w = max(50, int(cell_w - 2 * CARD_PAD))
+        self.bound = {}
+        for i, card in enumerate(self.pool):
+            if i >= len(visible):
+                if card in self._placed:
+                    card.place_forget()
+                    del self._placed[card]
+                card.host = None
+                continue
+
+            host = visible[i]
+            if card.host != host:
+                self.bind_card(card, host)
+            self.bound[host] = card
+
+            row, col = divmod(start + i, self.columns)
+            geom = (int(col * cell_w + CARD_PAD), int(row * self.row_height - self.offset + CARD_PAD), card_w)
+            if self._placed.get(card) != geom:
+                if card.cget("width") != card_w:
+                    card.configure(width=card_w)
+                card.place(x=geom[0], y=geom[1])
+                self._placed[card] = geom
+
+        content = self._content_height()
+        if content > height:
+            self.scrollbar.set(self.offset / content, (self.offset + height) / content)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        if self.on_bound:
+            self.on_bound(self.bound)
+
 class App(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -144,16 +548,67 @@ class App(ctk.CTk):
         self.minsize(900, 650)
         self.configure(fg_color=BG_MAIN)
 
-        self.app_data = self.load_data()
+        self.startup = PhaseTimer(STARTUP_STARTED)
+        self.startup.mark("imports")
+        self.setup_metrics()
+
+        if CREDENTIAL_STORE == "memory":
+            vault = MemoryCredentialStore()
+        elif CmdkeyStore.available():
+            vault = CmdkeyStore()
+        else:
+            vault = None  # No Windows vault here: credentials are never synced (and never fail)
+        self.credentials = CredentialSync(vault, CREDENTIAL_WORKERS, state_path=CONFIG_FILE + ".credstate",
+                                          on_progress=self._on_credential_progress, on_error=self._on_credential_error)
+        self.resolver = DnsCache(ttl=DNS_TTL, negative_ttl=DNS_NEGATIVE_TTL, refresh_ahead=DNS_REFRESH_AHEAD,
+                                 max_concurrency=DNS_CONCURRENCY, registry=self.metrics)
+        spawn = RecordingSpawner(echo=True) if LAUNCH_CLIENT == "stub" else subprocess.Popen
+        self.launcher = SessionLauncher(ProfileCache(RDP_PROFILE_DIR), spawn=spawn, workers=LAUNCH_WORKERS,
+                                        stagger=LAUNCH_STAGGER, on_error=self._on_launch_error)
+
+        # Start empty; the inventory is loaded and indexed on a background thread
+        # while the window comes up (see _poll_inventory_load)
+        self.store = None
+        self.app_data = empty_inventory()
+        self.search_index = SearchIndex()
+        self.group_index = GroupIndex()
+        self.inventory_loaded = False
+        self._load_result = None
+        threading.Thread(target=self._load_inventory_worker, name="inventory-load", daemon=True).start()
+
         self.current_domain_filter = None
         self.current_group_filter = "All Groups"
         self.search_query = ""
+        self._search_after_id = None
         self.card_columns = 4
         
         # Status tracking mapping host to its status string ("online", "offline", "pending")
         self.host_statuses = {}
-        # Mapping host to UI status circle widget
+        # Probe threads push results here; the UI only ever sees real status changes
+        self.status_pipeline = StatusPipeline()
+        # Callbacks from worker threads (errors, progress) wait here for the UI thread; Tk is not thread-safe
+        self.ui_calls = queue.Queue()
+        # Last probe latency in ms per host (TCP connect time, or echo RTT in icmp-sweep mode)
+        self.host_latencies = self.status_pipeline.latencies
+        # RTT ring per host; cards with new samples are repainted every TREND_REFRESH_MS
+        self.history = LatencyHistory(HISTORY_SAMPLES, TREND_WINDOW, DEGRADED_LOSS_PCT, DEGRADED_P95_MS)
+        # Latest result per host, saved in the background and shown as last-known status on the next launch
+        self.last_status = LastStatusStore(CONFIG_FILE + ".status", LAST_STATUS_SAVE_INTERVAL,
+                                           on_error=lambda e: print(f"Error saving last-known status: {e}"))
+        self._last_known = {}
+        # Mapping host to UI status circle widget, and to the card showing it
         self.status_widgets = {}
+        self.host_cards = {}
+        # Hosts picked with Ctrl+click for a multi-host launch, in click order
+        self.selected_hosts = {}
+        # Hosts in the order their cards are laid out, and the ones currently on screen
+        self.grid_hosts = []
+        self._visible_hosts = []
+        # Sidebar buttons by domain (None = "All Domains") and what each one shows
+        self.sidebar_buttons = {}
+        self._sidebar_state = {}
+        self._group_filter_values = None
+        self._grid_build_gen = 0  # Bumped to abandon a progressive (non-virtual) grid build
 
         # Premium Typography System (Clean scaling & hierarchy)
         # Using Segoe UI as a standard cleanly scaling sans-serif on Windows
@@ -161,6 +616,10 @@ class App(ctk.CTk):
         self.font_bold = ctk.CTkFont(family="Segoe UI", size=14, weight="bold")
         self.font_normal = ctk.CTkFont(family="Segoe UI", size=13)
         self.font_small = ctk.CTkFont(family="Segoe UI", size=11, weight="bold")
+        self.font_menu = ctk.CTkFont(size=18, weight="bold")  # The ⋮ button of every card
+
+        # Icon and trimmed text per host, shared by every card that shows the host
+        self.card_views = CardViews()
 
         # Configure Main Grid
         self.grid_rowconfigure(1, weight=1)
@@ -169,50 +628,235 @@ class App(ctk.CTk):
         self.setup_topbar()
         self.setup_sidebar()
         self.setup_main_area()
+        self.refresh_sidebar()
+        self.header_count_lbl.configure(text="Loading hosts...")
+        self.startup.mark("window")
+
+        # Probe machinery is ready now, but the ping loop only starts once hosts are loaded
+        self.probe_policy = ProbePolicy(base_interval=PROBE_INTERVAL, max_interval=PROBE_MAX_INTERVAL, offline_max_interval=PROBE_OFFLINE_MAX_INTERVAL)
+        limits = {"rate_limiter": TokenBucket(PROBE_RATE), "max_per_subnet": PROBE_SUBNET_CAP,
+                  "subnet_of": lambda host: subnet_key(host, self.resolver)}
+        # In-process engines share one event loop thread; "icmp" runs ping processes on worker threads
+        self.probe_engine = None
+        mode = PROBE_MODE
+        if mode == "icmp-sweep":
+            reason = icmp_sweep_available()
+            if reason:
+                print(f"ICMP sweep unavailable ({reason}), using ping processes")
+                mode = "icmp"
+            else:
+                self.probe_engine = IcmpProbeEngine(timeout=PROBE_TIMEOUT, max_concurrency=PROBE_TCP_CONCURRENCY, resolver=self.resolver)
+        elif mode == "rdp":
+            self.probe_engine = RdpProbeEngine(timeout=PROBE_TIMEOUT, max_concurrency=PROBE_TCP_CONCURRENCY, resolver=self.resolver)
+        elif mode == "tcp":
+            self.probe_engine = TcpProbeEngine(timeout=PROBE_TIMEOUT, max_concurrency=PROBE_TCP_CONCURRENCY, resolver=self.resolver)
+        if self.probe_engine:
+            self.probe_engine.start()
+            self.probe_scheduler = ProbeScheduler(self._engine_ping_worker, max_workers=PROBE_TCP_CONCURRENCY, loop=self.probe_engine.loop, **limits)
+        else:
+            self.probe_scheduler = ProbeScheduler(self._ping_worker, max_workers=PROBE_WORKERS, **limits)
+        self.probe_scheduler.start()
+        self.start_metrics()
+        self.ping_thread_active = False
+        self.ping_thread = None
+        self.agent = None
+        self.check_queue()
+        self.after(TREND_REFRESH_MS, self.refresh_trends)
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after_idle(self._on_interactive)
+        self.after(LOAD_POLL_MS, self._poll_inventory_load)
+
+    # =============== STAGED STARTUP ===============
+
+    def _on_interactive(self):
+        """First idle moment after the window is drawn: the top bar and Quick Connect accept input"""
+        elapsed = self.startup.mark("interactive")
+        if elapsed * 1000 > STARTUP_BUDGET_MS:
+            print(f"Startup exceeded the {STARTUP_BUDGET_MS} ms budget: {self.startup.summary()}")
+
+    def _load_inventory_worker(self):
+        started = time.perf_counter()
+        try:
+            result = self.load_data()
+            self._last_known = self.last_status.load(result[0]["hosts"])
+        except Exception as e:
+            result = e
+        self.startup.add("inventory_load", time.perf_counter() - started)
+        self._load_result = result
+
+    def _poll_inventory_load(self):
+        result = self._load_result
+        if result is None:
+            self.after(LOAD_POLL_MS, self._poll_inventory_load)
+            return
+        if isinstance(result, Exception):
+            # Stay empty and read-only rather than risk overwriting the config
+            self.header_count_lbl.configure(text="0 Hosts")
+            messagebox.showerror("Error", f"Could not load hosts: {result}\n\nNothing will be saved until the file is fixed; pending changes stay in its .journal.")
+            return
+
+        self.app_data, self.search_index, self.group_index = result
+        self.card_views.clear()
+        # Status is one byte per host row from now on
+        self.host_statuses = self.app_data["hosts"].statuses
+        self.apply_last_known()
+        self.inventory_loaded = True
+        self.startup.mark("inventory_ready")
 
         self.refresh_sidebar()
         self.refresh_grid()
-        
-        # Start the background ping loop
-        self.ping_queue = queue.Queue()
-        self.ping_thread_active = True
-        self.ping_thread = threading.Thread(target=self.ping_loop_daemon, daemon=True)
-        self.ping_thread.start()
-        self.check_queue()
+        self.update_idletasks()
+        self.startup.mark("first_grid")
+
+        # Bring the vault in line with the inventory (new hosts, rotated domain passwords, removals)
+        self._sync_credentials()
+
+        # Start resolving every name now; the first wave's probes join these lookups
+        self.resolver.prefetch(split_host_port(h)[0] for h in self.app_data["hosts"])
+
+        # Tell the policy which cards are on screen before the first wave, so they go first
+        self.track_visible_hosts()
+        self.start_probing()
+        self.startup.mark("probing")
+
+        self.startup.publish(self.metrics)
+        print(f"Startup: {self.startup.summary()}")
+
+    def apply_last_known(self):
+        """Shows the previous session's results until hosts are probed again; the stalest are probed first"""
+        now = time.time()
+        for host, (status, _, ts) in self._last_known.items():
+            self.host_statuses[host] = status
+            self.probe_policy.seed(host, status, now - ts)
+        self._last_known = {}
+        self.last_status.start()
+
+    def setup_metrics(self):
+        """Creates the registry and the metrics used on the UI, probe and persistence paths"""
+        self.metrics = Registry(enabled=METRICS_ENABLED)
+        m = self.metrics
+        self.m_probe_seconds = m.histogram("probe_seconds", "Time for one host probe, including the timeout for offline hosts")
+        self.m_probes = m.counter("probes_total", "Completed host probes", labels=("status",))
+        self.m_refresh_grid = m.histogram("refresh_grid_seconds", "Time to filter and lay out the host grid")
+        self.m_refresh_sidebar = m.histogram("refresh_sidebar_seconds", "Time to sync the domain sidebar")
+        self.m_status_tick = m.histogram("status_tick_seconds", "Time to apply one batch of status changes to the UI")
+        self.m_status_applied = m.counter("status_updates_applied_total", "Status changes applied to the UI")
+        self.metrics_server = self.metrics_dumper = self.watchdog = None
+
+    def start_metrics(self):
+        """Registers gauges over the probe machinery and starts the exporters and the watchdog"""
+        if not self.metrics.enabled:
+            return
+        m = self.metrics
+        m.gauge("probes_in_flight", "Probes currently running", fn=self.probe_scheduler.in_flight)
+        m.gauge("probe_queue_depth", "Hosts waiting for a free probe worker", fn=self.probe_scheduler.backlog)
+        m.gauge("probes_expired", "Probes dropped because their wave deadline passed", fn=lambda: self.probe_scheduler.expired)
+        m.gauge("status_pending", "Status changes waiting for the UI", fn=lambda: len(self.status_pipeline))
+        m.gauge("status_results_received", "Probe results handed to the status pipeline", fn=lambda: self.status_pipeline.received)
+        m.gauge("status_results_dropped", "Probe results dropped as unchanged", fn=lambda: self.status_pipeline.dropped)
+        m.gauge("hosts", "Hosts in the inventory", fn=lambda: len(self.app_data["hosts"]))
+        m.gauge("grid_hosts", "Hosts matching the current filters", fn=lambda: len(self.grid_hosts))
+        m.gauge("latency_history_bytes", "Memory held by the per-host RTT rings", fn=self.history.memory_bytes)
+
+        self.watchdog = StallWatchdog(m, threshold=WATCHDOG_STALL_SECONDS).start()
+        self.watchdog_tick()
+        if METRICS_PORT is not None:
+            try:
+                self.metrics_server = MetricsServer(m, METRICS_PORT, watchdog=self.watchdog).start()
+            except OSError as e:
+                print(f"Metrics endpoint disabled: {e}")
+        if METRICS_DUMP_FILE:
+            self.metrics_dumper = JsonDumper(m, METRICS_DUMP_FILE, METRICS_DUMP_INTERVAL, watchdog=self.watchdog).start()
+
+    def watchdog_tick(self):
+        self.watchdog.heartbeat()
+        self.after(WATCHDOG_TICK_MS, self.watchdog_tick)
+
+    def on_close(self):
+        # Stop queuing new waves and cancel everything still waiting for a worker
+        self.ping_thread_active = False
+        if self.agent:
+            self.agent.close()
+        self.probe_scheduler.shutdown()
+        if self.probe_engine:
+            self.probe_engine.stop()
+        for exporter in (self.metrics_server, self.metrics_dumper, self.watchdog):
+            if exporter:
+                exporter.stop()
+        self.launcher.shutdown()
+        self.resolver.close()
+        self.last_status.close()
+        self.credentials.close()
+        # Write out anything still buffered and leave a compacted snapshot behind
+        if self.inventory_loaded and self.store is not None:
+            self.store.close()
+            if not self.store.queryable and (self.store.dirty or not self._cache_hit):
+                self.startup_cache.save((self.app_data, self.search_index, self.group_index))
+        self.destroy()
 
     def check_queue(self):
-        try:
-            while True:
-                host, status = self.ping_queue.get_nowait()
+        while True:
+            try:
+                fn, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"UI callback failed: {e}")  # Keep polling whatever one callback does
+
+        # Apply one bounded batch so a full wave of changes can't stall a frame
+        with self.m_status_tick.time():
+            batch = self.status_pipeline.drain(STATUS_BATCH)
+            for host, status in batch:
                 self.update_ui_status(host, status)
-        except queue.Empty:
-            pass
-        self.after(200, self.check_queue)
+        self.m_status_applied.inc(len(batch))
+
+        if len(self.status_pipeline):
+            self.after(16, self.check_queue)  # Backlog: continue on the next frame
+        else:
+            self.after(STATUS_POLL_MS, self.check_queue)
+
+    def call_on_ui(self, fn, *args):
+        """Runs fn(*args) on the Tk thread at its next check_queue(); safe from any thread"""
+        self.ui_calls.put((fn, args))
 
     def load_data(self):
-        data = {"version": 3, "domains": {}, "hosts": {}}
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r") as f:
-                    loaded = json.load(f)
-                    if "version" not in loaded or loaded["version"] < 3:
-                        data["hosts"] = loaded.get("hosts", loaded)
-                        data["domains"] = loaded.get("domains", {})
-                        for h, info in data["hosts"].items():
-                            if "group" not in info: info["group"] = "Ungrouped"
-                            if "desc" not in info: info["desc"] = info.get("group", "Server")
-                    else:
-                        data = loaded
-            except Exception as e:
-                print(f"Error loading hosts: {e}")
-        return data
+        """Loads the inventory and its indexes, from the startup cache when the config is unchanged.
+
+        Runs on the inventory-load thread and returns (data, search_index, group_index);
+        the UI thread swaps them in once they are complete.
+        """
+        # JSON: snapshot + change journal, all writes on the store's background thread.
+        # SQLite: the database does its own indexing, filtering and paging.
+        store = open_store(CONFIG_FILE, on_error=self._on_save_error, metrics=self.metrics)
+        self.startup_cache = StartupCache(CONFIG_FILE)
+        if store.queryable:
+            self._cache_hit = False
+            self.store = store
+            return compact_inventory(store.load()), None, store
+
+        cached = self.startup_cache.load()
+        self._cache_hit = cached is not None
+        if self._cache_hit:
+            data, search_index, group_index = cached
+            data = store.load(preloaded=data)
+        else:
+            # Hosts live in a column table (one row per host, interned domains and groups)
+            data = compact_inventory(store.load())
+            search_index = SearchIndex(data["hosts"])
+            group_index = GroupIndex(data["hosts"])
+        self.store = store
+        return data, search_index, group_index
 
     def save_data(self):
-        try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.app_data, f, indent=4)
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not save config: {e}")
+        """Schedules a full rewrite of the inventory (single mutations use self.store directly)"""
+        self.store.replace(self.app_data)
+
+    def _on_save_error(self, e):
+        # Runs on the writer thread; report on the Tk thread
+        self.call_on_ui(messagebox.showerror, "Error", f"Could not save config: {e}")
 
     def setup_topbar(self):
         self.topbar = ctk.CTkFrame(self, height=50, corner_radius=0, fg_color=BG_TOPBAR)
@@ -226,6 +870,8 @@ class App(ctk.CTk):
         ctk.CTkButton(self.topbar, text="★ New Session", width=100, fg_color="transparent", hover_color=BG_MAIN, font=ctk.CTkFont(size=12, weight="bold"), text_color=TEXT_PRIMARY, command=self.open_add_host).grid(row=0, column=1, padx=5)
         ctk.CTkButton(self.topbar, text="🔗 GitHub", width=80, fg_color="transparent", hover_color=BG_MAIN, font=ctk.CTkFont(size=12), text_color=TEXT_PRIMARY, command=self.open_github).grid(row=0, column=2, padx=5)
         ctk.CTkButton(self.topbar, text="⚙ Settings", width=80, fg_color="transparent", hover_color=BG_MAIN, font=ctk.CTkFont(size=12), text_color=TEXT_PRIMARY, command=self.open_settings).grid(row=0, column=3, padx=5)
+        self.import_btn = ctk.CTkButton(self.topbar, text="⇪ Import", width=80, fg_color="transparent", hover_color=BG_MAIN, font=ctk.CTkFont(size=12), text_color=TEXT_PRIMARY, command=self.open_import)
+        self.import_btn.grid(row=0, column=4, padx=5)
 
         # Search
         self.search_var = ctk.StringVar()
@@ -263,6 +909,14 @@ class App(ctk.CTk):
         self.header_count_lbl = ctk.CTkLabel(self.content_header, text="0 Hosts", text_color=TEXT_MUTED)
         self.header_count_lbl.pack(side="left", padx=15)
 
+        # Shown only while credential writes are in progress
+        self.cred_status_lbl = ctk.CTkLabel(self.content_header, text="", text_color=TEXT_MUTED)
+        self.cred_status_lbl.pack(side="right", padx=5)
+
+        # Shown only while hosts are selected (Ctrl+click on cards); Escape clears the selection
+        self.connect_selected_btn = ctk.CTkButton(self.content_header, text="", width=150, fg_color=ACCENT_BLUE, hover_color="#1E4496", corner_radius=5, font=ctk.CTkFont(weight="bold"), command=self.connect_selected)
+        self.bind("<Escape>", lambda e: self.clear_selection())
+
         group_lbl = ctk.CTkLabel(self.content_header, text="Filter Grid:", text_color=TEXT_MUTED)
         group_lbl.pack(side="left", padx=(50, 5))
 
@@ -281,7 +935,10 @@ class App(ctk.CTk):
 
 
         # Grid area
-        self.grid_frame = ctk.CTkScrollableFrame(self.main_content, fg_color="transparent")
+        if VIRTUAL_GRID:
+            self.grid_frame = VirtualCardGrid(self.main_content, lambda parent: HostCard(parent, self), self._bind_grid_card, self._on_grid_cards_bound, fg_color="transparent")
+        else:
+            self.grid_frame = ctk.CTkScrollableFrame(self.main_content, fg_color="transparent")
         self.grid_frame.grid(row=1, column=0, sticky="nsew", pady=(0, 10))
         
         self.grid_frame.bind("<Configure>", self.on_grid_resize)
@@ -309,13 +966,10 @@ class App(ctk.CTk):
         if not target:
             return
             
-        try:
-            cmd = ["mstsc", f"/v:{target}"]
-            subprocess.Popen(cmd)
-            # Clear it out after launching
-            self.quick_host_entry.delete(0, tk.END)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to launch Quick Connect session: {e}")
+        # Ad-hoc target: no profile, the client is started in the background
+        self.launcher.launch(target, use_profile=False)
+        # Clear it out after launching
+        self.quick_host_entry.delete(0, tk.END)
 
     def on_grid_resize(self, event):
         # event.width on CTkScrollableFrame can bubble from inner canvas and cause infinite loops
@@ -330,6 +984,9 @@ class App(ctk.CTk):
             self.refresh_grid()
 
     def open_add_host(self):
+        if not self.inventory_loaded:
+            messagebox.showinfo("Loading", "Hosts are still loading, please try again in a moment.")
+            return
         doms = list(self.app_data["domains"].keys())
         AddHostDialog(self, doms, self.save_new_host)
 
@@ -349,37 +1006,165 @@ class App(ctk.CTk):
             saved_dom = self.app_data["domains"].get(dom)
             if not saved_dom: return False
             user = saved_dom["username"]
-            try: pwd = base64.b64decode(saved_dom["password"].encode("utf-8")).decode("utf-8")
-            except: pwd = ""
+            pwd = decode_password(saved_dom.get("password", ""))
             
             self.app_data["hosts"][host] = {"domain": dom, "group": group, "desc": desc, "has_password": bool(pwd)}
-            if user and pwd: self._apply_cmdkey(host, user, pwd)
+            if user and pwd: self.credentials.set_host(host, user, pwd)
         else:
             user = data["user"]
             pwd = data["pass"]
             self.app_data["hosts"][host] = {"domain": None, "group": group, "desc": desc, "username": user, "has_password": bool(pwd)}
-            if user and pwd: self._apply_cmdkey(host, user, pwd)
+            if user and pwd: self.credentials.set_host(host, user, pwd)
 
-        self.save_data()
+        self._index_host(host, self.app_data["hosts"][host])
+        self.store.set_host(host, self.app_data["hosts"][host])
+        self._inventory_changed()
         self.refresh_sidebar()
         self.refresh_grid()
         
-        # Manually kick off an immediate ping thread for this new host without waiting for interval
-        threading.Thread(target=self.ping_single_host, args=(host,), daemon=True).start()
+        # Manually kick off an immediate ping for this new host without waiting for interval
+        if self.agent:
+            self.agent.request_probe(host)  # Probed once the agent has re-read the inventory
+            return True
+        self.probe_policy.reset(host)
+        self.probe_scheduler.submit(host, priority=PRIORITY_MANUAL)
         return True
 
-    def _apply_cmdkey(self, host, user, pwd):
-        try:
-            cmd = ["cmdkey", f"/generic:TERMSRV/{host}", f"/user:{user}", f"/pass:{pwd}"]
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            subprocess.run(cmd, capture_output=True, text=True, check=True, startupinfo=startupinfo)
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to save credential for {host}: {e.stderr}")
+    # =============== BULK IMPORT ===============
+
+    def open_import(self):
+        if not self.inventory_loaded:
+            messagebox.showinfo("Loading", "Hosts are still loading, please try again in a moment.")
+            return
+        path = filedialog.askopenfilename(
+            title="Import Hosts",
+            filetypes=[("Host exports", "*.csv *.json *.ndjson *.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+
+        # Read and validate off the UI thread; the plan is applied in one go afterwards
+        existing = list(self.app_data["hosts"])
+        domains = dict(self.app_data["domains"])
+        self._import_existing = existing
+        self._import_plan = None
+        self._import_error = None
+
+        def worker():
+            try:
+                self._import_plan = plan_import_file(path, existing, domains)
+            except Exception as e:
+                self._import_error = e
+
+        threading.Thread(target=worker, name="host-import", daemon=True).start()
+        self.import_btn.configure(state="disabled")
+        self.cred_status_lbl.configure(text="⇪ Reading import...")
+        self.after(LOAD_POLL_MS, self._poll_import)
+
+    def _poll_import(self):
+        plan, error = self._import_plan, self._import_error
+        if plan is None and error is None:
+            self.after(LOAD_POLL_MS, self._poll_import)
+            return
+        self.cred_status_lbl.configure(text="")
+        self.import_btn.configure(state="normal")
+        if error is not None:
+            messagebox.showerror("Import", f"Could not read the import file:\n{error}")
+            return
+
+        # Hosts added by hand while the file was being read are left as they are; only
+        # those need keying here, the rest were matched by the worker
+        added = {host_key(h) for h in set(self.app_data["hosts"]).difference(self._import_existing)}
+        clashes = [h for h in plan.hosts if h not in plan.updated and host_key(h) in added] if added else []
+        for host in clashes:
+            del plan.hosts[host]
+            plan.duplicates.append(("inventory", host))
+
+        if plan.errors:
+            shown = "\n".join(f"  {where}: {reason}" for where, reason in plan.errors[:10])
+            more = f"\n  ... and {len(plan.errors) - 10} more" if len(plan.errors) > 10 else ""
+            if not plan.hosts:
+                messagebox.showerror("Import", f"Nothing to import ({plan.summary()}):\n{shown}{more}")
+                return
+            if not messagebox.askyesno("Import", f"{plan.summary()}.\n\n{shown}{more}\n\nImport the valid hosts anyway?"):
+                return
+        elif not plan.hosts:
+            messagebox.showinfo("Import", f"Nothing to import ({plan.summary()}).")
+            return
+
+        self.apply_import(plan.hosts)
+        messagebox.showinfo("Import", f"Import complete: {plan.summary()}.")
+
+    def apply_import(self, hosts):
+        """Adds a batch of hosts with one store write, one index update, one refresh and one probe wave"""
+        self.app_data["hosts"].update(hosts)
+        self.store.set_hosts(hosts)
+        for host in hosts:
+            self.card_views.invalidate(host)
+        self._inventory_changed()
+        if not self.store.queryable:
+            self.search_index.add_many(hosts)
+            for host, info in hosts.items():
+                self.group_index.add(host, info)
+        self._sync_credentials()
+
+        self.refresh_sidebar()
+        self.refresh_grid()
+
+        self.resolver.prefetch(split_host_port(h)[0] for h in hosts)
+        for host in hosts:
+            self.status_pipeline.reset(host)
+        if self.agent:
+            for host in hosts:
+                self.agent.request_probe(host)  # Probed once the agent has re-read the inventory
+            return
+        for host in hosts:
+            self.probe_policy.reset(host)
+        self.probe_scheduler.submit_wave(hosts, PROBE_WAVE_DEADLINE)
+
+    def _index_host(self, host, info):
+        """Keeps the in-memory indexes in step with a host change (info=None for removal)"""
+        self.card_views.invalidate(host)
+        if self.store.queryable:
+            return  # The database indexes itself on write
+        if info is None:
+            self.search_index.remove(host)
+            self.group_index.remove(host)
+        else:
+            self.search_index.add(host, info)
+            self.group_index.add(host, info)
+
+    def _sync_credentials(self):
+        """Brings the vault in line with the inventory. Only a column copy of the hosts is made
+        here; working out what to write (a salted hash per host) runs on the sync's planner thread"""
+        snapshot = copy_inventory(self.app_data)
+        self.credentials.sync(lambda: desired_credentials(snapshot))
+
+    def _on_credential_progress(self, done, total, failed):
+        # Runs on a credential worker; report on the Tk thread
+        self.call_on_ui(self._show_credential_progress, done, total, failed)
+
+    def _show_credential_progress(self, done, total, failed):
+        if done < total:
+            self.cred_status_lbl.configure(text=f"🔑 Syncing credentials {done}/{total}")
+            return
+        self.cred_status_lbl.configure(text="")
+        if failed:
+            messagebox.showerror("Error", f"Failed to save {failed} of {total} credential(s). See the console for details.")
+
+    def _on_credential_error(self, host, e):
+        print(f"Failed to save credential for {host}: {e}")
 
     def on_search(self):
+        # Debounce: only filter once typing pauses, not on every keystroke
+        if self._search_after_id:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(SEARCH_DEBOUNCE_MS, self.apply_search)
+
+    def apply_search(self):
+        self._search_after_id = None
         self.search_query = self.search_var.get().lower()
-        self.refresh_grid()
+        # The search doesn't change which groups exist, so leave the dropdown alone
+        self.refresh_grid(update_groups=False)
 
     def filter_by_domain(self, dom):
         self.current_domain_filter = dom
@@ -397,68 +1182,90 @@ class App(ctk.CTk):
         self.refresh_grid()
 
     def refresh_sidebar(self):
-        for w in self.sidebar.winfo_children():
-            w.destroy()
-
-        dom_lbl = ctk.CTkLabel(self.sidebar, text="DOMAINS", font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold"), text_color=TEXT_MUTED, anchor="w")
-        dom_lbl.pack(fill="x", padx=15, pady=(20, 10))
-
-        bg = CARD_BG if self.current_domain_filter is None else "transparent"
-        btn = ctk.CTkButton(self.sidebar, text="🌐 All Domains", anchor="w", fg_color=bg, hover_color=CARD_HOVER, corner_radius=6, height=36, text_color=TEXT_PRIMARY, font=self.font_normal, command=lambda: self.filter_by_domain(None))
-        btn.pack(fill="x", padx=10, pady=2)
+        """Syncs the sidebar with the group index, reconfiguring only buttons that changed"""
+        with self.m_refresh_sidebar.time():
+            self._refresh_sidebar()
 
-        domains = {}
-        for h, info in self.app_data["hosts"].items():
-            d = info.get("domain")
-            if d:
-                domains[d] = domains.get(d, 0) + 1
+    def _refresh_sidebar(self):
+        if not self.sidebar_buttons:
+            dom_lbl = ctk.CTkLabel(self.sidebar, text="DOMAINS", font=ctk.CTkFont(family="Segoe UI", size=11, weight="bold"), text_color=TEXT_MUTED, anchor="w")
+            dom_lbl.pack(fill="x", padx=15, pady=(20, 10))
 
-        for dom, count in sorted(domains.items()):
-            bg = CARD_BG if self.current_domain_filter == dom else "transparent"
-            btn = ctk.CTkButton(self.sidebar, text=f"🏢 {dom} ({count})", anchor="w", fg_color=bg, hover_color=CARD_HOVER, corner_radius=6, height=36, text_color=TEXT_PRIMARY, font=self.font_normal, command=lambda d=dom: self.filter_by_domain(d))
+            btn = ctk.CTkButton(self.sidebar, text="🌐 All Domains", anchor="w", fg_color="transparent", hover_color=CARD_HOVER, corner_radius=6, height=36, text_color=TEXT_PRIMARY, font=self.font_normal, command=lambda: self.filter_by_domain(None))
             btn.pack(fill="x", padx=10, pady=2)
-
-    def refresh_grid(self):
-        for widget in self.grid_frame.winfo_children():
-            widget.destroy()
-            
-        self.status_widgets.clear()
-
-        domain_filtered_hosts = {}
-        available_groups = set()
-        
-        for host, info in self.app_data["hosts"].items():
-            if self.current_domain_filter and info.get("domain") != self.current_domain_filter:
-                continue
-            domain_filtered_hosts[host] = info
-            g = info.get("group", "Ungrouped")
-            if not g: g = "Ungrouped"
-            available_groups.add(g)
-
-        new_group_vals = ["All Groups"] + sorted(list(available_groups))
-        self.group_filter_dropdown.configure(values=new_group_vals)
+            self.sidebar_buttons[None] = btn
+            self._sidebar_state[None] = ("🌐 All Domains", False)
+
+        counts = dict(self.group_index.domain_counts())
+
+        # Domains whose last host went away
+        for dom in [d for d in self.sidebar_buttons if d is not None and d not in counts]:
+            self.sidebar_buttons.pop(dom).destroy()
+            del self._sidebar_state[dom]
+
+        ordered = sorted(counts)
+        for i, dom in enumerate(ordered):
+            if dom not in self.sidebar_buttons:
+                btn = ctk.CTkButton(self.sidebar, text="", anchor="w", fg_color="transparent", hover_color=CARD_HOVER, corner_radius=6, height=36, text_color=TEXT_PRIMARY, font=self.font_normal, command=lambda d=dom: self.filter_by_domain(d))
+                # Keep alphabetical order by packing in front of the next existing domain
+                following = next((self.sidebar_buttons[d] for d in ordered[i + 1:] if d in self.sidebar_buttons), None)
+                if following is not None:
+                    btn.pack(fill="x", padx=10, pady=2, before=following)
+                else:
+                    btn.pack(fill="x", padx=10, pady=2)
+                self.sidebar_buttons[dom] = btn
+                self._sidebar_state[dom] = (None, False)
+
+        for dom, btn in self.sidebar_buttons.items():
+            text = self._sidebar_state[dom][0] if dom is None else f"🏢 {dom} ({counts[dom]})"
+            state = (text, dom == self.current_domain_filter)
+            if state != self._sidebar_state[dom]:
+                self._sidebar_state[dom] = state
+                btn.configure(text=text, fg_color=CARD_BG if state[1] else "transparent")
+
+    def refresh_group_filter(self):
+        new_group_vals = ["All Groups"] + self.group_index.groups(self.current_domain_filter)
+        if new_group_vals != self._group_filter_values:
+            self._group_filter_values = new_group_vals
+            self.group_filter_dropdown.configure(values=new_group_vals)
         if self.current_group_filter not in new_group_vals:
             self.current_group_filter = "All Groups"
             self.group_filter_var.set("All Groups")
 
-        filtered_hosts = {}
-        for host, info in domain_filtered_hosts.items():
-            g = info.get("group", "Ungrouped")
-            if not g: g = "Ungrouped"
-            if self.current_group_filter != "All Groups" and g != self.current_group_filter:
-                continue
-                
-            if self.search_query:
-                s = self.search_query
-                match_host = s in host.lower()
-                match_user = s in info.get("username", "").lower()
-                match_desc = s in info.get("desc", "").lower()
-                if not (match_host or match_user or match_desc):
-                    continue
+    def refresh_grid(self, update_groups=True):
+        with self.m_refresh_grid.time():
+            self._refresh_grid(update_groups)
+
+    def _refresh_grid(self, update_groups):
+        if not self.inventory_loaded:
+            return  # Resizes during startup; the grid is filled once the load finishes
+        if update_groups:
+            self.refresh_group_filter()
+
+        grp = self.current_group_filter if self.current_group_filter != "All Groups" else None
 
-            filtered_hosts[host] = info
+        if self.store.queryable:
+            # Filtered, counted and paged by the database; cards fetch their rows lazily
+            filtered_hosts = self.store.query_hosts(self.current_domain_filter, grp, self.search_query)
+        else:
+            # The search index returns matches (or every host) already in grid order
+            filtered_hosts = self.search_index.search(self.search_query)
+            allowed = self.group_index.hosts_in(self.current_domain_filter, grp)
+            if allowed is not None:
+                filtered_hosts = [h for h in filtered_hosts if h in allowed]
 
         self.header_count_lbl.configure(text=f"{len(filtered_hosts)} Hosts")
+        self.grid_hosts = filtered_hosts
+
+        if VIRTUAL_GRID:
+            # Only the cards in view are (re)bound; nothing is destroyed
+            self.grid_frame.set_hosts(self.grid_hosts, self.card_columns)
+            return
+
+        for widget in self.grid_frame.winfo_children():
+            widget.destroy()
+        self.status_widgets.clear()
+        self.host_cards.clear()
 
         if not filtered_hosts:
             ctk.CTkLabel(self.grid_frame, text="No hosts found.", text_color=TEXT_MUTED).grid(row=0, column=0, pady=20)
@@ -467,105 +1274,51 @@ class App(ctk.CTk):
         for i in range(self.card_columns):
             self.grid_frame.grid_columnconfigure(i, weight=1)
 
-        row = 0
-        col = 0
-        for host in sorted(filtered_hosts.keys(), key=lambda x: x.lower()):
-            card = self.create_host_card(self.grid_frame, host, filtered_hosts[host])
+        # Build the cards a chunk per UI tick so the first rows appear right away
+        self._grid_build_gen += 1
+        self._build_card_chunk(self._grid_build_gen, 0)
+
+    def _build_card_chunk(self, gen, start):
+        if gen != self._grid_build_gen:
+            return  # A newer refresh_grid has started over
+        hosts = self.app_data["hosts"]
+        end = min(start + GRID_BUILD_CHUNK, len(self.grid_hosts))
+        for i in range(start, end):
+            host = self.grid_hosts[i]
+            if host not in hosts:
+                continue  # Deleted since the refresh began
+            card = self.create_host_card(self.grid_frame, host, hosts[host])
+            row, col = divmod(i, self.card_columns)
             card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            
-            col += 1
-            if col >= self.card_columns:
-                col = 0
-                row += 1
+        if end < len(self.grid_hosts):
+            self.after(1, self._build_card_chunk, gen, end)
 
     def create_host_card(self, parent, host, info):
-        # Determine icon based on description/group
-        desc = info.get("desc", info.get("group", ""))
-        d_lower = desc.lower()
-        if "sql" in d_lower or "db" in d_lower or "database" in d_lower:
-            icon = "🛢️"
-        elif "linux" in d_lower:
-            icon = "🐧"
-        elif "laptop" in d_lower or "pc" in d_lower or "desk" in d_lower:
-            icon = "💻"
-        else:
-            icon = "🖥️"
-
-        card = ctk.CTkFrame(parent, fg_color=CARD_BG, corner_radius=8, cursor="hand2", height=90)
-        card.grid_columnconfigure(1, weight=1)
-        card.grid_rowconfigure(0, weight=1)
-        card.grid_rowconfigure(1, weight=1)
-
-        icon_lbl = ctk.CTkLabel(card, text=icon, font=self.font_icon)
-        icon_lbl.grid(row=0, column=0, rowspan=2, padx=(20, 12), pady=0, sticky="w")
-
-        # Trim excessively long text so it does not overflow
-        display_host = host if len(host) <= 20 else host[:17] + "..."
-        display_desc = desc if len(desc) <= 28 else desc[:25] + "..."
-
-        name_lbl = ctk.CTkLabel(card, text=display_host, font=self.font_bold, text_color=TEXT_PRIMARY, anchor="w")
-        name_lbl.grid(row=0, column=1, sticky="sw", padx=(5, 5), pady=(20, 0))
-
-        # Build desc and status indicator wrapper
-        desc_frame = ctk.CTkFrame(card, fg_color="transparent")
-        desc_frame.grid(row=1, column=1, sticky="nw", padx=(5, 5), pady=(2, 20))
-        
-        # Ping Status Graphic
-        current_status = self.host_statuses.get(host, "pending")
-        color = STATUS_PENDING
-        if current_status == "online": color = STATUS_ONLINE
-        elif current_status == "offline": color = STATUS_OFFLINE
-        
-        # Create small rounded colored dot
-        status_dot = ctk.CTkLabel(desc_frame, text="●", text_color=color, font=self.font_normal)
-        status_dot.pack(side="left", padx=(0, 6))
-        self.status_widgets[host] = status_dot
-
-        desc_lbl = ctk.CTkLabel(desc_frame, text=display_desc, font=self.font_normal, text_color=TEXT_MUTED, anchor="w")
-        desc_lbl.pack(side="left")
-
-        opts_btn = ctk.CTkButton(card, text="⋮", width=24, height=24, fg_color="transparent", hover_color=BG_MAIN, text_color=TEXT_MUTED, font=ctk.CTkFont(size=18, weight="bold"), corner_radius=12)
-        opts_btn.grid(row=0, column=2, sticky="ne", padx=10, pady=10)
-        opts_btn.bind("<Button-1>", lambda e, h=host: self.show_context_menu(e, h))
-
-        def on_enter(e): card.configure(fg_color=CARD_HOVER)
-        def on_leave(e): card.configure(fg_color=CARD_BG)
-        
-        elements = [card, icon_lbl, name_lbl, desc_frame, desc_lbl, status_dot]
-        for el in elements:
-            el.bind("<Enter>", on_enter)
-            el.bind("<Leave>", on_leave)
-            el.bind("<Button-1>", lambda e, h=host: self.connect_to_host(h))
+        card = HostCard(parent, self)
+        card.bind_host(host, info, self.host_statuses.get(host, "pending"))
+        card.set_selected(host in self.selected_hosts)
+        self.status_widgets[host] = card.status_dot
+        self.host_cards[host] = card
+        return card
 
-        # Add right-click context menu directly to the card as well
-        for el in elements + [opts_btn]:
-            el.bind("<Button-3>", lambda e, h=host: self.show_context_menu(e, h))
+    def _bind_grid_card(self, card, host):
+        """VirtualCardGrid callback: points a pooled card at another host"""
+        info = self.app_data["hosts"].get(host, {})
+        card.bind_host(host, info, self.host_statuses.get(host, "pending"))
+        card.set_selected(host in self.selected_hosts)
 
-        return card
+    def _on_grid_cards_bound(self, bound):
+        # Keep status_widgets pointing at whichever cards currently show each host
+        self.status_widgets.clear()
+        for host, card in bound.items():
+            self.status_widgets[host] = card.status_dot
+        self.host_cards = bound
 
     # =============== PING LOGIC ===============
 
     def ping_single_host(self, host):
         """Pings a single host and returns 'online' or 'offline'"""
-        try:
-            # Strip the port number for the native ping command if custom port is specified
-            target = host
-            if ":" in host:
-                parts = host.rsplit(":", 1)
-                if parts[1].isdigit():  # It's an IPv4 or hostname with port, not raw IPv6 
-                    target = parts[0]
-                    
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            result = subprocess.run(
-                ["ping", "-n", "1", "-w", "1000", target], 
-                capture_output=True, 
-                startupinfo=startupinfo
-            )
-            status = "online" if result.returncode == 0 else "offline"
-            return host, status
-        except Exception:
-            return host, "offline"
+        return host, ping_host(host, resolver=self.resolver)
 
     def update_ui_status(self, host, status):
         """Thread-safe update of UI elements from ping thread"""
@@ -579,44 +1332,143 @@ class App(ctk.CTk):
         
         # If the widget currently exists on the screen, intelligently update its color
         if host in self.status_widgets:
-            if status == "online": color = STATUS_ONLINE
-            elif status == "offline": color = STATUS_OFFLINE
-            else: color = STATUS_PENDING
-            
             try:
                 # Basic safety check to ensure element hasn't been torn down asynchronously
                 if self.status_widgets[host].winfo_exists():
-                    self.status_widgets[host].configure(text_color=color)
+                    self.status_widgets[host].configure(text_color=self.host_dot_color(host, status))
             except Exception:
                 pass 
 
+    def start_probing(self):
+        """Subscribes to the shared probe agent if one is configured, else probes in-process"""
+        if PROBE_AGENT:
+            threading.Thread(target=self._subscribe_agent, daemon=True).start()
+        else:
+            self._start_ping_loop()
+
+    def _start_ping_loop(self):
+        if self.ping_thread_active:
+            return
+        self.ping_thread_active = True
+        self.ping_thread = threading.Thread(target=self.ping_loop_daemon, daemon=True)
+        self.ping_thread.start()
+
+    def _subscribe_agent(self):
+        client = AgentClient(*PROBE_AGENT, on_results=self._on_agent_results, on_disconnect=self._on_agent_lost)
+        try:
+            client.connect(CONFIG_FILE)
+        except OSError as e:
+            print(f"Probe agent unavailable ({e}), probing in-process")
+            self.call_on_ui(self._start_ping_loop)
+            return
+        self.agent = client
+        print(f"Subscribed to the probe agent at {PROBE_AGENT[0]}:{PROBE_AGENT[1]}")
+
+    def _on_agent_results(self, results):
+        # Runs on the agent reader thread, like a probe worker
+        for host, status, latency_ms in results:
+            self.history.record(host, status, latency_ms)
+            self.last_status.record(host, status, latency_ms)
+            self.status_pipeline.push(host, status, latency_ms)
+
+    def _on_agent_lost(self):
+        self.agent = None
+        print("Lost the probe agent, probing in-process")
+        self.call_on_ui(self._start_ping_loop)
+
+    def _inventory_changed(self):
+        """Tells the agent to re-read the inventory; it would notice within a few seconds anyway"""
+        if self.agent:
+            self.agent.request_reload()
+
     def ping_loop_daemon(self):
-        """Background loop that checks ping status explicitly for all hosts"""
+        """Background loop that submits every host whose next probe is due"""
         while self.ping_thread_active:
-            # Snapshot the keys intentionally to prevent runtime dictionary changes
-            hosts_to_check = list(self.app_data["hosts"].keys())
-            
-            if not hosts_to_check:
-                time.sleep(5)
-                continue
-                
-            # Perform parallel pings using threading
-            threads = []
-            for host in hosts_to_check:
-                t = threading.Thread(target=self._ping_worker, args=(host,))
-                t.start()
-                threads.append(t)
-                
-            # Pause for a bit before the next massive ping wave (every 30 seconds)
-            for _ in range(6): 
-                if not self.ping_thread_active: break
-                time.sleep(5)
+            try:
+                # Snapshot the keys intentionally to prevent runtime dictionary changes
+                hosts_to_check = list(self.app_data["hosts"].keys())
+
+                # Each host has its own adaptive interval (see ProbePolicy). Hosts still queued
+                # or in flight are skipped by the scheduler, so slow probes never pile up.
+                deadline = time.monotonic() + PROBE_WAVE_DEADLINE
+                for host in self.probe_policy.due(hosts_to_check):
+                    self.probe_scheduler.submit(host, deadline, self.probe_policy.priority(host))
+            except Exception as e:
+                # A bad tick must not end probing for the rest of the session
+                print(f"Probe tick failed: {e}")
+
+            time.sleep(PROBE_TICK)
 
     def _ping_worker(self, host):
-        """A quick worker thread that does the ping and updates the UI map"""
-        _, status = self.ping_single_host(host)
+        """Runs on a scheduler worker: does the ping and updates the UI map"""
+        with self.m_probe_seconds.time():
+            _, status = self.ping_single_host(host)
+        self.m_probes.labels(status).inc()
+        self.probe_policy.record(host, status)
+        self.history.record(host, status)  # ping exit codes carry no RTT
+        self.last_status.record(host, status)
         # Update UI thread-safely
-        self.ping_queue.put((host, status))
+        self.status_pipeline.push(host, status)
+
+    async def _engine_ping_worker(self, host):
+        """Runs on the probe event loop: TCP connect or ICMP echo, then reports back"""
+        with self.m_probe_seconds.time():
+            result = await self.probe_engine.probe(host)
+        self.m_probes.labels(result.status).inc()
+        if result.status == UNKNOWN:
+            # Its name lookup is still queued (e.g. behind the startup prefetch): try again next tick
+            self.probe_policy.reset(host)
+            return
+        self.probe_policy.record(host, result.status)
+        self.history.record(host, result.status, result.latency_ms)
+        self.last_status.record(*result)
+        self.status_pipeline.push(*result)
+
+    def track_visible_hosts(self):
+        """Tells the probe policy which cards are on screen so they are probed first"""
+        hosts = self.grid_hosts
+        visible = []
+        if VIRTUAL_GRID:
+            visible = self.grid_frame.visible_hosts()
+        elif hosts:
+            try:
+                top, bottom = self.grid_frame._parent_canvas.yview()
+            except Exception:
+                top, bottom = 0.0, 1.0
+            rows = math.ceil(len(hosts) / self.card_columns)
+            first = int(top * rows) * self.card_columns
+            last = math.ceil(bottom * rows) * self.card_columns
+            visible = hosts[first:last]
+        if visible != self._visible_hosts:
+            self._visible_hosts = visible
+            self.probe_policy.set_visible(visible)
+        self.after(1000, self.track_visible_hosts)
+
+    def host_dot_color(self, host, status):
+        if status == "online" and self.history.degraded(host):
+            return STATUS_DEGRADED
+        return status_color(status)
+
+    def host_trend(self, host):
+        """(sparkline, degraded) for a host's card; until its first probe, the age of its last-known status"""
+        sparkline = self.history.sparkline(host, SPARKLINE_WIDTH)
+        if not sparkline:
+            known = self.last_status.get(host)
+            return (f"{format_age(time.time() - known[2])} ago" if known else ""), False
+        return sparkline, self.history.degraded(host)
+
+    def refresh_trends(self):
+        """Repaints the sparkline and dot of cards whose host got new samples, nothing else"""
+        for host in self.history.drain_changed():
+            card = self.host_cards.get(host)
+            if card is None or card.host != host:
+                continue
+            try:
+                card.set_trend(*self.host_trend(host))
+                card.status_dot.configure(text_color=self.host_dot_color(host, self.host_statuses.get(host, "pending")))
+            except Exception:
+                pass  # Card torn down by a rebuild
+        self.after(TREND_REFRESH_MS, self.refresh_trends)
 
     # =============== CONTEXT MENU ===============
     def show_context_menu(self, event, host):
@@ -626,7 +1478,9 @@ class App(ctk.CTk):
 
         menu = ctk.CTkToplevel(self)
         menu.overrideredirect(True)
-        menu.geometry(f"170x170+{event.x_root}+{event.y_root}")
+        # In rdp mode the history label has an extra, wider line (the handshake result)
+        width, height = (250, 226) if isinstance(self.probe_engine, RdpProbeEngine) else (170, 210)
+        menu.geometry(f"{width}x{height}+{event.x_root}+{event.y_root}")
         menu.configure(fg_color=BG_MAIN) # Border color behind
         self._current_menu = menu
 
@@ -651,7 +1505,10 @@ class App(ctk.CTk):
             self.delete_host(host)
 
         btn_font = ctk.CTkFont(family="Segoe UI", size=13, weight="bold")
-        
+
+        # Latency summary from the host's probe history
+        ctk.CTkLabel(menu_frame, text=self.describe_history(host), font=self.font_small, text_color=TEXT_MUTED, justify="left", anchor="w").pack(fill="x", padx=12, pady=(6, 0))
+
         btn_edit = ctk.CTkButton(menu_frame, text="Edit", anchor="w", fg_color="transparent", hover_color=CARD_HOVER, text_color=TEXT_PRIMARY, font=btn_font, height=36, command=action_edit)
         btn_edit.pack(fill="x", padx=4, pady=(4, 2))
 
@@ -671,10 +1528,37 @@ class App(ctk.CTk):
         menu.bind("<FocusOut>", lambda e: menu.destroy())
         menu.focus_set()
 
+    def describe_history(self, host):
+        line = self._describe_samples(host)
+        if isinstance(self.probe_engine, RdpProbeEngine):
+            line += "\n" + describe_check(self.probe_engine.checks.get(host))
+        return line
+
+    def _describe_samples(self, host):
+        s = self.history.summary(host)
+        if s is None:
+            known = self.last_status.get(host)
+            if known:
+                return f"Last known {known[0]}, {format_age(time.time() - known[2])} ago\nNot probed yet this session"
+            return "No probes yet"
+        if s["p50_ms"] is not None:
+            line = f"p50 {s['p50_ms']:.0f} ms · p95 {s['p95_ms']:.0f} ms"
+        else:
+            line = f"{s['count']} probes"
+        line += f" · {s['loss_pct']:.0f}% loss"
+        if s["last_change"]:
+            line += f"\nChanged {format_age(time.time() - s['last_change'])} ago"
+        return line
+
     def ping_manually(self, host):
         self.host_statuses[host] = "pending"
         self.update_ui_status(host, "pending")
-        threading.Thread(target=self._ping_worker, args=(host,), daemon=True).start()
+        self.status_pipeline.reset(host)  # So an unchanged result still repaints the dot
+        if self.agent:
+            self.agent.request_probe(host)  # Every subscriber sees the result
+            return
+        self.probe_policy.reset(host)
+        self.probe_scheduler.submit(host, priority=PRIORITY_MANUAL)
 
     def copy_ip(self, host):
         target = host.rsplit(":", 1)[0] if ":" in host and host.rsplit(":", 1)[1].isdigit() else host
@@ -688,29 +1572,73 @@ class App(ctk.CTk):
         if messagebox.askyesno("Confirm", f"Remove connection {host}?"):
             if host in self.app_data["hosts"]:
                 del self.app_data["hosts"][host]
+                self._index_host(host, None)
                 
                 # BUGFIX: Wipe status states immediately so lagging threads don't draw dots on wrong widgets
                 if host in self.host_statuses: del self.host_statuses[host]
+                self.status_pipeline.reset(host)
+                self.probe_policy.forget(host)
+                self.history.forget(host)
+                self.last_status.forget(host)
+                if isinstance(self.probe_engine, RdpProbeEngine):
+                    self.probe_engine.forget(host)
                 if host in self.status_widgets: del self.status_widgets[host]
+                self.host_cards.pop(host, None)
+                if host in self.selected_hosts:
+                    self.toggle_selection(host)
+                self.launcher.profiles.discard(host)
                 
-                self.save_data()
+                self.store.delete_host(host)
+                self._inventory_changed()
                 self.refresh_sidebar()
                 self.refresh_grid()
-                
-            try:
-                cmd = ["cmdkey", f"/delete:TERMSRV/{host}"]
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                subprocess.run(cmd, capture_output=True, startupinfo=startupinfo)
-            except Exception:
-                pass
+
+            self.credentials.remove_host(host)
+
+    # =============== SESSION LAUNCH ===============
+
+    def _host_username(self, host):
+        """Username written into the host's .rdp profile (the password stays in the vault)"""
+        info = self.app_data["hosts"].get(host, {})
+        dom = info.get("domain")
+        if dom:
+            return (self.app_data["domains"].get(dom) or {}).get("username")
+        return info.get("username")
 
     def connect_to_host(self, host):
-        try:
-            cmd = ["mstsc", f"/v:{host}"]
-            subprocess.Popen(cmd)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to launch RDP session: {e}")
+        self.launcher.launch(host, self._host_username(host))
+
+    def connect_selected(self):
+        hosts = [h for h in self.selected_hosts if h in self.app_data["hosts"]]
+        self.launcher.launch_many([(h, self._host_username(h)) for h in hosts])
+        self.clear_selection()
+
+    def _on_launch_error(self, host, e):
+        # Runs on a launcher thread; report on the Tk thread
+        self.call_on_ui(messagebox.showerror, "Error", f"Failed to launch RDP session to {host}: {e}")
+
+    def toggle_selection(self, host):
+        if self.selected_hosts.pop(host, None) is None:
+            self.selected_hosts[host] = True
+        card = self.host_cards.get(host)
+        if card is not None:
+            card.set_selected(host in self.selected_hosts)
+        self._update_selection_button()
+
+    def clear_selection(self):
+        for host in self.selected_hosts:
+            card = self.host_cards.get(host)
+            if card is not None:
+                card.set_selected(False)
+        self.selected_hosts.clear()
+        self._update_selection_button()
+
+    def _update_selection_button(self):
+        if self.selected_hosts:
+            self.connect_selected_btn.configure(text=f"▶ Connect {len(self.selected_hosts)} Selected")
+            self.connect_selected_btn.pack(side="right", padx=5)
+        else:
+            self.connect_selected_btn.pack_forget()
 
 if __name__ == "__main__":
     app = App()
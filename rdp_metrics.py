@@ -0,0 +1,425 @@
+"""Counters, gauges and latency histograms, with Prometheus/JSON export and a stall watchdog.
+
+A disabled Registry hands out shared no-op metrics, so instrumented code paths
+cost one method call when metrics are off.
+"""
+import bisect
+import http.server
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+# Seconds; spans sub-millisecond UI work up to probe timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_str(names, values):
+    if not names or not values:
+        return ""
+    pairs = ",".join('%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Timer:
+    __slots__ = ("hist", "started")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> float
+
+    def inc(self, amount=1, _labels=()):
+        with self._lock:
+            self._values[_labels] = self._values.get(_labels, 0) + amount
+
+    def labels(self, *values):
+        """The child counter for one combination of label values"""
+        return _LabeledCounter(self, values)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items()) or [((), 0)]
+        return [(self.name, _label_str(self.label_names, k), v) for k, v in items]
+
+    def snapshot(self):
+        with self._lock:
+            if not self.label_names:
+                return self._values.get((), 0)
+            return {",".join(map(str, k)): v for k, v in self._values.items()}
+
+
+class _LabeledCounter:
+    __slots__ = ("counter", "values")
+
+    def __init__(self, counter, values):
+        self.counter = counter
+        self.values = values
+
+    def inc(self, amount=1):
+        self.counter.inc(amount, self.values)
+
+
+class Gauge:
+    """Either set() directly or computed on read by `fn` (e.g. a queue length)"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        self._value += amount
+
+    def dec(self, amount=1):
+        self._value -= amount
+
+    def value(self):
+        if self.fn is None:
+            return self._value
+        try:
+            return self.fn()
+        except Exception:
+            return float("nan")
+
+    def samples(self):
+        return [(self.name, "", self.value())]
+
+    def snapshot(self):
+        return self.value()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)  # The last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """Context manager observing the duration of its block in seconds"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Approximate quantile (upper bucket bound), None when nothing was observed"""
+        with self._lock:
+            counts, total = list(self._counts), self._count
+        if not total:
+            return None
+        rank = q * total
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            if running >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        with self._lock:
+            counts, total, sum_ = list(self._counts), self._count, self._sum
+        out, running = [], 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            out.append((self.name + "_bucket", '{le="%s"}' % bound, running))
+        out.append((self.name + "_bucket", '{le="+Inf"}', total))
+        out.append((self.name + "_sum", "", sum_))
+        out.append((self.name + "_count", "", total))
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            total, sum_ = self._count, self._sum
+        return {"count": total, "sum": round(sum_, 6), "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99)}
+
+
+class _NullMetric:
+    """Stands in for every metric type when the registry is disabled"""
+
+    def inc(self, *args):
+        pass
+
+    def labels(self, *values):
+        return self
+
+    def dec(self, *args):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+class Registry:
+    """Named metrics, created on first use. Disabled registries return no-op metrics"""
+
+    def __init__(self, enabled=True, prefix="rapidrdp_"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        if not self.enabled:
+            return NULL_METRIC
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help="", labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", fn=None):
+        return self._get(Gauge, name, help, fn)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for m in self.metrics():
+            if m.help:
+                lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, labels, value in m.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {m.name: m.snapshot() for m in self.metrics()}
+
+
+DISABLED = Registry(enabled=False)
+
+
+class MetricsServer:
+    """Serves GET /metrics (Prometheus text) and /metrics.json on a local port"""
+
+    def __init__(self, registry, port=9464, host="127.0.0.1", watchdog=None):
+        self.registry = registry
+        self.watchdog = watchdog
+        owner = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, ctype = owner.registry.render_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, ctype = json.dumps(owner.report(), indent=2), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    def report(self):
+        report = {"timestamp": time.time(), "metrics": self.registry.snapshot()}
+        if self.watchdog:
+            report["stalls"] = self.watchdog.recent()
+        return report
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class JsonDumper:
+    """Rewrites `path` with a JSON snapshot of the registry every `interval` seconds"""
+
+    def __init__(self, registry, path, interval=30.0, watchdog=None):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.watchdog = watchdog
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def dump(self):
+        report = {"timestamp": time.time(), "metrics": self.registry.snapshot()}
+        if self.watchdog:
+            report["stalls"] = self.watchdog.recent()
+        from rdp_storage import write_atomic  # rdp_storage imports this module
+        try:
+            write_atomic(self.path, json.dumps(report, indent=2, default=str))
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(1.0)
+        self.dump()
+
+
+class StallWatchdog:
+    """Notices when the main (Tk) thread stops calling heartbeat() and samples its stack.
+
+    The UI calls heartbeat() from a periodic after() callback. When no heartbeat has
+    arrived for `threshold` seconds, the watchdog thread records where the main thread
+    is stuck, sampling again every `sample_every` seconds (up to `max_samples`) until
+    it recovers. Finished stalls are kept in a short ring for inspection.
+    """
+
+    def __init__(self, registry=DISABLED, threshold=0.25, sample_every=0.1, max_samples=5, keep=20):
+        self.threshold = threshold
+        self.sample_every = sample_every
+        self.max_samples = max_samples
+        self.stalls = deque(maxlen=keep)
+        self._target = threading.main_thread().ident
+        self._last = time.monotonic()
+        self._current = None  # Stall in progress: {"started", "samples"}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+        self._count = registry.counter("ui_stalls_total", "Main loop stalls longer than the watchdog threshold")
+        self._duration = registry.histogram("ui_stall_seconds", "Duration of main loop stalls")
+
+    def start(self):
+        self._last = time.monotonic()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(1.0)
+
+    def heartbeat(self):
+        self._last = time.monotonic()
+
+    def recent(self):
+        return list(self.stalls)
+
+    def _sample(self):
+        frame = sys._current_frames().get(self._target)
+        return "".join(traceback.format_stack(frame)) if frame is not None else ""
+
+    def _run(self):
+        while not self._stop.wait(self.sample_every):
+            silent = time.monotonic() - self._last
+            current = self._current
+            if silent >= self.threshold:
+                if current is None:
+                    current = self._current = {"started": time.time() - silent, "samples": []}
+                if len(current["samples"]) < self.max_samples:
+                    current["samples"].append(self._sample())
+            elif current is not None:
+                # Recovered: the stall lasted from its start until the latest heartbeat
+                current["duration_s"] = round(self._last_wall() - current["started"], 3)
+                self.stalls.append(current)
+                self._count.inc()
+                self._duration.observe(current["duration_s"])
+                print(f"UI stalled for {current['duration_s']:.2f}s in:\n{current['samples'][0]}")
+                self._current = None
+
+    def _last_wall(self):
+        return time.time() - (time.monotonic() - self._last)
+
+
+class PhaseTimer:
+    """Named checkpoints since `started` (a time.perf_counter() value), e.g. startup stages"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []  # (name, seconds since the previous mark)
+        self._last = self.started
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+        return now - self.started
+
+    def add(self, name, seconds):
+        """Records a phase measured elsewhere (e.g. on a background thread) without moving the clock"""
+        self.phases.append((name, seconds))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        parts = ", ".join(f"{name} {secs * 1000:.0f} ms" for name, secs in self.phases)
+        return f"{parts} (total {self.elapsed() * 1000:.0f} ms)"
+
+    def publish(self, registry, prefix="startup_"):
+        for name, secs in self.phases:
+            registry.gauge(f"{prefix}{name}_seconds", f"Startup phase: {name}").set(secs)
@@ -0,0 +1,148 @@
+"""Reachability probes that run without spawning a process per host."""
+import asyncio
+import collections
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_RDP_PORT = 3389
+DNS_TIMEOUT = 10.0  # Seconds a probe waits for its name lookup, which may be queued behind a startup prefetch
+
+# Probe status when the host's name lookup had not finished: neither online nor
+# offline, so callers should probe again later rather than report anything
+UNKNOWN = "unknown"
+LOOKUP_PENDING = object()  # resolve_async() result for a lookup still running
+
+ProbeResult = collections.namedtuple("ProbeResult", ["host", "status", "latency_ms"])
+
+
+def split_host_port(host, default_port=DEFAULT_RDP_PORT):
+    """Splits a 'host:port' entry into (host, port), falling back to the RDP default"""
+    if host.startswith("[") and "]" in host:
+        # Bracketed IPv6, optionally with a port: [fe80::1]:3390
+        name, _, rest = host[1:].partition("]")
+        if rest.startswith(":") and rest[1:].isdigit():
+            return name, int(rest[1:])
+        return name, default_port
+    if ":" in host:
+        name, port = host.rsplit(":", 1)
+        # It's an IPv4 or hostname with port, not raw IPv6
+        if port.isdigit() and ":" not in name:
+            return name, int(port)
+    return host, default_port
+
+
+def ping_host(host, timeout_ms=1000, resolver=None):
+    """Pings a single host with the native ping command and returns 'online' or 'offline'.
+
+    With a `resolver` (see rdp_dns.DnsCache) the cached address is pinged, so ping
+    does not look the name up again every wave.
+    """
+    try:
+        # Strip the port number for the native ping command if custom port is specified
+        target, _ = split_host_port(host)
+        if resolver is not None:
+            target = resolver.resolve(target)
+            if target is None:
+                return "offline"
+
+        if sys.platform.startswith("win"):
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            result = subprocess.run(
+                ["ping", "-n", "1", "-w", str(timeout_ms), target],
+                capture_output=True,
+                startupinfo=startupinfo
+            )
+        else:
+            result = subprocess.run(
+                ["ping", "-c", "1", "-W", str(max(1, round(timeout_ms / 1000))), target],
+                capture_output=True
+            )
+        return "online" if result.returncode == 0 else "offline"
+    except Exception:
+        return "offline"
+
+
+class TcpProbeEngine:
+    """Checks hosts by opening a TCP connection to their RDP port.
+
+    All probes share one asyncio event loop running on a background thread, so
+    thousands can be in flight at once without a thread or process per host.
+    A host is 'online' when the connection is accepted within `timeout` seconds.
+    With a `resolver` (see rdp_dns.DnsCache) names are looked up through the shared
+    cache first, with their own `dns_timeout`: a name that does not resolve counts as
+    offline, one whose lookup is still running after that gives status UNKNOWN.
+    """
+
+    def __init__(self, timeout=1.0, max_concurrency=1000, resolver=None, dns_timeout=DNS_TIMEOUT):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.resolver = resolver
+        self.dns_timeout = dns_timeout
+        self.loop = None
+        self._thread = None
+        self._sem = None
+
+    def start(self):
+        if self.loop is not None:
+            return self.loop
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="tcp-probe-loop", daemon=True)
+        self._thread.start()
+        return self.loop
+
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(1.0)
+        self.loop = None
+        self._thread = None
+
+    async def _lookup(self, name):
+        """Address for name: None if it does not resolve, LOOKUP_PENDING if the lookup is still running"""
+        if self.resolver is None:
+            return name
+        return await self.resolver.resolve_async(name, self.dns_timeout, pending=LOOKUP_PENDING)
+
+    async def probe(self, host):
+        """Returns a ProbeResult; latency_ms is the TCP connect time for online hosts"""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        name, port = split_host_port(host)
+        # Outside the semaphore: a slow lookup must not hold a connect slot
+        name = await self._lookup(name)
+        if name is LOOKUP_PENDING:
+            return ProbeResult(host, UNKNOWN, None)
+        if name is None:
+            return ProbeResult(host, "offline", None)
+        async with self._sem:
+            started = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(name, port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                return ProbeResult(host, "offline", None)
+            latency_ms = (time.perf_counter() - started) * 1000.0
+
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return ProbeResult(host, "online", latency_ms)
+
+    async def probe_many(self, hosts, on_result=None):
+        """Probes all hosts concurrently, calling on_result as each one finishes"""
+        results = []
+        for fut in asyncio.as_completed([self.probe(h) for h in hosts]):
+            result = await fut
+            results.append(result)
+            if on_result:
+                on_result(result)
+        return results
+
+    def probe_blocking(self, host):
+        """Thread-safe helper for callers outside the loop (requires start())"""
+        return asyncio.run_coroutine_threadsafe(self.probe(host), self.loop).result()
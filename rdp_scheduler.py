@@ -0,0 +1,401 @@
+"""Bounded probe scheduler shared by the background ping loop and manual pings."""
+import asyncio
+import collections
+import heapq
+import ipaddress
+import itertools
+import math
+import random
+import threading
+import time
+
+from rdp_probe import split_host_port
+
+# Queue priorities, lower runs first
+PRIORITY_MANUAL = 0     # Explicit user action (Ping Manually, freshly saved host)
+PRIORITY_VISIBLE = 1    # Host card is currently on screen
+PRIORITY_NORMAL = 2
+
+
+def subnet_key(host, resolver=None):
+    """Groups IP literals by /24 (IPv4) or /64 (IPv6).
+
+    Hostnames have no known subnet unless `resolver` (see rdp_dns.DnsCache) already
+    holds their address; it is only peeked at, never asked to resolve.
+    """
+    name, _ = split_host_port(host)
+    if resolver is not None:
+        name = resolver.peek(name)
+        if name is None:
+            return None
+    try:
+        addr = ipaddress.ip_address(name)
+    except ValueError:
+        return None
+    prefix = 24 if addr.version == 4 else 64
+    return str(ipaddress.ip_network(f"{addr}/{prefix}", strict=False))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, should_stop=None):
+        """Blocks until a token is available. Returns False if should_stop() became true"""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if should_stop and should_stop():
+                return False
+            time.sleep(min(wait, 0.1))
+
+
+class ProbePolicy:
+    """Decides when each host is due for its next probe.
+
+    - Hosts that keep answering are probed less and less often, up to `max_interval`.
+    - Offline hosts back off exponentially, up to `offline_max_interval`.
+    - A host whose status just changed is rechecked after `recheck_delay` seconds.
+    - Every interval is jittered by +/- `jitter` so probes do not fire in bursts.
+    - Hosts marked visible never stretch beyond `base_interval` and get a queue boost.
+    - Due hosts are returned visible first, then longest since their last probe
+      (never-probed hosts first of all); seed() carries last-known results over
+      from a previous run.
+    """
+
+    def __init__(self, base_interval=30, max_interval=300, offline_max_interval=900,
+                 recheck_delay=2, stable_growth=1.5, jitter=0.1):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.offline_max_interval = offline_max_interval
+        self.recheck_delay = recheck_delay
+        self.stable_growth = stable_growth
+        self.jitter = jitter
+
+        self._lock = threading.Lock()
+        self._state = {}  # host -> [next_due, interval, last_status, last_probed]
+        self._visible = frozenset()
+
+    def _jittered(self, seconds):
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def due(self, hosts, now=None):
+        """Returns the hosts from `hosts` that should be probed now, most important first"""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            visible = self._visible
+            for host in hosts:
+                st = self._state.get(host)
+                if st is None:
+                    # Never probed: spread first probes over a fraction of the base interval
+                    st = self._state[host] = [now + random.uniform(0, self.jitter * self.base_interval), self.base_interval, None, None]
+                if st[0] <= now:
+                    due.append((host not in visible, -math.inf if st[3] is None else st[3], host))
+        due.sort()
+        return [host for _, _, host in due]
+
+    def record(self, host, status, now=None):
+        """Feeds a probe result back and schedules the host's next probe"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            st = self._state.get(host)
+            if st is None:
+                st = self._state[host] = [now, self.base_interval, None, None]
+            previous = st[2]
+
+            if previous is not None and status != previous:
+                # Flapped: confirm quickly, then start the cadence over
+                st[1] = self.base_interval
+                st[0] = now + self.recheck_delay
+            else:
+                if previous is None:
+                    interval = self.base_interval
+                elif status == "online":
+                    interval = min(st[1] * self.stable_growth, self.max_interval)
+                else:
+                    interval = min(st[1] * 2, self.offline_max_interval)
+                if host in self._visible:
+                    interval = min(interval, self.base_interval)
+                st[1] = interval
+                st[0] = now + self._jittered(interval)
+            st[2] = status
+            st[3] = now
+
+    def seed(self, host, status, age, now=None):
+        """Starts a host from a result `age` seconds old: due once the base interval since then has passed"""
+        now = time.monotonic() if now is None else now
+        age = max(0.0, age)
+        with self._lock:
+            if host in self._state:
+                return  # Already has live state
+            self._state[host] = [now + max(0.0, self.base_interval - age), self.base_interval, status, now - age]
+
+    def reset(self, host):
+        """Makes host due immediately (e.g. after a manual ping request)"""
+        with self._lock:
+            st = self._state.get(host)
+            if st is not None:
+                st[0] = 0
+                st[1] = self.base_interval
+
+    def forget(self, host):
+        with self._lock:
+            self._state.pop(host, None)
+
+    def set_visible(self, hosts):
+        """Marks the hosts whose cards are on screen; far-off probes for them are pulled forward"""
+        hosts = frozenset(hosts)
+        now = time.monotonic()
+        with self._lock:
+            for host in hosts - self._visible:
+                st = self._state.get(host)
+                if st is not None and st[0] > now + self.base_interval:
+                    st[0] = now + self._jittered(self.base_interval) * self.jitter
+            self._visible = hosts
+
+    def priority(self, host):
+        return PRIORITY_VISIBLE if host in self._visible else PRIORITY_NORMAL
+
+
+class ProbeScheduler:
+    """Runs host probes on a fixed pool of worker threads fed by a work queue.
+
+    A host is never queued or probed twice at the same time: submitting a host
+    that is already waiting or in flight is a no-op (except that it may raise the
+    host's priority). Jobs may carry a deadline (used for ping waves) after which
+    they are dropped instead of probed.
+
+    If `loop` is given, `worker` must be a coroutine function. A single dispatcher
+    thread then schedules up to `max_workers` probes onto that event loop instead
+    of running them on threads.
+
+    Optional limits: `rate_limiter` (a TokenBucket) caps probe starts per second
+    and `max_per_subnet` caps probes in flight per subnet_key().
+    """
+
+    def __init__(self, worker, max_workers=64, loop=None, rate_limiter=None, max_per_subnet=None, subnet_of=subnet_key):
+        self.worker = worker
+        self.max_workers = max(1, int(max_workers))
+        self.loop = loop
+        self.rate_limiter = rate_limiter
+        self.max_per_subnet = max_per_subnet
+        self.subnet_of = subnet_of
+
+        self._cond = threading.Condition()
+        self._pending = []  # heap of (priority, seq, host, deadline)
+        self._seq = itertools.count()
+        self._queued = {}   # host -> priority of its live heap entry
+        self._running = {}  # host -> subnet
+        self._subnet_active = collections.Counter()
+        self._deferred = {}  # subnet -> heap of jobs popped while it was at its cap, restored one per freed slot
+        self._futures = {}  # host -> in-flight future (event loop mode only)
+        self._threads = []
+        self._stopped = False
+
+        # Simple counters, handy when diagnosing slow waves
+        self.completed = 0
+        self.expired = 0
+
+    def start(self):
+        with self._cond:
+            if self._threads or self._stopped:
+                return
+            if self.loop is not None:
+                t = threading.Thread(target=self._dispatch_loop, name="probe-dispatch", daemon=True)
+                t.start()
+                self._threads.append(t)
+                return
+            for i in range(self.max_workers):
+                t = threading.Thread(target=self._worker_loop, name=f"probe-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, host, deadline=None, priority=PRIORITY_NORMAL):
+        """Queue a probe for host. Returns False if it is already queued or running."""
+        with self._cond:
+            if self._stopped or host in self._running:
+                return False
+            queued = self._queued.get(host)
+            if queued is not None and queued <= priority:
+                return False
+            # New entry; a superseded lower-priority entry is skipped when popped
+            self._queued[host] = priority
+            heapq.heappush(self._pending, (priority, next(self._seq), host, deadline))
+            self._cond.notify()
+            return queued is None
+
+    def submit_wave(self, hosts, timeout=None, priority=PRIORITY_NORMAL):
+        """Queue a whole wave; jobs not started within `timeout` seconds are dropped."""
+        deadline = time.monotonic() + timeout if timeout else None
+        return sum(1 for host in hosts if self.submit(host, deadline, priority))
+
+    def is_busy(self, host):
+        with self._cond:
+            return host in self._queued or host in self._running
+
+    def in_flight(self):
+        """Number of probes currently running."""
+        with self._cond:
+            return len(self._running)
+
+    def backlog(self):
+        """Number of hosts waiting for a free worker."""
+        with self._cond:
+            return len(self._queued)
+
+    def shutdown(self, wait=1.0):
+        """Cancel all queued probes and stop the workers.
+
+        Thread probes already in flight are allowed to finish (their subprocess cannot
+        be interrupted safely) but no new ones start; event loop probes are cancelled.
+        Waits up to `wait` seconds in total.
+        """
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._deferred.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+            threads = list(self._threads)
+            futures = list(self._futures.values())
+
+        for fut in futures:
+            fut.cancel()
+
+        end = time.monotonic() + wait
+        for t in threads:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            t.join(remaining)
+
+    def _is_stopped(self):
+        return self._stopped
+
+    def _live(self, entry):
+        """Whether a popped entry should still run; forgets it if its wave is over (caller holds the lock)"""
+        priority, _, host, deadline = entry
+        if self._queued.get(host) != priority:
+            return False  # superseded by a higher-priority resubmit
+        if deadline is not None and time.monotonic() > deadline:
+            # The wave this job belonged to is over; the next one will requeue it
+            del self._queued[host]
+            self.expired += 1
+            return False
+        return True
+
+    def _restore(self, subnet):
+        """Moves the best live deferred job of subnet back to the queue (caller holds the lock)"""
+        deferred = self._deferred.get(subnet)
+        while deferred:
+            entry = heapq.heappop(deferred)
+            if self._live(entry):
+                heapq.heappush(self._pending, entry)
+                break
+        if not deferred:
+            self._deferred.pop(subnet, None)
+
+    def _pop_eligible(self):
+        """Pops the best job whose subnet is below its cap (caller holds the lock).
+
+        Jobs of a subnet at its cap are set aside in that subnet's deferred heap, so
+        each is looked at once per freed slot rather than once per pop.
+        """
+        while self._pending:
+            entry = heapq.heappop(self._pending)
+            host = entry[2]
+            subnet = self.subnet_of(host) if self.max_per_subnet else None
+            if not self._live(entry):
+                if subnet is not None and host not in self._queued:
+                    self._restore(subnet)  # It may have been holding that subnet's freed slot
+                continue
+            if subnet is not None and self._subnet_active[subnet] >= self.max_per_subnet:
+                heapq.heappush(self._deferred.setdefault(subnet, []), entry)
+                continue
+            del self._queued[host]
+            return host, subnet
+        return None
+
+    def _take_job(self):
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                if self._pending and len(self._running) < self.max_workers:
+                    job = self._pop_eligible()
+                    if job is not None:
+                        host, subnet = job
+                        self._running[host] = subnet
+                        if subnet is not None:
+                            self._subnet_active[subnet] += 1
+                        break
+                self._cond.wait()
+
+        if self.rate_limiter and not self.rate_limiter.acquire(self._is_stopped):
+            self._finish(host)
+            return None
+        return host
+
+    def _worker_loop(self):
+        while True:
+            host = self._take_job()
+            if host is None:
+                return
+            try:
+                self.worker(host)
+            except Exception as e:
+                print(f"Probe for {host} failed: {e}")
+            finally:
+                self._finish(host)
+
+    def _dispatch_loop(self):
+        while True:
+            host = self._take_job()
+            if host is None:
+                return
+            fut = asyncio.run_coroutine_threadsafe(self.worker(host), self.loop)
+            with self._cond:
+                self._futures[host] = fut
+            fut.add_done_callback(lambda f, h=host: self._on_future_done(h, f))
+
+    def _on_future_done(self, host, fut):
+        if not fut.cancelled() and fut.exception() is not None:
+            print(f"Probe for {host} failed: {fut.exception()}")
+        self._finish(host)
+
+    def _finish(self, host):
+        with self._cond:
+            subnet = self._running.pop(host, None)
+            if subnet is not None:
+                self._subnet_active[subnet] -= 1
+                if not self._subnet_active[subnet]:
+                    del self._subnet_active[subnet]
+                if subnet in self._deferred:
+                    self._restore(subnet)
+            self._futures.pop(host, None)
+            self.completed += 1
+            # One worker slot (and at most one subnet slot) was freed: one waiter can use it
+            self._cond.notify()
@@ -0,0 +1,239 @@
+"""SQLite storage backend: indexed filtering, counting and paging done by the database."""
+import json
+import sqlite3
+import threading
+
+from rdp_index import host_group
+from rdp_metrics import DISABLED
+from rdp_storage import empty_inventory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (name TEXT PRIMARY KEY, info TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    host_lower TEXT NOT NULL,
+    domain TEXT,
+    grp TEXT NOT NULL,
+    username TEXT NOT NULL DEFAULT '',
+    descr TEXT NOT NULL DEFAULT '',
+    info TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hosts_domain_grp ON hosts(domain, grp);
+CREATE INDEX IF NOT EXISTS hosts_grp ON hosts(grp);
+CREATE INDEX IF NOT EXISTS hosts_order ON hosts(host_lower, host);
+"""
+
+# Substring full-text search over host, username and description (SQLite 3.34+)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS hosts_fts USING fts5(
+    host, username, descr, content='hosts', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS hosts_ai AFTER INSERT ON hosts BEGIN
+    INSERT INTO hosts_fts(rowid, host, username, descr) VALUES (new.rowid, new.host, new.username, new.descr);
+END;
+CREATE TRIGGER IF NOT EXISTS hosts_ad AFTER DELETE ON hosts BEGIN
+    INSERT INTO hosts_fts(hosts_fts, rowid, host, username, descr) VALUES ('delete', old.rowid, old.host, old.username, old.descr);
+END;
+CREATE TRIGGER IF NOT EXISTS hosts_au AFTER UPDATE ON hosts BEGIN
+    INSERT INTO hosts_fts(hosts_fts, rowid, host, username, descr) VALUES ('delete', old.rowid, old.host, old.username, old.descr);
+    INSERT INTO hosts_fts(rowid, host, username, descr) VALUES (new.rowid, new.host, new.username, new.descr);
+END;
+"""
+
+
+def _host_row(host, info):
+    return (host, host.lower(), info.get("domain"), host_group(info),
+            info.get("username") or "", info.get("desc") or "", json.dumps(dict(info)))
+
+
+class HostQuery:
+    """Ordered, lazily paged list of the hosts matching a filter.
+
+    Supports len(), slicing and iteration; each slice is one LIMIT/OFFSET query,
+    so the virtual grid only ever fetches the rows it is about to show.
+    """
+
+    PAGE = 1000
+
+    def __init__(self, store, where, params):
+        self.store = store
+        self.where = where
+        self.params = params
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.store._scalar(f"SELECT COUNT(*) FROM hosts WHERE {self.where}", self.params)
+        return self._count
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def _fetch(self, offset, limit):
+        if limit <= 0:
+            return []
+        rows = self.store._rows(
+            f"SELECT host FROM hosts WHERE {self.where} ORDER BY host_lower, host LIMIT ? OFFSET ?",
+            self.params + [limit, offset])
+        return [r[0] for r in rows]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            page = self._fetch(start, stop - start)
+            return page[::step] if step != 1 else page
+        if key < 0:
+            key += len(self)
+        page = self._fetch(key, 1)
+        if not page:
+            raise IndexError(key)
+        return page[0]
+
+    def __iter__(self):
+        offset = 0
+        while True:
+            page = self._fetch(offset, self.PAGE)
+            yield from page
+            if len(page) < self.PAGE:
+                return
+            offset += self.PAGE
+
+
+class SqliteStore:
+    """Inventory stored in a SQLite database instead of a JSON file.
+
+    Offers the same load/mutate/flush/close interface as InventoryStore, plus
+    query_hosts(), domain_counts() and groups() which let the grid and sidebar
+    filter, count and page inside the database. Writes are committed immediately.
+    """
+
+    queryable = True
+
+    def __init__(self, path, on_error=None, metrics=DISABLED, **_):
+        self.path = path
+        self.on_error = on_error
+        self.dirty = False
+        self._m_write = metrics.histogram("store_write_seconds", "Time to commit one inventory change to SQLite")
+        self._m_errors = metrics.counter("store_errors_total", "Failed inventory writes")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        try:
+            had_fts = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'hosts_fts'").fetchone()
+            self._conn.executescript(FTS_SCHEMA)
+            if not had_fts:
+                self._conn.execute("INSERT INTO hosts_fts(hosts_fts) VALUES ('rebuild')")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # No FTS5 / trigram tokenizer in this SQLite build: fall back to instr() scans
+            self.has_fts = False
+        self._conn.commit()
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _scalar(self, sql, params=()):
+        return self._rows(sql, params)[0][0]
+
+    def _write(self, fn):
+        try:
+            with self._m_write.time(), self._lock, self._conn:
+                fn(self._conn)
+            self.dirty = True
+        except sqlite3.Error as e:
+            print(f"Error saving hosts: {e}")
+            self._m_errors.inc()
+            if self.on_error:
+                self.on_error(e)
+
+    # ---- InventoryStore interface ----
+
+    def load(self, preloaded=None):
+        data = empty_inventory()
+        for name, info in self._rows("SELECT name, info FROM domains"):
+            data["domains"][name] = json.loads(info)
+        for host, info in self._rows("SELECT host, info FROM hosts ORDER BY rowid"):
+            data["hosts"][host] = json.loads(info)
+        return data
+
+    def set_host(self, host, info):
+        self._write(lambda c: c.execute(
+            "INSERT INTO hosts (host, host_lower, domain, grp, username, descr, info) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(host) DO UPDATE SET host_lower=excluded.host_lower, domain=excluded.domain, grp=excluded.grp, "
+            "username=excluded.username, descr=excluded.descr, info=excluded.info",
+            _host_row(host, info)))
+
+    def delete_host(self, host):
+        self._write(lambda c: c.execute("DELETE FROM hosts WHERE host = ?", (host,)))
+
+    def set_hosts(self, hosts):
+        """Adds or overwrites many hosts in one transaction"""
+        self._write(lambda c: c.executemany(
+            "INSERT INTO hosts (host, host_lower, domain, grp, username, descr, info) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(host) DO UPDATE SET host_lower=excluded.host_lower, domain=excluded.domain, grp=excluded.grp, "
+            "username=excluded.username, descr=excluded.descr, info=excluded.info",
+            [_host_row(h, info) for h, info in hosts.items()]))
+
+    def set_domain(self, domain, info):
+        self._write(lambda c: c.execute("INSERT OR REPLACE INTO domains (name, info) VALUES (?, ?)", (domain, json.dumps(info))))
+
+    def delete_domain(self, domain):
+        self._write(lambda c: c.execute("DELETE FROM domains WHERE name = ?", (domain,)))
+
+    def replace(self, data):
+        def do(c):
+            c.execute("DELETE FROM hosts")
+            c.execute("DELETE FROM domains")
+            c.executemany("INSERT INTO domains (name, info) VALUES (?, ?)",
+                          ((name, json.dumps(info)) for name, info in data.get("domains", {}).items()))
+            c.executemany("INSERT INTO hosts (host, host_lower, domain, grp, username, descr, info) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          (_host_row(h, info) for h, info in data.get("hosts", {}).items()))
+        self._write(do)
+
+    def compact(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def flush(self, timeout=None):
+        return True
+
+    def close(self, timeout=None):
+        with self._lock:
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+
+    # ---- queries ----
+
+    def _filter(self, domain=None, group=None, search=None):
+        where, params = ["1"], []
+        if domain:
+            where.append("domain = ?")
+            params.append(domain)
+        if group:
+            where.append("grp = ?")
+            params.append(group)
+        if search:
+            q = search.lower()
+            if self.has_fts and len(q) >= 3:
+                where.append("rowid IN (SELECT rowid FROM hosts_fts WHERE hosts_fts MATCH ?)")
+                params.append('"' + q.replace('"', '""') + '"')
+            else:
+                where.append("(instr(host_lower, ?) OR instr(lower(username), ?) OR instr(lower(descr), ?))")
+                params += [q, q, q]
+        return " AND ".join(where), params
+
+    def query_hosts(self, domain=None, group=None, search=None):
+        """Hosts matching all given filters, in grid order, as a lazily paged HostQuery"""
+        where, params = self._filter(domain, group, search)
+        return HostQuery(self, where, params)
+
+    def domain_counts(self):
+        return self._rows("SELECT domain, COUNT(*) FROM hosts WHERE domain IS NOT NULL AND domain != '' GROUP BY domain ORDER BY domain")
+
+    def groups(self, dom=None):
+        if dom is None:
+            return [r[0] for r in self._rows("SELECT DISTINCT grp FROM hosts ORDER BY grp")]
+        return [r[0] for r in self._rows("SELECT DISTINCT grp FROM hosts WHERE domain = ? ORDER BY grp", (dom,))]
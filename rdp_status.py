@@ -0,0 +1,70 @@
+"""Coalescing hand-off of probe results from worker threads to the UI thread."""
+import itertools
+import threading
+
+
+class StatusPipeline:
+    """Collects probe results from any thread and hands the UI only real changes.
+
+    Results are coalesced per host (the newest one wins) and a result whose status
+    matches what was last delivered for that host is dropped before it ever reaches
+    the UI. `drain(limit)` returns at most `limit` deltas so one UI tick stays cheap.
+
+    If `notify` is given it is called (from the producing thread) whenever the
+    pipeline goes from empty to non-empty, e.g. to set a threading.Event. It must
+    not touch Tk: the UI polls drain() instead.
+    """
+
+    def __init__(self, notify=None):
+        self.notify = notify
+        self.latencies = {}   # host -> last reported latency in ms (not a UI change by itself)
+        self._lock = threading.Lock()
+        self._pending = {}    # host -> status, insertion ordered
+        self._delivered = {}  # host -> status last handed to the UI
+
+        # Counters, handy when tuning batch sizes
+        self.received = 0
+        self.dropped = 0
+
+    def push(self, host, status, latency_ms=None):
+        if latency_ms is not None:
+            self.latencies[host] = latency_ms
+        else:
+            self.latencies.pop(host, None)
+
+        with self._lock:
+            self.received += 1
+            if self._delivered.get(host) == status:
+                # No-op for the UI; also cancels a pending flip back to this status
+                if self._pending.pop(host, None) is None:
+                    self.dropped += 1
+                return
+            was_empty = not self._pending
+            self._pending[host] = status
+
+        if was_empty and self.notify:
+            self.notify()
+
+    def drain(self, limit=None):
+        """Returns up to `limit` (host, status) deltas, oldest first"""
+        with self._lock:
+            if limit is None or limit >= len(self._pending):
+                batch = list(self._pending.items())
+                self._pending.clear()
+            else:
+                # Only the oldest `limit` keys are touched, not the whole backlog
+                hosts = list(itertools.islice(self._pending, limit))
+                batch = [(host, self._pending.pop(host)) for host in hosts]
+            for host, status in batch:
+                self._delivered[host] = status
+        return batch
+
+    def reset(self, host):
+        """Forgets a host so its next result is always delivered (manual ping, delete)"""
+        with self._lock:
+            self._pending.pop(host, None)
+            self._delivered.pop(host, None)
+        self.latencies.pop(host, None)
+
+    def __len__(self):
+        return len(self._pending)
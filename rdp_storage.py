@@ -0,0 +1,624 @@
+"""Persistence for the host inventory: JSON snapshot plus an append-only change journal."""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+from rdp_hosts import HostTable, compact_inventory, json_default
+from rdp_metrics import DISABLED
+
+INVENTORY_LOCK_SLOTS = 64  # App windows that can have one JSON inventory open at the same time
+
+
+def empty_inventory():
+    return {"version": 3, "domains": {}, "hosts": {}}
+
+
+def migrate(loaded):
+    """Upgrades a config dict from before version 3 to the current layout"""
+    if "version" in loaded and loaded["version"] >= 3:
+        return loaded
+    data = empty_inventory()
+    data["hosts"] = loaded.get("hosts", loaded)
+    data["domains"] = loaded.get("domains", {})
+    for h, info in data["hosts"].items():
+        if "group" not in info: info["group"] = "Ungrouped"
+        if "desc" not in info: info["desc"] = info.get("group", "Server")
+    return data
+
+
+def write_atomic(path, content):
+    """Writes text or bytes to path via temp file + rename, so readers never see a torn file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(content, bytes) else "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _lock_byte(f, offset):
+    """Non-blocking exclusive lock on one byte of f; False if another process holds it"""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(offset)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.lockf(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock_byte(f, offset):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(offset)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class InventoryLock:
+    """Advisory `<path>.lock` telling other processes that an app has the JSON inventory open.
+
+    Each app window holds one byte of the lock file (the OS drops it if the process
+    dies). exclusive() needs every byte, so it fails while any window has the file
+    open: a writer from another process would be overwritten by that window's next
+    snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._file = None
+        self._slots = []
+
+    def _take(self, slots, need_all):
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+b")
+        for slot in slots:
+            if _lock_byte(f, slot):
+                self._slots.append(slot)
+                if not need_all:
+                    break
+            elif need_all:
+                break
+        self._file = f
+        if self._slots and (not need_all or len(self._slots) == len(slots)):
+            return True
+        self.release()
+        return False
+
+    def shared(self):
+        """Takes one free slot, alongside other windows. False if all are taken or the file cannot be created"""
+        try:
+            return self._take(range(INVENTORY_LOCK_SLOTS), need_all=False)
+        except OSError:
+            return False
+
+    def exclusive(self):
+        """Takes every slot. False if any app window has the inventory open"""
+        return self._take(range(INVENTORY_LOCK_SLOTS), need_all=True)
+
+    def release(self):
+        if self._file is None:
+            return
+        for slot in self._slots:
+            try:
+                _unlock_byte(self._file, slot)
+            except OSError:
+                pass
+        self._file.close()
+        self._file = None
+        self._slots = []
+
+
+def apply_op(data, op):
+    """Applies one journal entry to an inventory dict"""
+    kind = op["op"]
+    if kind == "host":
+        if op["info"] is None:
+            data["hosts"].pop(op["host"], None)
+        else:
+            data["hosts"][op["host"]] = op["info"]
+    elif kind == "hosts":
+        data["hosts"].update(op["hosts"])
+    elif kind == "domain":
+        if op["info"] is None:
+            data["domains"].pop(op["domain"], None)
+        else:
+            data["domains"][op["domain"]] = op["info"]
+    elif kind == "replace":
+        data.clear()
+        data.update(op["data"])
+
+
+def copy_inventory(data):
+    copy = dict(data)
+    copy["domains"] = {k: dict(v) for k, v in data.get("domains", {}).items()}
+    hosts = data.get("hosts", {})
+    copy["hosts"] = hosts.copy() if isinstance(hosts, HostTable) else HostTable(hosts)
+    return copy
+
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def open_store(path, **kwargs):
+    """Picks the storage backend from the file name: SQLite for .db/.sqlite, JSON otherwise"""
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        from rdp_sqlite import SqliteStore
+        return SqliteStore(path, **kwargs)
+    return InventoryStore(path, **kwargs)
+
+
+def migrate_inventory(src, dst):
+    """One-shot copy of an inventory between backends (e.g. JSON -> SQLite). Returns the host count.
+
+    The source is only read. A JSON target is written as one atomic snapshot, with no
+    journal, and must not be open in the app meanwhile.
+    """
+    data = read_inventory(src)
+    if dst.lower().endswith(SQLITE_EXTENSIONS):
+        target = open_store(dst)
+        target.load()
+        target.replace(data)
+        target.close()
+        return len(data["hosts"])
+
+    lock = InventoryLock(dst)
+    if not lock.exclusive():
+        raise OSError(f"{dst} is open in RapidRDP; close it first")
+    try:
+        write_atomic(dst, json.dumps(data, indent=4, default=json_default))
+        # A journal left over from the old file would be replayed on top of the new one
+        try:
+            os.remove(dst + ".journal")
+        except FileNotFoundError:
+            pass
+    finally:
+        lock.release()
+    return len(data["hosts"])
+
+
+def read_inventory(path):
+    """The current inventory for a reader in another process: never compacts or writes.
+
+    The JSON snapshot plus its journal is replayed in memory, leaving both files to
+    whichever app owns them. SQLite readers are safe alongside a writer anyway.
+    """
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        store = open_store(path)
+        try:
+            return store.load()
+        finally:
+            store.close()
+    data = empty_inventory()
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            data = migrate(json.load(f))
+    InventoryStore(path)._replay(data)
+    return data
+
+
+def inventory_version(path):
+    """(mtime, size) of the inventory and its journal / WAL; changes whenever the inventory does"""
+    version = []
+    for p in (path, path + ".journal", path + "-wal"):
+        try:
+            st = os.stat(p)
+            version.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+class InventoryStore:
+    """Write-behind, crash-safe persistence for the inventory file.
+
+    Each mutation is appended to `<path>.journal` as one JSON line by a background
+    thread, so callers on the Tk thread never wait for disk I/O. Mutations arriving
+    within `flush_delay` seconds of each other are coalesced into one write (the
+    last change per host wins). Once the journal holds `compact_after` entries it is
+    folded into a fresh snapshot, written atomically with temp-file-then-rename,
+    and truncated. load() replays snapshot plus journal.
+    """
+
+    def __init__(self, path, flush_delay=0.25, compact_after=500, indent=4, on_error=None, metrics=DISABLED):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.flush_delay = flush_delay
+        self.compact_after = compact_after
+        self.indent = indent
+        self.on_error = on_error
+
+        self._cond = threading.Condition()
+        self._pending = {}  # coalescing key -> op, in arrival order
+        self._busy = False
+        self._compact_requested = False
+        self._closed = False
+        self._thread = None
+        self._data = empty_inventory()  # Private copy the journal and snapshots describe, made by load()
+        self.lock = InventoryLock(path)  # Held from load() to close(), see InventoryLock
+        self._journal_len = 0
+        self._batches = 0
+        self.dirty = False  # Anything submitted since load()
+
+        self._m_ops = metrics.counter("store_ops_total", "Inventory changes written to the journal")
+        self._m_append = metrics.histogram("store_append_seconds", "Time to append and fsync one journal batch")
+        self._m_snapshot = metrics.histogram("store_snapshot_seconds", "Time to write a full inventory snapshot")
+        self._m_errors = metrics.counter("store_errors_total", "Failed inventory writes")
+
+    queryable = False  # Filtering is done by the in-memory indexes, not by the store
+
+    # ---- loading ----
+
+    def load(self, preloaded=None):
+        """Reads snapshot + journal. `preloaded` skips the snapshot parse (startup cache hit).
+
+        Hosts come back as a HostTable. The writer's private copy is made here, on
+        the loading thread, so the first edit from the UI thread costs nothing extra.
+
+        Raises OSError or ValueError when the snapshot cannot be read; nothing is
+        written then, and the journal stays in place until the file is fixed.
+        """
+        data = empty_inventory()
+        if preloaded is not None:
+            data = preloaded
+        elif os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                try:
+                    data = migrate(json.load(f))
+                except ValueError as e:
+                    raise ValueError(f"{self.path} is not valid JSON ({e})") from e
+
+        self.lock.shared()  # Best effort: a window without a slot still works as before
+        replayed = self._replay(data)
+        compact_inventory(data)
+        self._data = copy_inventory(data)  # Column copies: milliseconds even at 100k hosts
+        self._journal_len = replayed
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path):
+            # Leftovers from an unclean exit (possibly with a torn last line): fold them
+            # into the snapshot now so new entries never get appended after a bad line
+            try:
+                self._write_snapshot()
+            except Exception as e:
+                print(f"Error compacting journal: {e}")
+        return data
+
+    def _replay(self, data):
+        if not os.path.exists(self.journal_path):
+            return 0
+        count = 0
+        try:
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line from a crash mid-append; everything before it is good
+                    apply_op(data, op)
+                    count += 1
+        except Exception as e:
+            print(f"Error replaying journal: {e}")
+        return count
+
+    # ---- mutations (cheap, callable from the UI thread) ----
+
+    def set_host(self, host, info):
+        self._submit(("host", host), {"op": "host", "host": host, "info": dict(info)})
+
+    def delete_host(self, host):
+        self._submit(("host", host), {"op": "host", "host": host, "info": None})
+
+    def set_hosts(self, hosts):
+        """Adds or overwrites many hosts as one journal entry, so a crash keeps all or none of them"""
+        with self._cond:
+            self._batches += 1
+            key = ("hosts", self._batches)
+        self._submit(key, {"op": "hosts", "hosts": {h: dict(info) for h, info in hosts.items()}})
+
+    def set_domain(self, domain, info):
+        self._submit(("domain", domain), {"op": "domain", "domain": domain, "info": dict(info)})
+
+    def delete_domain(self, domain):
+        self._submit(("domain", domain), {"op": "domain", "domain": domain, "info": None})
+
+    def replace(self, data):
+        """Replaces the whole inventory (written straight to a new snapshot)"""
+        with self._cond:
+            self._pending.clear()
+        self._submit(("replace",), {"op": "replace", "data": copy_inventory(data)})
+        self.compact()
+
+    def compact(self):
+        """Asks the writer to fold the journal into a new snapshot soon"""
+        with self._cond:
+            self._compact_requested = True
+            self._start()
+            self._cond.notify_all()
+
+    def _submit(self, key, op):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("InventoryStore is closed")
+            self.dirty = True
+            # Re-insert so coalesced ops keep their latest position
+            self._pending.pop(key, None)
+            self._pending[key] = op
+            self._start()
+            self._cond.notify_all()
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inventory-writer", daemon=True)
+            self._thread.start()
+
+    # ---- waiting / shutdown ----
+
+    def flush(self, timeout=None):
+        """Blocks until everything submitted so far is on disk. Returns False on timeout"""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._busy or self._compact_requested:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        """Flushes, writes a final snapshot and stops the writer thread"""
+        if self._thread is not None and (self._journal_len or self._pending):
+            self.compact()
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.lock.release()
+
+    # ---- writer thread ----
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._pending or self._compact_requested or self._closed):
+                    self._cond.wait()
+                if self._closed and not self._pending and not self._compact_requested:
+                    return
+
+            # Let a burst of mutations (bulk edits) settle into a single write
+            if not self._closed:
+                time.sleep(self.flush_delay)
+
+            with self._cond:
+                ops = list(self._pending.values())
+                self._pending.clear()
+                compact = self._compact_requested
+                self._compact_requested = False
+                self._busy = True
+
+            try:
+                if ops:
+                    self._append(ops)
+                if compact or self._journal_len >= self.compact_after:
+                    self._write_snapshot()
+            except Exception as e:
+                print(f"Error saving hosts: {e}")
+                self._m_errors.inc()
+                if self.on_error:
+                    self.on_error(e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _append(self, ops):
+        with self._m_append.time():
+            self._append_ops(ops)
+        self._m_ops.inc(len(ops))
+
+    def _append_ops(self, ops):
+        for op in ops:
+            apply_op(self._data, op)
+        lines = "".join(json.dumps(op, separators=(",", ":"), default=json_default) + "\n" for op in ops)
+        with open(self.journal_path, "a") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_len += len(ops)
+
+    def _write_snapshot(self):
+        with self._m_snapshot.time():
+            write_atomic(self.path, json.dumps(self._data, indent=self.indent, default=json_default))
+        # Only now is it safe to drop the journal; replaying it twice is harmless anyway
+        with open(self.journal_path, "w"):
+            pass
+        self._journal_len = 0
+
+
+CACHE_VERSION = 3  # 2: hosts are a HostTable; 3: no statuses, picklable desc placeholder
+
+
+def file_fingerprint(path):
+    """(mtime, size, content hash) identifying one exact version of a file"""
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    return (st.st_mtime_ns, st.st_size, digest)
+
+
+class StartupCache:
+    """Pickled inventory plus derived indexes, reused only for an unchanged config file.
+
+    The cache header records the config file's fingerprint; any difference (or a
+    non-empty journal) makes load() return None and deletes the stale cache.
+    """
+
+    def __init__(self, config_path, cache_path=None):
+        self.config_path = config_path
+        self.cache_path = cache_path or config_path + ".cache"
+        self.journal_path = config_path + ".journal"
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return None
+        try:
+            if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path):
+                raise ValueError("journal has unapplied changes")
+            fingerprint = file_fingerprint(self.config_path)
+            with open(self.cache_path, "rb") as f:
+                if pickle.load(f) != (CACHE_VERSION, fingerprint):
+                    raise ValueError("config changed")
+                return pickle.load(f)
+        except Exception:
+            self.discard()
+            return None
+
+    def save(self, payload):
+        try:
+            header = (CACHE_VERSION, file_fingerprint(self.config_path))
+            blob = pickle.dumps(header, pickle.HIGHEST_PROTOCOL) + pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+            write_atomic(self.cache_path, blob)
+        except Exception as e:
+            print(f"Error writing startup cache: {e}")
+
+    def discard(self):
+        try:
+            os.remove(self.cache_path)
+        except OSError:
+            pass
+
+
+class LastStatusStore:
+    """Last probe result per host (status, RTT, wall-clock time), saved in the background.
+
+    record() only updates a dict; a daemon thread rewrites the file every
+    `interval` seconds when something changed, and close() writes the rest. The
+    file is tab-separated text (host, status, latency_ms, timestamp per line)
+    because it is rewritten often and parsed once per launch.
+    """
+
+    HEADER = "rapidrdp-status 1"
+
+    def __init__(self, path, interval=60.0, on_error=None):
+        self.path = path
+        self.interval = interval
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._entries = {}  # host -> (status, latency_ms or None, time.time())
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self, hosts=None):
+        """Reads the file (entries for `hosts` only, if given); returns {host: (status, latency_ms, ts)}"""
+        entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if f.readline().rstrip("\n") != self.HEADER:
+                    raise ValueError("unknown status file format")
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 4 or parts[1] not in ("online", "offline"):
+                        continue
+                    host = parts[0]
+                    if hosts is not None and host not in hosts:
+                        continue
+                    entries[host] = (sys.intern(parts[1]), float(parts[2]) if parts[2] else None, float(parts[3]))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring last-known status file {self.path}: {e}")
+        with self._lock:
+            entries.update(self._entries)  # Results recorded before the load win
+            self._entries = entries
+        return dict(entries)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="status-store", daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, host, status, latency_ms=None, now=None):
+        if status not in ("online", "offline"):
+            return
+        with self._lock:
+            self._entries[host] = (status, latency_ms, time.time() if now is None else now)
+            self._dirty = True
+
+    def get(self, host):
+        """(status, latency_ms, ts) or None"""
+        return self._entries.get(host)
+
+    def forget(self, host):
+        with self._lock:
+            if self._entries.pop(host, None) is not None:
+                self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            items = list(self._entries.items())
+            self._dirty = False
+        lines = [self.HEADER]
+        for host, (status, latency, ts) in items:
+            if "\t" in host or "\n" in host:
+                continue
+            lines.append(f"{host}\t{status}\t{'' if latency is None else round(latency, 2)}\t{ts:.0f}")
+        lines.append("")
+        try:
+            write_atomic(self.path, "\n".join(lines))
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            if self.on_error:
+                self.on_error(e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+            self._thread = None
+        self.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RapidRDP inventory storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="copy an inventory to another backend, e.g. rdp_hosts.json -> rdp_hosts.db")
+    mig.add_argument("src")
+    mig.add_argument("dst")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        try:
+            count = migrate_inventory(args.src, args.dst)
+        except OSError as e:
+            parser.exit(1, f"Migration failed: {e}\n")
+        print(f"Migrated {count} hosts from {args.src} to {args.dst}")
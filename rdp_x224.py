@@ -0,0 +1,293 @@
+"""RDP deep probe: the first round trip of a real RDP connection instead of a bare TCP connect.
+
+A TCP connect only shows that something accepts connections on the port; a hung
+Remote Desktop service or a gateway with nothing behind it accepts them too. This
+probe sends an X.224 Connection Request carrying an RDP Negotiation Request
+([MS-RDPBCGR] 2.2.1.1) and waits for the X.224 Connection Confirm (2.2.1.2), whose
+negotiation data names the security protocol the server picked. The connection
+is closed right after the confirm: no TLS, no credentials, no session.
+
+X224StubServer speaks just enough of the handshake to check the probe locally.
+"""
+import asyncio
+import collections
+import struct
+import sys
+import threading
+import time
+
+from rdp_probe import DNS_TIMEOUT, LOOKUP_PENDING, UNKNOWN, ProbeResult, TcpProbeEngine, split_host_port
+
+TPKT_VERSION = 3
+X224_CONNECTION_REQUEST = 0xE0
+X224_CONNECTION_CONFIRM = 0xD0
+
+TYPE_RDP_NEG_REQ = 0x01
+TYPE_RDP_NEG_RSP = 0x02
+TYPE_RDP_NEG_FAILURE = 0x03
+
+PROTOCOL_RDP = 0x00        # Standard RDP security
+PROTOCOL_SSL = 0x01        # TLS
+PROTOCOL_HYBRID = 0x02     # CredSSP (NLA)
+PROTOCOL_RDSTLS = 0x04
+PROTOCOL_HYBRID_EX = 0x08  # CredSSP with Early User Authorization Result
+PROTOCOL_RDSAAD = 0x10
+
+SECURITY_NAMES = {
+    PROTOCOL_RDP: "standard",
+    PROTOCOL_SSL: "tls",
+    PROTOCOL_HYBRID: "credssp",
+    PROTOCOL_RDSTLS: "rdstls",
+    PROTOCOL_HYBRID_EX: "credssp-ex",
+    PROTOCOL_RDSAAD: "rdsaad",
+}
+SECURITY_LABELS = {
+    "standard": "Standard RDP security",
+    "tls": "TLS",
+    "credssp": "CredSSP (NLA)",
+    "rdstls": "RDSTLS",
+    "credssp-ex": "CredSSP (NLA, early auth)",
+    "rdsaad": "Azure AD",
+}
+FAILURE_NAMES = {
+    1: "ssl-required-by-server",
+    2: "ssl-not-allowed-by-server",
+    3: "ssl-cert-not-on-server",
+    4: "inconsistent-flags",
+    5: "hybrid-required-by-server",
+    6: "ssl-with-user-auth-required-by-server",
+}
+
+# What mstsc offers; the server answers with the one it wants
+DEFAULT_REQUESTED = PROTOCOL_SSL | PROTOCOL_HYBRID | PROTOCOL_HYBRID_EX
+MAX_CONFIRM = 64  # A Connection Confirm is 11 bytes, 19 with negotiation data
+
+_NEG = struct.Struct("<BBHI")      # type, flags, length, value
+_X224 = struct.Struct("!BBHHB")    # length indicator, code, dst-ref, src-ref, class
+_TPKT = struct.Struct("!BBH")      # version, reserved, length
+
+# security / failure are names from SECURITY_NAMES / FAILURE_NAMES; error says why RDP did not respond
+RdpCheck = collections.namedtuple("RdpCheck", ["responding", "security", "failure", "error"])
+
+
+class X224Error(ValueError):
+    """The peer answered with something other than an X.224 Connection Confirm"""
+
+
+def _tpkt(code, user_data):
+    x224 = _X224.pack(6 + len(user_data), code, 0, 0, 0) + user_data
+    return _TPKT.pack(TPKT_VERSION, 0, _TPKT.size + len(x224)) + x224
+
+
+def connection_request(requested=DEFAULT_REQUESTED, cookie=None):
+    """TPKT-framed X.224 Connection Request with an RDP Negotiation Request"""
+    user_data = f"Cookie: mstshash={cookie}\r\n".encode("ascii") if cookie else b""
+    return _tpkt(X224_CONNECTION_REQUEST, user_data + _NEG.pack(TYPE_RDP_NEG_REQ, 0, _NEG.size, requested))
+
+
+def connection_confirm(selected=PROTOCOL_RDP, failure=None, negotiate=True):
+    """The server's reply: a negotiation response, a negotiation failure, or (negotiate=False) a pre-RDP 5.2 bare confirm"""
+    if failure is not None:
+        neg = _NEG.pack(TYPE_RDP_NEG_FAILURE, 0, _NEG.size, failure)
+    elif negotiate:
+        neg = _NEG.pack(TYPE_RDP_NEG_RSP, 0, _NEG.size, selected)
+    else:
+        neg = b""
+    return _tpkt(X224_CONNECTION_CONFIRM, neg)
+
+
+def _x224_payload(packet, code):
+    """User data of a TPKT-framed X.224 TPDU with the given code; raises X224Error"""
+    if len(packet) < _TPKT.size + _X224.size or packet[0] != TPKT_VERSION:
+        raise X224Error("not a TPKT packet")
+    if _TPKT.unpack_from(packet)[2] != len(packet):
+        raise X224Error("TPKT length mismatch")
+    li, tpdu_code = packet[4], packet[5]
+    if tpdu_code & 0xF0 != code:
+        raise X224Error(f"unexpected X.224 TPDU 0x{tpdu_code:02x}")
+    if li < 6 or 5 + li > len(packet):
+        raise X224Error("bad X.224 length indicator")
+    return packet[_TPKT.size + _X224.size:_TPKT.size + 1 + li]
+
+
+def parse_connection_confirm(packet):
+    """RdpCheck for a complete Connection Confirm packet; raises X224Error for anything else"""
+    neg = _x224_payload(packet, X224_CONNECTION_CONFIRM)
+    if len(neg) < _NEG.size:
+        return RdpCheck(True, SECURITY_NAMES[PROTOCOL_RDP], None, None)  # Server predates negotiation
+    kind, _, _, value = _NEG.unpack_from(neg)
+    if kind == TYPE_RDP_NEG_RSP:
+        return RdpCheck(True, SECURITY_NAMES.get(value, f"0x{value:x}"), None, None)
+    if kind == TYPE_RDP_NEG_FAILURE:
+        # Still an RDP server answering, just not with anything we offered
+        return RdpCheck(True, None, FAILURE_NAMES.get(value, str(value)), None)
+    raise X224Error(f"unexpected negotiation type 0x{kind:02x}")
+
+
+def requested_protocols(packet):
+    """requestedProtocols of a Connection Request (0 without a negotiation request); raises X224Error"""
+    user_data = _x224_payload(packet, X224_CONNECTION_REQUEST)
+    # An optional cookie or routing token line comes first
+    end = user_data.find(b"\r\n")
+    neg = user_data[end + 2:] if end >= 0 else user_data
+    if len(neg) >= _NEG.size and neg[0] == TYPE_RDP_NEG_REQ:
+        return _NEG.unpack_from(neg)[3]
+    return 0
+
+
+def describe_check(check):
+    """One line for the UI, e.g. 'RDP responding · CredSSP (NLA)'"""
+    if check is None:
+        return "No RDP check yet"
+    if check.responding:
+        if check.failure:
+            return f"RDP responding · negotiation failed ({check.failure})"
+        return f"RDP responding · {SECURITY_LABELS.get(check.security, check.security)}"
+    return check.error
+
+
+async def read_tpkt(reader, limit=MAX_CONFIRM):
+    """One TPKT packet from a StreamReader; raises X224Error if it is not one (or longer than limit)"""
+    header = await reader.readexactly(_TPKT.size)
+    if header[0] != TPKT_VERSION:
+        raise X224Error("not a TPKT packet")
+    length = _TPKT.unpack(header)[2]
+    if not _TPKT.size + _X224.size <= length <= limit:
+        raise X224Error(f"unexpected TPKT length {length}")
+    return header + await reader.readexactly(length - _TPKT.size)
+
+
+class RdpProbeEngine(TcpProbeEngine):
+    """TcpProbeEngine that completes the X.224 / RDP negotiation handshake.
+
+    A host is 'online' only when an RDP server answers: one `timeout` covers the
+    connect, the request and the Connection Confirm. A port that accepts and then
+    stays silent or answers with something else is 'offline'. latency_ms is the
+    time from starting the connect to the confirm. `checks[host]` holds the
+    RdpCheck of the host's last probe (the same few instances are shared).
+    """
+
+    def __init__(self, timeout=1.0, max_concurrency=1000, resolver=None, requested=DEFAULT_REQUESTED, dns_timeout=DNS_TIMEOUT):
+        super().__init__(timeout, max_concurrency, resolver, dns_timeout)
+        self.requested = requested
+        self._request = connection_request(requested)
+        self.checks = {}
+        self._shared = {}  # RdpCheck -> the one instance stored in checks
+
+    def _check(self, host, check):
+        self.checks[host] = self._shared.setdefault(check, check)
+
+    async def probe(self, host):
+        """Returns a ProbeResult and records the host's RdpCheck in `checks`"""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        name, port = split_host_port(host)
+        name = await self._lookup(name)
+        if name is LOOKUP_PENDING:
+            self._check(host, RdpCheck(False, None, None, "Name lookup still running"))
+            return ProbeResult(host, UNKNOWN, None)
+        if name is None:
+            self._check(host, RdpCheck(False, None, None, "Name does not resolve"))
+            return ProbeResult(host, "offline", None)
+        async with self._sem:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            deadline = loop.time() + self.timeout
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(name, port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                self._check(host, RdpCheck(False, None, None, "Port closed or unreachable"))
+                return ProbeResult(host, "offline", None)
+            try:
+                writer.write(self._request)
+                packet = await asyncio.wait_for(read_tpkt(reader), max(0.0, deadline - loop.time()))
+                check = parse_connection_confirm(packet)
+                latency_ms = (time.perf_counter() - started) * 1000.0
+            except asyncio.TimeoutError:
+                check = RdpCheck(False, None, None, f"Port open, no RDP reply within {self.timeout:g} s")
+            except (OSError, asyncio.IncompleteReadError):
+                check = RdpCheck(False, None, None, "Port open, connection dropped without an RDP reply")
+            except X224Error as e:
+                check = RdpCheck(False, None, None, f"Port open, not RDP ({e})")
+            finally:
+                writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        self._check(host, check)
+        if not check.responding:
+            return ProbeResult(host, "offline", None)
+        return ProbeResult(host, "online", latency_ms)
+
+    def forget(self, host):
+        self.checks.pop(host, None)
+
+
+def stub_handler(selected=PROTOCOL_HYBRID, failure=None, behaviour="confirm"):
+    """asyncio.start_server callback answering like an RDP server (see X224StubServer)"""
+    async def handle(reader, writer):
+        try:
+            if behaviour == "silent":
+                await reader.read()  # Accept, then never answer: a hung service
+                return
+            packet = await read_tpkt(reader, limit=1024)
+            requested = requested_protocols(packet)
+            if behaviour == "garbage":
+                writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            elif failure is None and selected and not requested & selected:
+                # A client that does not offer what the server requires is refused
+                writer.write(connection_confirm(failure=5 if selected & (PROTOCOL_HYBRID | PROTOCOL_HYBRID_EX) else 1))
+            else:
+                writer.write(connection_confirm(selected, failure))
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, X224Error):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+class X224StubServer:
+    """Local server speaking the first RDP round trip, on its own loop thread.
+
+    behaviour: "confirm" answers with `selected` (or the negotiation `failure`
+    code), "silent" accepts and never answers, "garbage" answers with something
+    that is not X.224. Use as a context manager; `port` is set once started.
+    """
+
+    def __init__(self, selected=PROTOCOL_HYBRID, failure=None, behaviour="confirm", host="127.0.0.1", port=0):
+        self.handler = stub_handler(selected, failure, behaviour)
+        self.address = (host, port)
+        self.port = None
+        self.loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="x224-stub", daemon=True)
+
+    def __enter__(self):
+        async def start():
+            self._server = await asyncio.start_server(self.handler, *self.address, backlog=4096)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        async def stop():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(1.0)
+
+
+if __name__ == "__main__":
+    # Quick manual check: python rdp_x224.py host[:port] ...
+    async def main(hosts):
+        engine = RdpProbeEngine(timeout=3.0)
+        for result in await engine.probe_many(hosts):
+            latency = "" if result.latency_ms is None else f" ({result.latency_ms:.0f} ms)"
+            print(f"{result.host}: {describe_check(engine.checks[result.host])}{latency}")
+
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""ProbeAgent and AgentClient: snapshot / delta round trip over a local socket."""
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from rdp_agent import AgentClient, ProbeAgent
+
+
+def wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def listener():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        s.listen(64)
+        yield s.getsockname()[1]
+
+
+@pytest.fixture
+def inventory(tmp_path, listener):
+    path = tmp_path / "hosts.json"
+    hosts = {f"127.0.0.1:{listener}": {"group": "G"}, "127.0.0.1:1": {"group": "G"}}
+    path.write_text(json.dumps({"version": 3, "domains": {}, "hosts": hosts}))
+    return str(path)
+
+
+@pytest.fixture
+def agent(inventory):
+    agent = ProbeAgent(inventory, port=0, interval=0.5, publish_interval=0.05, reload_interval=60).start()
+    yield agent
+    agent.stop()
+
+
+class Feed:
+    def __init__(self):
+        self.results = {}
+        self.batches = 0
+        self.lost = threading.Event()
+
+    def on_results(self, results):
+        self.batches += 1
+        for host, status, latency_ms in results:
+            self.results[host] = status
+
+    def connect(self, agent, inventory):
+        return AgentClient(port=agent.port, on_results=self.on_results, on_disconnect=self.lost.set).connect(inventory)
+
+
+def test_snapshot_then_deltas(agent, inventory, listener):
+    online, closed = f"127.0.0.1:{listener}", "127.0.0.1:1"
+    assert wait_for(lambda: len(agent._latest) == 2)
+
+    feed = Feed()
+    client = feed.connect(agent, inventory)
+    try:
+        # The snapshot carries every result the agent already has
+        assert feed.results == {online: "online", closed: "offline"}
+
+        # A manual probe comes back as a delta
+        feed.results.clear()
+        client.request_probe(online)
+        assert wait_for(lambda: feed.results.get(online) == "online")
+    finally:
+        client.close()
+    assert not feed.lost.is_set()  # Closing on purpose is not a disconnect
+
+
+def test_client_for_another_inventory_is_refused(agent, tmp_path):
+    with pytest.raises(OSError, match="agent probes"):
+        AgentClient(port=agent.port).connect(str(tmp_path / "other.json"))
+
+
+def test_malformed_deltas_are_skipped(agent, inventory, listener):
+    feed = Feed()
+    client = feed.connect(agent, inventory)
+    try:
+        junk = [b"[1, 2]\n", b"\"text\"\n", b'{"type": "delta"}\n', b'{"type": "delta", "results": 5}\n',
+                b'{"type": "delta", "results": [7, ["h", "online"]]}\n']
+        for writer in list(agent._clients):
+            for line in junk:
+                agent.engine.loop.call_soon_threadsafe(writer.write, line)
+        online = f"127.0.0.1:{listener}"
+        feed.results.clear()
+        client.request_probe(online)
+        assert wait_for(lambda: feed.results.get(online) == "online")
+        assert not feed.lost.is_set()
+    finally:
+        client.close()
+
+
+def test_agent_going_away_is_reported(inventory):
+    agent = ProbeAgent(inventory, port=0, publish_interval=0.05).start()
+    feed = Feed()
+    client = feed.connect(agent, inventory)
+    agent.stop()
+    assert feed.lost.wait(5.0)
+    client.close()
+
+
+def test_non_object_requests_do_not_end_the_session(agent, inventory, listener):
+    feed = Feed()
+    client = feed.connect(agent, inventory)
+    try:
+        client._send([1, 2])
+        client._send("probe")
+        client._send({"type": "probe", "host": ["not", "a", "host"]})
+        online = f"127.0.0.1:{listener}"
+        feed.results.clear()
+        client.request_probe(online)
+        assert wait_for(lambda: feed.results.get(online) == "online")
+    finally:
+        client.close()
@@ -0,0 +1,18 @@
+import pickle
+
+from rdp_hosts import HostTable
+
+
+def test_pickle_drops_statuses_and_keeps_records():
+    table = HostTable({
+        "a": {"domain": None, "group": "Servers", "desc": "Servers", "has_password": False},
+        "b": {"group": "Servers", "desc": "web", "username": "admin"},
+    })
+    table.statuses["a"] = "online"
+    restored = pickle.loads(pickle.dumps(table, pickle.HIGHEST_PROTOCOL))
+    assert restored.to_dict() == table.to_dict()
+    assert dict(restored["a"])["desc"] == "Servers"
+    assert dict(restored.statuses) == {}
+    assert table.statuses["a"] == "online"
+    restored.statuses["b"] = "offline"
+    assert dict(restored.statuses) == {"b": "offline"}
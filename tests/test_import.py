@@ -0,0 +1,29 @@
+from rdp_import import host_key, plan_import
+
+
+def _records(*hosts):
+    return [(i + 1, {"host": h}) for i, h in enumerate(hosts)]
+
+
+def test_host_key_folds_case_default_port_and_trailing_dot():
+    assert host_key("Server1") == host_key("server1:3389") == host_key("server1.") == ("server1", 3389)
+    assert host_key("server1:3390") == ("server1", 3390)
+    assert host_key("[fe80:0::1]:3389") == host_key("fe80::1") == ("fe80::1", 3389)
+
+
+def test_existing_default_port_matches_bare_import():
+    plan = plan_import(_records("10.0.0.5", "SERVER1"), {"10.0.0.5:3389": {}, "Server1": {}})
+    assert plan.hosts == {}
+    assert [host for _, host in plan.duplicates] == ["10.0.0.5", "server1"]
+
+
+def test_overwrite_keeps_inventory_spelling():
+    plan = plan_import(_records("server1"), {"Server1:3389": {}}, overwrite=True)
+    assert list(plan.hosts) == ["Server1:3389"]
+    assert plan.updated == ["Server1:3389"]
+
+
+def test_custom_port_is_a_different_host():
+    plan = plan_import(_records("10.0.0.5:3390", "10.0.0.5:3390"), {"10.0.0.5": {}})
+    assert list(plan.hosts) == ["10.0.0.5:3390"]
+    assert len(plan.duplicates) == 1
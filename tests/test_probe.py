@@ -0,0 +1,121 @@
+"""TcpProbeEngine against localhost listeners, and split_host_port."""
+import asyncio
+import socket
+import time
+
+import pytest
+
+from rdp_dns import DnsCache
+from rdp_probe import UNKNOWN, TcpProbeEngine, split_host_port
+
+
+@pytest.fixture
+def listener():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        s.listen(64)
+        yield s.getsockname()[1]
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.parametrize("entry, expected", [
+    ("server01", ("server01", 3389)),
+    ("server01:3390", ("server01", 3390)),
+    ("10.0.0.5", ("10.0.0.5", 3389)),
+    ("10.0.0.5:3390", ("10.0.0.5", 3390)),
+    ("[::1]:3390", ("::1", 3390)),
+    ("[::1]", ("::1", 3389)),
+    ("[fe80::1]:notaport", ("fe80::1", 3389)),
+    ("::1", ("::1", 3389)),
+    ("fe80::1:3390", ("fe80::1:3390", 3389)),  # Bare IPv6: the last group is not a port
+    ("server01:rdp", ("server01:rdp", 3389)),
+])
+def test_split_host_port(entry, expected):
+    assert split_host_port(entry) == expected
+
+
+def test_open_port_is_online(listener):
+    result = asyncio.run(TcpProbeEngine(timeout=1.0).probe(f"127.0.0.1:{listener}"))
+    assert result.status == "online"
+    assert result.latency_ms is not None and result.latency_ms >= 0
+
+
+def test_closed_port_is_offline():
+    host = f"127.0.0.1:{closed_port()}"
+    assert asyncio.run(TcpProbeEngine(timeout=1.0).probe(host)) == (host, "offline", None)
+
+
+def test_ipv6_entry_is_probed(listener):
+    if not socket.has_ipv6:
+        pytest.skip("no IPv6")
+    with socket.socket(socket.AF_INET6) as s:
+        try:
+            s.bind(("::1", 0))
+        except OSError:
+            pytest.skip("no IPv6 loopback")
+        s.listen(4)
+        port = s.getsockname()[1]
+        result = asyncio.run(TcpProbeEngine(timeout=1.0).probe(f"[::1]:{port}"))
+    assert result.status == "online"
+
+
+def test_connect_timeout_is_offline(monkeypatch):
+    async def hang(host, port):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(asyncio, "open_connection", hang)
+    started = time.perf_counter()
+    result = asyncio.run(TcpProbeEngine(timeout=0.2).probe("10.0.0.1"))
+    assert result.status == "offline"
+    assert time.perf_counter() - started < 2.0
+
+
+def test_concurrency_cap(monkeypatch):
+    in_flight = peak = 0
+
+    async def slow_refuse(host, port):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            in_flight -= 1
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(asyncio, "open_connection", slow_refuse)
+    engine = TcpProbeEngine(timeout=1.0, max_concurrency=5)
+    seen = []
+    results = asyncio.run(engine.probe_many([f"10.0.0.{i}" for i in range(50)], seen.append))
+    assert len(results) == len(seen) == 50
+    assert {r.status for r in results} == {"offline"}
+    assert peak == 5
+
+
+def test_unfinished_lookup_is_unknown_not_offline(listener):
+    def slow_resolver(name):
+        time.sleep(0.5)
+        return "127.0.0.1"
+
+    resolver = DnsCache(resolver=slow_resolver)
+    try:
+        engine = TcpProbeEngine(timeout=1.0, resolver=resolver, dns_timeout=0.1)
+        assert asyncio.run(engine.probe(f"slow.example:{listener}")).status == UNKNOWN
+        time.sleep(0.6)
+        assert asyncio.run(engine.probe(f"slow.example:{listener}")).status == "online"
+    finally:
+        resolver.close()
+
+
+def test_blocking_helper_runs_on_the_engine_loop(listener):
+    engine = TcpProbeEngine(timeout=1.0)
+    engine.start()
+    try:
+        assert engine.probe_blocking(f"127.0.0.1:{listener}").status == "online"
+    finally:
+        engine.stop()
@@ -0,0 +1,19 @@
+from rdp_status import StatusPipeline
+
+
+def test_drain_limit_returns_oldest_and_keeps_the_rest():
+    pipeline = StatusPipeline()
+    for i in range(10):
+        pipeline.push(f"h{i}", "online")
+    assert pipeline.drain(3) == [("h0", "online"), ("h1", "online"), ("h2", "online")]
+    assert len(pipeline) == 7
+    assert [host for host, _ in pipeline.drain()] == [f"h{i}" for i in range(3, 10)]
+    assert len(pipeline) == 0
+
+
+def test_unchanged_status_is_not_delivered_again():
+    pipeline = StatusPipeline()
+    pipeline.push("h1", "online")
+    pipeline.drain()
+    pipeline.push("h1", "online")
+    assert pipeline.drain() == []
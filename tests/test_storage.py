@@ -0,0 +1,47 @@
+import json
+import os
+
+from rdp_storage import migrate_inventory, read_inventory
+
+INVENTORY = {
+    "domains": {"CORP": {"username": "admin", "password": ""}},
+    "hosts": {
+        "10.0.0.5": {"domain": "CORP", "group": "Servers", "desc": "Servers", "has_password": False},
+        "web01:3390": {"domain": None, "group": "Web", "desc": "frontend", "username": "ops", "has_password": False},
+    },
+}
+
+
+def _write_source(tmp_path):
+    src = str(tmp_path / "src.json")
+    with open(src, "w") as f:
+        json.dump(INVENTORY, f)
+    # An unapplied change in the source journal must be carried over, not compacted into the source
+    with open(src + ".journal", "w") as f:
+        f.write(json.dumps({"op": "host", "host": "web01:3390", "info": None}) + "\n")
+    return src
+
+
+def test_json_target_is_one_snapshot_without_journal(tmp_path):
+    src = _write_source(tmp_path)
+    dst = str(tmp_path / "dst.json")
+    with open(dst + ".journal", "w") as f:
+        f.write(json.dumps({"op": "host", "host": "10.0.0.5", "info": None}) + "\n")
+
+    assert migrate_inventory(src, dst) == 1
+    assert not os.path.exists(dst + ".journal")
+    with open(dst) as f:
+        assert list(json.load(f)["hosts"]) == ["10.0.0.5"]
+    assert read_inventory(dst)["domains"] == INVENTORY["domains"]
+    # The source was only read
+    assert os.path.getsize(src + ".journal")
+
+
+def test_sqlite_round_trip(tmp_path):
+    src = _write_source(tmp_path)
+    db = str(tmp_path / "inv.db")
+    back = str(tmp_path / "back.json")
+    assert migrate_inventory(src, db) == 1
+    assert migrate_inventory(db, back) == 1
+    assert dict(read_inventory(back)["hosts"]["10.0.0.5"]) == INVENTORY["hosts"]["10.0.0.5"]
+
@@ -0,0 +1,84 @@
+"""RdpProbeEngine against the local X.224 stub server."""
+import asyncio
+import socket
+
+import pytest
+
+from rdp_x224 import (PROTOCOL_HYBRID, PROTOCOL_HYBRID_EX, PROTOCOL_SSL, RdpProbeEngine, X224Error, X224StubServer,
+                      connection_confirm, connection_request, describe_check, parse_connection_confirm,
+                      requested_protocols)
+
+
+def probe(port, timeout=1.0, **engine_args):
+    engine = RdpProbeEngine(timeout=timeout, **engine_args)
+    host = f"127.0.0.1:{port}"
+    result = asyncio.run(engine.probe(host))
+    return result, engine.checks[host]
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.parametrize("selected, security, label", [
+    (PROTOCOL_HYBRID, "credssp", "CredSSP (NLA)"),
+    (PROTOCOL_HYBRID_EX, "credssp-ex", "CredSSP (NLA, early auth)"),
+    (PROTOCOL_SSL, "tls", "TLS"),
+])
+def test_reports_the_negotiated_security(selected, security, label):
+    with X224StubServer(selected=selected) as server:
+        result, check = probe(server.port)
+    assert result.status == "online"
+    assert result.latency_ms is not None and result.latency_ms >= 0
+    assert check.responding and check.security == security and check.failure is None
+    assert describe_check(check) == f"RDP responding · {label}"
+
+
+def test_negotiation_failure_from_the_server_is_still_rdp():
+    with X224StubServer(failure=5) as server:
+        result, check = probe(server.port)
+    assert result.status == "online"
+    assert check.responding and check.security is None
+    assert check.failure == "hybrid-required-by-server"
+    assert describe_check(check) == "RDP responding · negotiation failed (hybrid-required-by-server)"
+
+
+def test_server_refuses_a_client_that_does_not_offer_what_it_requires():
+    with X224StubServer(selected=PROTOCOL_HYBRID) as server:
+        result, check = probe(server.port, requested=PROTOCOL_SSL)
+    assert result.status == "online"
+    assert check.failure == "hybrid-required-by-server"
+
+
+def test_silent_listener_is_offline():
+    with X224StubServer(behaviour="silent") as server:
+        result, check = probe(server.port, timeout=0.3)
+    assert result.status == "offline" and result.latency_ms is None
+    assert not check.responding
+    assert check.error == "Port open, no RDP reply within 0.3 s"
+
+
+def test_non_rdp_listener_is_offline():
+    with X224StubServer(behaviour="garbage") as server:
+        result, check = probe(server.port)
+    assert result.status == "offline"
+    assert check.error.startswith("Port open, not RDP")
+
+
+def test_closed_port_is_offline():
+    result, check = probe(closed_port())
+    assert result.status == "offline"
+    assert check.error == "Port closed or unreachable"
+
+
+def test_request_and_confirm_round_trip():
+    assert requested_protocols(connection_request(PROTOCOL_SSL | PROTOCOL_HYBRID, cookie="alice")) == PROTOCOL_SSL | PROTOCOL_HYBRID
+    assert parse_connection_confirm(connection_confirm(PROTOCOL_SSL)).security == "tls"
+    # A server older than RDP 5.2 sends a bare confirm: standard RDP security
+    assert parse_connection_confirm(connection_confirm(negotiate=False)).security == "standard"
+    with pytest.raises(X224Error):
+        parse_connection_confirm(connection_request())
+    with pytest.raises(X224Error):
+        parse_connection_confirm(b"HTTP/1.1 400 Bad Request\r\n\r\n")